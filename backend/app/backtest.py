@@ -0,0 +1,246 @@
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from app.notifications import parse_notification
+from app.solana_client import SIGNATURE_FEE_LAMPORTS
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "./history")  # Spaltenspeicher für den Backtest
+HISTORY_PATH = os.getenv("HISTORY_PATH") or None  # JSONL-Aufzeichnung der Leader-Transfers; None: aus
+CHUNK_CELLS = 2_000_000  # Obergrenze Wallets x Events x Allokationen je Rechenblock
+START_BALANCE = 10.0  # SOL, mit denen jede Simulation beginnt
+MAX_DRAWDOWN = 0.5  # Höchster Verlust gegenüber dem Startkapital für die Empfehlung
+FEE = SIGNATURE_FEE_LAMPORTS / 10**9
+
+# Spalten des Speichers: Leader-Index, Slot, Transferbetrag und Leader-Kontostand danach (SOL)
+COLUMNS = {"wallet": np.int32, "slot": np.int64, "amount": np.float64, "source": np.float64}
+CURRENT = "CURRENT"  # Datei mit dem Namen der gültigen Generation
+
+
+def parse_history(lines, balances: dict = None):
+    """Liest aufgezeichnete Zeilen als (Wallet, Slot, Betrag, Leader-Kontostand)."""
+    balances = {} if balances is None else balances
+    rows = []
+    skipped = 0
+    for line in lines:
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+            wallet = event["wallet"]
+            slot = event.get("slot") or 0
+            if "value" in event:
+                parsed = parse_notification(wallet, {"result": {"context": {"slot": slot}, "value": event["value"]}})
+                if parsed is None:
+                    skipped += 1
+                    continue
+                lamports, amounts = parsed.lamports, [amount for _, amount in parsed.transfers]
+            else:
+                lamports, amounts = event.get("balance"), event.get("amounts") or []
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        if lamports is not None:
+            balances[wallet] = lamports / 10**9
+        source = balances.get(wallet)
+        for amount in amounts:
+            if source is None or source <= 0 or amount <= 0:
+                skipped += 1
+                continue
+            rows.append((wallet, slot, amount, source))
+    return rows, skipped
+
+
+class HistoryRecorder:
+    """Hängt die Transfers überwachter Leader-Wallets als JSONL an, als Eingabe für den Backtest."""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self.file = None
+        self.recorded = 0
+
+    def open(self):
+        if self.path is not None and self.file is None:
+            self.file = open(self.path, "a")
+
+    def record(self, wallet_address: str, slot, lamports, transfers: list):
+        if self.file is None:
+            return
+        self.file.write(json.dumps({"wallet": wallet_address, "slot": slot, "balance": lamports,
+                                    "amounts": [amount for _, amount in transfers]}) + "\n")
+        self.file.flush()
+        self.recorded += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class HistoryStore:
+    """Leader-Historie als memory-gemappte Spalten, nach (Wallet, Slot) sortiert und generationsweise ersetzt."""
+
+    def __init__(self, path: str = HISTORY_DIR):
+        self.path = path
+        self.lock = threading.Lock()
+        self.generation = None
+        self.wallets = []  # Index -> Adresse
+        self.columns = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.load()
+
+    def load(self):
+        current = os.path.join(self.path, CURRENT)
+        if not os.path.exists(current):
+            return
+        with open(current) as f:
+            generation = f.read().strip()
+        directory = os.path.join(self.path, generation)
+        with open(os.path.join(directory, "wallets.json")) as f:
+            self.wallets = json.load(f)
+        self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        self.generation = generation
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def snapshot(self):
+        """Gibt (Adressen, Spalten, Offsets) einer Generation zurück, unabhängig von späteren Importen."""
+        with self.lock:
+            return self.wallets, self.columns, self.offsets
+
+    def append(self, rows: list):
+        """Fügt (Wallet, Slot, Betrag, Kontostand)-Zeilen hinzu; doppelte Zeilen werden verworfen."""
+        if not rows:
+            return 0
+        with self.lock:
+            wallets = list(self.wallets)
+            index = {address: i for i, address in enumerate(wallets)}
+            for row in rows:
+                if row[0] not in index:
+                    index[row[0]] = len(wallets)
+                    wallets.append(row[0])
+            new = {
+                "wallet": np.fromiter((index[row[0]] for row in rows), dtype=COLUMNS["wallet"], count=len(rows)),
+                "slot": np.fromiter((row[1] for row in rows), dtype=COLUMNS["slot"], count=len(rows)),
+                "amount": np.fromiter((row[2] for row in rows), dtype=COLUMNS["amount"], count=len(rows)),
+                "source": np.fromiter((row[3] for row in rows), dtype=COLUMNS["source"], count=len(rows)),
+            }
+            merged = {name: np.concatenate([self.columns[name], new[name]]) if self.columns else new[name]
+                      for name in COLUMNS}
+            order = np.lexsort((merged["source"], merged["amount"], merged["slot"], merged["wallet"]))
+            merged = {name: column[order] for name, column in merged.items()}
+            duplicate = np.ones(len(order), dtype=bool)
+            for column in merged.values():
+                duplicate[1:] &= column[1:] == column[:-1]
+            duplicate[0] = False
+            merged = {name: column[~duplicate] for name, column in merged.items()}
+            added = len(merged["wallet"]) - len(self)
+            offsets = np.searchsorted(merged["wallet"], np.arange(len(wallets) + 1)).astype(np.int64)
+            self._write(wallets, merged, offsets)
+            return added
+
+    def _write(self, wallets: list, columns: dict, offsets):
+        generation = str(int(self.generation) + 1 if self.generation else 1)
+        directory = os.path.join(self.path, generation)
+        os.makedirs(directory, exist_ok=True)
+        for name, column in columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), column)
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+        with open(os.path.join(directory, "wallets.json"), "w") as f:
+            json.dump(wallets, f)
+        temp_path = os.path.join(self.path, f"{CURRENT}.tmp")
+        with open(temp_path, "w") as f:
+            f.write(generation)
+        os.replace(temp_path, os.path.join(self.path, CURRENT))
+        previous = self.generation
+        self.load()
+        if previous is not None:
+            # Bestehende Maps bleiben nach dem Löschen gültig
+            shutil.rmtree(os.path.join(self.path, previous), ignore_errors=True)
+
+    def stats(self):
+        wallets, columns, offsets = self.snapshot()
+        slots = columns.get("slot")
+        return {
+            "wallets": len(wallets),
+            "events": int(offsets[-1]),
+            "first_slot": int(slots.min()) if slots is not None and len(slots) else None,
+            "last_slot": int(slots.max()) if slots is not None and len(slots) else None,
+            "generation": self.generation,
+        }
+
+
+def _simulate(ratios, mask, allocations, start_balance: float, fee: float):
+    """Rechnet einen Block aus (n Wallets, m Events) für alle Allokationen über kumulierte Produkte."""
+    scaled = ratios[:, :, None] * allocations[None, None, :]
+    mask = mask[:, :, None]
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        steps = np.where(mask, np.log1p(-np.minimum(scaled, 1 - 1e-12)), 0.0)
+        growth = np.cumsum(steps, axis=1)
+        after = np.exp(growth) * (start_balance - fee * np.cumsum(np.exp(-growth), axis=1))
+        executed = np.logical_and.accumulate(mask & (scaled < 1) & (after >= 0), axis=1)
+        before = np.concatenate([np.full_like(after[:, :1], start_balance), after[:, :-1]], axis=1)
+        volume = np.where(executed, scaled * before, 0.0).sum(axis=1)
+    copies = executed.sum(axis=1)
+    return copies, volume
+
+
+def backtest(store: HistoryStore, allocations, wallet_addresses: list = None, start_balance: float = START_BALANCE,
+             fee: float = FEE, max_drawdown: float = MAX_DRAWDOWN, chunk_cells: int = CHUNK_CELLS):
+    """Spielt die Historie für alle Wallets und Allokationen (Anteile 0-1) vektorisiert nach."""
+    wallets, columns, offsets = store.snapshot()
+    allocations = np.asarray(sorted(set(float(a) for a in allocations)), dtype=np.float64)
+    if wallet_addresses is None:
+        selected = np.arange(len(wallets))
+    else:
+        index = {address: i for i, address in enumerate(wallets)}
+        selected = np.array([index[a] for a in wallet_addresses if a in index], dtype=np.int64)
+    counts = (offsets[selected + 1] - offsets[selected]) if len(selected) else np.zeros(0, dtype=np.int64)
+    # Nach Länge sortiert, damit jeder Block wenig Padding enthält
+    order = np.argsort(counts, kind="stable")
+    selected, counts = selected[order], counts[order]
+
+    n_alloc = len(allocations)
+    copies = np.zeros((len(selected), n_alloc), dtype=np.int64)
+    volume = np.zeros((len(selected), n_alloc), dtype=np.float64)
+    amount, source = columns.get("amount"), columns.get("source")
+    start = 0
+    while start < len(selected):
+        # Wallets, deren längste Historie noch in den Block passt
+        end = start + 1
+        while end < len(selected) and (end - start + 1) * max(int(counts[end]), 1) * n_alloc <= chunk_cells:
+            end += 1
+        block, lengths = selected[start:end], counts[start:end]
+        width = max(int(lengths[-1]), 1)
+        # Zeilen aller Wallets des Blocks mit einem Fancy-Index aus den Maps lesen
+        rows = np.repeat(np.arange(len(block)), lengths)
+        positions = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat = positions + np.repeat(offsets[block], lengths)
+        ratios = np.zeros((len(block), width), dtype=np.float64)
+        mask = np.zeros((len(block), width), dtype=bool)
+        ratios[rows, positions] = amount[flat] / source[flat]
+        mask[rows, positions] = True
+        copies[start:end], volume[start:end] = _simulate(ratios, mask, allocations, start_balance, fee)
+        start = end
+
+    fees = copies * fee
+    final = start_balance - volume - fees
+    complete = (copies == counts[:, None]) & (final >= start_balance * (1 - max_drawdown))
+    results = []
+    for row, wallet in enumerate(selected.tolist()):
+        eligible = np.flatnonzero(complete[row])
+        best = float(allocations[eligible[-1]]) if len(eligible) else None
+        results.append({
+            "wallet_address": wallets[wallet],
+            "events": int(counts[row]),
+            "best_allocation": best,
+            "copies": copies[row].tolist(),
+            "volume": volume[row].tolist(),
+            "fees": fees[row].tolist(),
+            "final_balance": final[row].tolist(),
+            "pnl": (-fees[row]).tolist(),
+        })
+    return {"allocations": allocations.tolist(), "start_balance": start_balance, "wallets": results}
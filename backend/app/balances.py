@@ -0,0 +1,101 @@
+import time
+
+STALE_AFTER = 30.0  # Sekunden, nach denen ein Eintrag per RPC aufgefrischt wird
+
+
+class BalanceStore:
+    """In-Memory-Spiegel der Kontostände; ältere Slots überschreiben nie einen neueren Stand."""
+
+    def __init__(self, stale_after: float = STALE_AFTER):
+        self.stale_after = stale_after
+        self.entries = {}  # Adresse -> [Lamports, Slot, Zeitpunkt]
+        self.hits = 0
+        self.misses = 0
+        self.listeners = []  # Aufruf mit (Adresse, Lamports, Slot) bei jeder Änderung
+        self.reserved = {}  # Adresse -> für eingereihte, noch nicht gesendete Transfers vorgemerkte Lamports
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _notify(self, address: str, entry: list):
+        for listener in self.listeners:
+            listener(address, entry[0], entry[1])
+
+    def update(self, address: str, lamports: int, slot: int):
+        """Übernimmt einen Kontostand, sofern er nicht älter als der bekannte ist."""
+        entry = self.entries.get(address)
+        if entry is not None and entry[1] > slot:
+            return False
+        entry = self.entries[address] = [lamports, slot, time.monotonic()]
+        if self.listeners:
+            self._notify(address, entry)
+        return True
+
+    def restore(self, address: str, lamports: int, slot: int):
+        """Übernimmt einen gesicherten Stand als Ausgangswert, der sofort als veraltet gilt."""
+        entry = self.entries.get(address)
+        if entry is not None and entry[1] >= slot:
+            return False
+        entry = self.entries[address] = [lamports, slot, float("-inf")]
+        if self.listeners:
+            self._notify(address, entry)
+        return True
+
+    def update_from_notification(self, address: str, result: dict):
+        """Liest Lamports und Slot aus dem `result` einer accountNotification."""
+        try:
+            lamports = result["value"]["lamports"]
+            slot = result["context"]["slot"]
+        except (KeyError, TypeError):
+            return False
+        return self.update(address, lamports, slot)
+
+    def adjust(self, address: str, delta_lamports: int):
+        """Verbucht eine eigene Änderung, ohne den Eintrag als frisch zu markieren."""
+        entry = self.entries.get(address)
+        if entry is not None:
+            entry[0] = max(entry[0] + delta_lamports, 0)
+            if self.listeners:
+                self._notify(address, entry)
+
+    def get(self, address: str):
+        """Gibt die verfügbaren Lamports zurück oder None, wenn der Eintrag fehlt oder veraltet ist."""
+        entry = self.entries.get(address)
+        if entry is None or time.monotonic() - entry[2] > self.stale_after:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.available(address, entry[0])
+
+    def available(self, address: str, lamports: int):
+        """Lamports abzüglich der Vormerkungen eingereihter Transfers."""
+        return max(lamports - self.reserved.get(address, 0), 0)
+
+    def reserve(self, address: str, lamports: int):
+        """Merkt Lamports für einen eingereihten Transfer vor; False, wenn der bekannte Stand nicht reicht."""
+        entry = self.entries.get(address)
+        reserved = self.reserved.get(address, 0)
+        if entry is not None and entry[0] - reserved < lamports:
+            return False
+        self.reserved[address] = reserved + lamports
+        return True
+
+    def release(self, address: str, lamports: int):
+        """Gibt eine Vormerkung frei, sobald der Transfer gesendet oder verworfen ist."""
+        remaining = self.reserved.get(address, 0) - lamports
+        if remaining > 0:
+            self.reserved[address] = remaining
+        else:
+            self.reserved.pop(address, None)
+
+    def last(self, address: str):
+        """Letzter bekannter Stand als (Lamports, Slot), auch wenn er veraltet ist."""
+        entry = self.entries.get(address)
+        return (entry[0], entry[1]) if entry is not None else None
+
+    def slot(self, address: str):
+        entry = self.entries.get(address)
+        return entry[1] if entry is not None else None
+
+    def discard(self, address: str):
+        self.entries.pop(address, None)
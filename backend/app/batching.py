@@ -0,0 +1,146 @@
+import asyncio
+from app.metrics import metrics
+from app.logs import get_logger
+
+log = get_logger("batching")
+
+MAX_WAIT = 0.02  # Sekunden, die ein Transfer höchstens auf weitere wartet
+MAX_IN_FLIGHT = 1000  # Eingereihte oder gerade gesendete Transfers, darüber warten die Executoren
+PACKET_DATA_SIZE = 1232  # Maximale Größe einer serialisierten Transaktion
+MAX_COMPUTE_UNITS = 200_000  # Standardbudget ohne ComputeBudget-Anweisung
+COMPUTE_UNITS_PER_TRANSFER = 150  # Verbrauch einer System-Transfer-Anweisung
+BASE_TRANSACTION_SIZE = 166  # Signatur, Header, Zahler, System-Programm und Blockhash
+INSTRUCTION_SIZE = 17  # Programmindex, zwei Kontoindizes, Längen und 12 Byte Daten
+ACCOUNT_KEY_SIZE = 32
+
+
+class PendingTransfer:
+    """Ein eingereihter Transfer; `future` liefert die Signatur seiner Transaktion oder None."""
+
+    __slots__ = ("recipient", "lamports", "trace", "future", "batch_size", "payer")
+
+    def __init__(self, recipient: str, lamports: int, trace, future, payer=None):
+        self.recipient = recipient
+        self.lamports = lamports
+        self.trace = trace
+        self.future = future
+        self.batch_size = 1  # Transfers in derselben Transaktion, gesetzt beim Senden
+        self.payer = payer  # Keypair des zahlenden Follower-Kontos
+
+
+class _Batch:
+    """Offene Transfers eines Zahlers und die Größe ihrer Transaktion."""
+
+    __slots__ = ("payer", "transfers", "recipients", "size")
+
+    def __init__(self, payer):
+        self.payer = payer
+        self.transfers = []
+        self.recipients = set()
+        self.size = BASE_TRANSACTION_SIZE
+
+    def fits(self, recipient: str):
+        size = self.size + INSTRUCTION_SIZE + (0 if recipient in self.recipients else ACCOUNT_KEY_SIZE)
+        compute = (len(self.transfers) + 1) * COMPUTE_UNITS_PER_TRANSFER
+        return size <= PACKET_DATA_SIZE and compute <= MAX_COMPUTE_UNITS
+
+    def add(self, transfer: PendingTransfer):
+        self.transfers.append(transfer)
+        if transfer.recipient not in self.recipients:
+            self.recipients.add(transfer.recipient)
+            self.size += ACCOUNT_KEY_SIZE
+        self.size += INSTRUCTION_SIZE
+
+
+class TransferBatcher:
+    """Bündelt kurz nacheinander anfallende Transfers in eine Transaktion je Zahler."""
+
+    def __init__(self, send_batches, max_wait: float = MAX_WAIT, max_in_flight: int = MAX_IN_FLIGHT):
+        self.send_batches = send_batches  # async ([(Zahler, [PendingTransfer])]) -> [Signatur oder None]
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+        self.slots = None  # Semaphore, erst im laufenden Loop angelegt
+        self.in_flight = 0
+        self.batches = {}  # Zahler-Pubkey -> _Batch
+        self.timer = None
+        self.tasks = set()
+        self.transactions = 0
+        self.transfers = 0
+        self.flushes = 0
+
+    async def submit(self, recipient: str, lamports: int, trace=None, payer=None):
+        """Reiht einen Transfer des Zahlers `payer` (Keypair) ein und gibt den PendingTransfer zurück."""
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_in_flight)
+        await self.slots.acquire()
+        self.in_flight += 1
+        key = str(payer.pubkey()) if payer is not None else None
+        batch = self.batches.get(key)
+        if batch is not None and not batch.fits(recipient):
+            self._send([self.batches.pop(key)])
+            batch = None
+        if batch is None:
+            batch = self.batches[key] = _Batch(payer)
+        if self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self.flush)
+        transfer = PendingTransfer(recipient, lamports, trace, asyncio.get_running_loop().create_future(), payer)
+        transfer.future.add_done_callback(self._release)
+        batch.add(transfer)
+        return transfer
+
+    def _release(self, _):
+        self.in_flight -= 1
+        self.slots.release()
+
+    def flush(self):
+        """Sendet alle offenen Batches gemeinsam im Hintergrund."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.batches:
+            return
+        batches, self.batches = list(self.batches.values()), {}
+        self._send(batches)
+
+    def _send(self, batches: list):
+        task = asyncio.create_task(self._send_batches(batches))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send_batches(self, batches: list):
+        self.flushes += 1
+        for batch in batches:
+            for transfer in batch.transfers:
+                transfer.batch_size = len(batch.transfers)
+                if transfer.trace is not None:
+                    transfer.trace.mark("batch")
+        try:
+            signatures = await self.send_batches([(batch.payer, batch.transfers) for batch in batches])
+        except Exception as e:
+            metrics.errors.inc("batching")
+            log.error("Error sending transfer batch: %s", e)
+            signatures = [None] * len(batches)
+        for batch, signature in zip(batches, signatures):
+            if signature:
+                self.transactions += 1
+                self.transfers += len(batch.transfers)
+            for transfer in batch.transfers:
+                if not transfer.future.done():
+                    transfer.future.set_result(signature)
+
+    async def close(self):
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "pending": sum(len(batch.transfers) for batch in self.batches.values()),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "transactions": self.transactions,
+            "transfers": self.transfers,
+            "transfers_per_transaction": round(self.transfers / self.transactions, 2) if self.transactions else None,
+            "flushes": self.flushes,
+            "max_wait_ms": self.max_wait * 1000,
+        }
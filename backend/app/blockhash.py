@@ -0,0 +1,122 @@
+import asyncio
+import time
+from app.metrics import metrics
+from app.logs import get_logger
+
+log = get_logger("blockhash")
+
+REFRESH_INTERVAL = 2.0  # Sekunden zwischen zwei Abrufen
+EXPIRY_MARGIN = 30  # Blöcke vor lastValidBlockHeight, ab denen neu geladen wird
+SLOT_TIME = 0.4  # Geschätzte Sekunden pro Block
+MAX_BLOCKHASH_AGE = 150  # Blöcke, die ein Blockhash gültig bleibt
+RECENT_BLOCKHASHES = 32  # Blockhashes, deren lastValidBlockHeight gemerkt wird
+
+
+class BlockhashCache:
+    """Hält den aktuellen Blockhash im Hintergrund bereit."""
+
+    def __init__(self, rpc, commitment: str = "confirmed", refresh_interval: float = REFRESH_INTERVAL,
+                 expiry_margin: int = EXPIRY_MARGIN):
+        self.rpc = rpc
+        self.commitment = commitment
+        self.refresh_interval = refresh_interval
+        self.expiry_margin = expiry_margin
+        self.blockhash = None
+        self.last_valid_block_height = None
+        self.block_height = None  # Blockhöhe zum Zeitpunkt des Abrufs
+        self.recent = {}  # Blockhash -> lastValidBlockHeight, älteste zuerst
+        self.fetched_at = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.task = None
+        self._refresh_lock = asyncio.Lock()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                metrics.errors.inc("blockhash")
+                log.warning("Error refreshing blockhash: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self):
+        async with self._refresh_lock:
+            await self._fetch()
+        return self.blockhash
+
+    async def _fetch(self):
+        result = await self.rpc.arequest("getLatestBlockhash", [{"commitment": self.commitment}])
+        self.store(result["value"])
+
+    def store(self, value: dict):
+        self.blockhash = value["blockhash"]
+        self.last_valid_block_height = value["lastValidBlockHeight"]
+        self.recent[self.blockhash] = self.last_valid_block_height
+        if len(self.recent) > RECENT_BLOCKHASHES:
+            del self.recent[next(iter(self.recent))]
+        # getLatestBlockhash liefert keine Blockhöhe; ein frischer Hash ist noch
+        # MAX_BLOCKHASH_AGE Blöcke gültig.
+        self.block_height = self.last_valid_block_height - MAX_BLOCKHASH_AGE
+        self.fetched_at = time.monotonic()
+        self.refreshes += 1
+
+    def valid_until(self, blockhash: str):
+        """lastValidBlockHeight eines kürzlich geladenen Blockhashes oder None."""
+        return self.recent.get(blockhash)
+
+    def estimated_block_height(self):
+        if self.fetched_at is None:
+            return None
+        return self.block_height + int((time.monotonic() - self.fetched_at) / SLOT_TIME)
+
+    def is_fresh(self):
+        height = self.estimated_block_height()
+        return height is not None and height < self.last_valid_block_height - self.expiry_margin
+
+    def peek(self):
+        """Gibt den gecachten Blockhash ohne I/O zurück oder None, wenn er nicht mehr taugt."""
+        if self.is_fresh():
+            self.hits += 1
+            return self.blockhash
+        return None
+
+    async def get(self):
+        """Liefert einen gültigen Blockhash, bei Bedarf mit erzwungenem Abruf."""
+        blockhash = self.peek()
+        if blockhash is not None:
+            return blockhash
+        self.misses += 1
+        async with self._refresh_lock:
+            # Ein paralleler Aufrufer hat eventuell schon neu geladen
+            if not self.is_fresh():
+                await self._fetch()
+        return self.blockhash
+
+    def stats(self):
+        return {
+            "refresh_interval": self.refresh_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_valid_block_height": self.last_valid_block_height,
+        }
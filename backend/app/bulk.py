@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from solders.pubkey import Pubkey
+from sqlalchemy.exc import SQLAlchemyError
+from . import crud
+from .logs import get_logger
+
+log = get_logger("bulk")
+
+BATCH_SIZE = 500  # Zeilen pro Insert-Transaktion
+EXPORT_BATCH_SIZE = 1000  # Zeilen pro Abfrage beim Export
+DEFAULT_ALLOCATION = 10.0
+
+NDJSON = "ndjson"
+CSV = "csv"
+CSV_COLUMNS = ("id", "wallet_address", "pnl", "active_trades", "allocation_percentage")
+
+CREATED = "created"
+EXISTS = "exists"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+FAILED = "failed"  # Batch konnte nicht angelegt werden, Zeile erneut importieren
+
+
+def detect_format(content_type: str, requested: str = None):
+    """Format aus Query-Parameter oder Content-Type, Standard ist NDJSON."""
+    if requested in (NDJSON, CSV):
+        return requested
+    return CSV if "csv" in (content_type or "") else NDJSON
+
+
+async def iter_lines(chunks):
+    """Zerlegt einen Byte-Stream in Zeilen, ohne den ganzen Body zu puffern."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").strip()
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").strip()
+
+
+def validate_address(address):
+    if not isinstance(address, str) or not address:
+        return "wallet_address is missing"
+    try:
+        Pubkey.from_string(address)
+    except ValueError:
+        return "not a valid base58 public key"
+    return None
+
+
+def validate_allocation(value):
+    if value in (None, ""):
+        return DEFAULT_ALLOCATION, None
+    try:
+        allocation = float(value)
+    except (TypeError, ValueError):
+        return None, "allocation_percentage is not a number"
+    if not 0 <= allocation <= 100:
+        return None, "allocation_percentage must be between 0 and 100"
+    return allocation, None
+
+
+def parse_ndjson(line: str):
+    """Eine Zeile ist ein Objekt mit `wallet_address` oder nur die Adresse als JSON-String."""
+    record = json.loads(line)
+    if isinstance(record, str):
+        return record, None
+    if not isinstance(record, dict):
+        raise ValueError("expected an object or a string")
+    return record.get("wallet_address"), record.get("allocation_percentage")
+
+
+class CsvParser:
+    """CSV mit optionaler Kopfzeile; ohne Kopfzeile steht die Adresse in der ersten Spalte."""
+
+    def __init__(self):
+        self.columns = None
+
+    def parse(self, line: str):
+        values = next(csv.reader([line]))
+        if self.columns is None:
+            self.columns = {}
+            if "wallet_address" in values:
+                self.columns = {name.strip(): i for i, name in enumerate(values)}
+                return None
+        address_column = self.columns.get("wallet_address", 0)
+        allocation_column = self.columns.get("allocation_percentage", 1 if not self.columns else None)
+        address = values[address_column].strip() if address_column < len(values) else None
+        allocation = None
+        if allocation_column is not None and allocation_column < len(values):
+            allocation = values[allocation_column].strip()
+        return address, allocation
+
+
+async def import_wallets(chunks, fmt: str, session_factory, on_created=None, batch_size: int = BATCH_SIZE):
+    """Liest Wallets zeilenweise ein, legt sie in Batches an und berichtet je Zeile."""
+    results = []
+    batch = []  # (Ergebnis, Adresse, Allokation)
+    seen = set()
+    csv_parser = CsvParser() if fmt == CSV else None
+
+    async def flush():
+        rows = [(address, allocation) for _, address, allocation in batch]
+        try:
+            async with session_factory() as db:
+                created, existing = await crud.add_wallets_bulk_async(db, rows)
+        except SQLAlchemyError as e:
+            # Bereits angelegte Batches bleiben bestehen, der Bericht nennt die fehlgeschlagenen Zeilen
+            log.error("Bulk import batch of %s rows failed: %s", len(batch), e)
+            for result, _, _ in batch:
+                result.update(status=FAILED, error="database error, row was not imported")
+            batch.clear()
+            return
+        for result, address, _ in batch:
+            wallet = created.get(address)
+            if wallet is not None:
+                result.update(status=CREATED, id=wallet["id"])
+                if on_created is not None:
+                    on_created(wallet)
+            else:
+                result["status"] = EXISTS
+        batch.clear()
+
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line:
+            continue
+        result = {"line": line_number}
+        results.append(result)
+        try:
+            parsed = csv_parser.parse(line) if csv_parser else parse_ndjson(line)
+        except (ValueError, csv.Error) as e:
+            result.update(status=INVALID, error=f"unparsable row: {e}")
+            continue
+        if parsed is None:
+            results.pop()  # Kopfzeile
+            continue
+        address, allocation = parsed
+        result["wallet_address"] = address
+        error = validate_address(address)
+        if error is None:
+            allocation, error = validate_allocation(allocation)
+        if error is not None:
+            result.update(status=INVALID, error=error)
+            continue
+        if address in seen:
+            result["status"] = DUPLICATE
+            continue
+        seen.add(address)
+        batch.append((result, address, allocation))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    summary = {CREATED: 0, EXISTS: 0, DUPLICATE: 0, INVALID: 0, FAILED: 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return {"total": len(results), "summary": summary, "results": results}
+
+
+async def export_wallets(fmt: str, session_factory, batch_size: int = EXPORT_BATCH_SIZE):
+    """Liefert alle Wallets seitenweise als NDJSON- oder CSV-Zeilen."""
+    if fmt == CSV:
+        yield ",".join(CSV_COLUMNS) + "\n"
+    cursor = None
+    while True:
+        async with session_factory() as db:
+            wallets, cursor = await crud.get_wallets_page_async(db, cursor, batch_size)
+        if fmt == CSV:
+            output = io.StringIO()
+            writer = csv.writer(output, lineterminator="\n")
+            writer.writerows([wallet[column] for column in CSV_COLUMNS] for wallet in wallets)
+            chunk = output.getvalue()
+        else:
+            chunk = "".join(json.dumps(wallet) + "\n" for wallet in wallets)
+        if chunk:
+            yield chunk
+        if cursor is None:
+            return
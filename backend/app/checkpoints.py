@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from app.logs import get_logger
+
+log = get_logger("checkpoints")
+
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "./checkpoints.json")
+CHECKPOINT_INTERVAL = 5.0  # Sekunden zwischen zwei Sicherungen, sofern sich etwas geändert hat
+MAX_AGE = float(os.getenv("CHECKPOINT_MAX_AGE", "300"))  # Ältere Kontostände werden beim Start verworfen
+
+
+class Checkpoint:
+    """Stand einer Leader-Wallet: zuletzt verarbeitete Notification und bekannter Kontostand."""
+
+    __slots__ = ("slot", "signature", "lamports", "balance_slot")
+
+    def __init__(self, slot: int = None, signature: str = None, lamports: int = None, balance_slot: int = None):
+        self.slot = slot
+        self.signature = signature
+        self.lamports = lamports
+        self.balance_slot = balance_slot
+
+    def to_dict(self):
+        return {"slot": self.slot, "signature": self.signature, "lamports": self.lamports,
+                "balance_slot": self.balance_slot}
+
+
+class CheckpointStore:
+    """Sichert je Wallet den letzten verarbeiteten Slot, die Signatur und den Kontostand."""
+
+    def __init__(self, path: str = CHECKPOINT_PATH, max_age: float = MAX_AGE):
+        self.path = path  # None: nur im Speicher
+        self.max_age = max_age
+        self.checkpoints = {}  # Adresse -> Checkpoint
+        self.saved_at = None  # Unix-Zeit der geladenen bzw. letzten Sicherung
+        self.dirty = False
+        self.saves = 0
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.saved_at = data["saved_at"]
+            self.checkpoints = {address: Checkpoint(**entry) for address, entry in data["wallets"].items()}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Ohne Checkpoints startet der Worker kalt, wie beim ersten Start
+            log.warning("Ignoring unreadable checkpoint file %s: %s", self.path, e)
+            self.saved_at = None
+            self.checkpoints = {}
+
+    def fresh(self):
+        """True, wenn die geladenen Kontostände jung genug für einen Warmstart sind."""
+        return self.saved_at is not None and time.time() - self.saved_at <= self.max_age
+
+    def get(self, address: str):
+        return self.checkpoints.get(address)
+
+    def record(self, address: str, slot: int, signature: str = None):
+        """Vermerkt eine verarbeitete Notification."""
+        checkpoint = self.checkpoints.get(address)
+        if checkpoint is None:
+            checkpoint = self.checkpoints[address] = Checkpoint()
+        if slot is not None and (checkpoint.slot is None or slot >= checkpoint.slot):
+            checkpoint.slot = slot
+            checkpoint.signature = signature
+            self.dirty = True
+
+    def discard(self, address: str):
+        if self.checkpoints.pop(address, None) is not None:
+            self.dirty = True
+
+    def snapshot(self, addresses, balances):
+        """Serialisiert die Checkpoints der Wallets samt aktuellem Stand aus dem Kontostand-Spiegel."""
+        wallets = {}
+        for address in addresses:
+            checkpoint = self.checkpoints.get(address)
+            if checkpoint is None:
+                checkpoint = self.checkpoints[address] = Checkpoint()
+            last = balances.last(address)
+            if last is not None:
+                checkpoint.lamports, checkpoint.balance_slot = last
+            wallets[address] = checkpoint.to_dict()
+        self.dirty = False
+        return json.dumps({"saved_at": time.time(), "wallets": wallets}, separators=(",", ":"))
+
+    def write(self, content: str):
+        """Schreibt eine mit `snapshot` erzeugte Sicherung; läuft im Threadpool."""
+        if self.path is None:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, self.path)
+        self.saved_at = time.time()
+        self.saves += 1
+
+    def stats(self):
+        return {"wallets": len(self.checkpoints), "saves": self.saves, "saved_at": self.saved_at,
+                "max_age": self.max_age}
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from app.blockhash import MAX_BLOCKHASH_AGE
+from app.metrics import metrics
+from app.ratelimit import BACKGROUND
+from app.logs import get_logger
+
+log = get_logger("confirmations")
+
+POLL_INTERVAL = 1.0  # Sekunden zwischen zwei Statusabfragen
+MAX_SIGNATURES = 256  # Obergrenze von getSignatureStatuses je Aufruf
+MAX_RESUBMITS = 1  # Neue Versuche je abgelaufener Kopie
+MAX_AGE = 180.0  # Sekunden nach dem ersten Senden, ab denen nicht mehr nachgesendet wird; None: immer
+COMMITMENT = "confirmed"
+
+# Ergebnisse einer verfolgten Signatur
+LANDED = "landed"
+FAILED = "failed"
+EXPIRED = "expired"
+RESUBMITTED = "resubmitted"  # Abgelaufen und unter neuer Signatur erneut gesendet
+LANDED_STATUSES = ("confirmed", "finalized")
+
+
+class PendingSignature:
+    """Eine gesendete, noch nicht aufgelöste Transaktion mit den Transfers für einen neuen Versuch."""
+
+    __slots__ = ("signature", "last_valid_block_height", "transfers", "payer", "attempts", "first_sent")
+
+    def __init__(self, signature: str, last_valid_block_height: int, transfers: list, payer, attempts: int,
+                 first_sent: float):
+        self.signature = signature
+        self.last_valid_block_height = last_valid_block_height
+        self.transfers = transfers  # [(Empfänger, Lamports)]
+        self.payer = payer  # Keypair des zahlenden Follower-Kontos
+        self.attempts = attempts  # Bisherige Neuversuche
+        self.first_sent = first_sent
+
+
+class ConfirmationTracker:
+    """Verfolgt alle offenen Signaturen gesendeter Kopien gemeinsam bis zu ihrem Ergebnis."""
+
+    def __init__(self, rpc, blockhashes, resend, poll_interval: float = POLL_INTERVAL,
+                 max_resubmits: int = MAX_RESUBMITS, max_age: float = MAX_AGE, batch_size: int = MAX_SIGNATURES):
+        self.rpc = rpc
+        self.blockhashes = blockhashes
+        self.resend = resend  # async (Zahler, Transfers) -> (Signatur oder None, lastValidBlockHeight)
+        self.poll_interval = poll_interval
+        self.max_resubmits = max_resubmits
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.pending = {}  # Signatur -> PendingSignature
+        self.listeners = []  # (PendingSignature, Ergebnis, neue Signatur oder None)
+        self.results = dict.fromkeys((LANDED, FAILED, EXPIRED, RESUBMITTED), 0)
+        self.polls = 0
+        self.errors = 0
+        self.task = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def track(self, signature: str, last_valid_block_height: int, transfers: list, payer=None, attempts: int = 0,
+              first_sent: float = None):
+        """Nimmt eine gesendete Signatur in die nächste Statusabfrage auf."""
+        if last_valid_block_height is None:
+            # Blockhash nicht mehr im Cache: Gültigkeit ab jetzt schätzen
+            height = self.blockhashes.estimated_block_height()
+            last_valid_block_height = height + MAX_BLOCKHASH_AGE if height is not None else None
+        self.pending[signature] = PendingSignature(
+            signature, last_valid_block_height, transfers, payer, attempts,
+            first_sent if first_sent is not None else time.monotonic())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self.pending:
+                continue
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                metrics.errors.inc("confirmations")
+                log.error("Error polling signature statuses: %s", e)
+
+    async def poll(self):
+        """Fragt alle offenen Signaturen in einem JSON-RPC-Batch ab und löst sie auf."""
+        signatures = list(self.pending)
+        chunks = [signatures[i:i + self.batch_size] for i in range(0, len(signatures), self.batch_size)]
+        config = {"searchTransactionHistory": False}
+        results = await self.rpc.abatch([("getSignatureStatuses", [chunk, config]) for chunk in chunks],
+                                        priority=BACKGROUND)
+        self.polls += 1
+        unseen = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                self.errors += 1
+                log.warning("Error fetching signature statuses: %s", result)
+                continue
+            for signature, status in zip(chunk, result["value"]):
+                if status is None:
+                    unseen.append(signature)
+                elif status.get("err") is not None:
+                    self._resolve(signature, FAILED)
+                elif status.get("confirmationStatus") in LANDED_STATUSES:
+                    self._resolve(signature, LANDED)
+                # processed: schon in einem Block, das Ergebnis steht noch aus
+        if unseen:
+            await self._expire(unseen)
+
+    async def _expire(self, signatures: list):
+        """Löst Signaturen ohne Status auf, deren Blockhash nicht mehr gültig ist."""
+        limits = [self.pending[s].last_valid_block_height for s in signatures
+                  if self.pending[s].last_valid_block_height is not None]
+        if not limits:
+            return
+        # Die Schätzung des Blockhash-Caches erspart den Aufruf, solange nichts abgelaufen sein kann
+        estimate = self.blockhashes.estimated_block_height()
+        if estimate is not None and estimate <= min(limits):
+            return
+        height = await self.rpc.arequest("getBlockHeight", [{"commitment": COMMITMENT}], priority=BACKGROUND)
+        expired = [self.pending.pop(s) for s in signatures
+                   if self.pending[s].last_valid_block_height is not None
+                   and height > self.pending[s].last_valid_block_height]
+        if expired:
+            await asyncio.gather(*(self._expired(pending) for pending in expired))
+
+    def _may_resubmit(self, pending: PendingSignature):
+        if pending.attempts >= self.max_resubmits:
+            return False
+        return self.max_age is None or time.monotonic() - pending.first_sent <= self.max_age
+
+    async def _expired(self, pending: PendingSignature):
+        signature = None
+        if self._may_resubmit(pending):
+            try:
+                signature, last_valid_block_height = await self.resend(pending.payer, pending.transfers)
+            except Exception as e:
+                self.errors += 1
+                log.warning("Error resubmitting transaction %s: %s", pending.signature, e,
+                            extra={"signature": pending.signature})
+        if not signature:
+            self._notify(pending, EXPIRED, None)
+            return
+        self.track(signature, last_valid_block_height, pending.transfers, pending.payer, pending.attempts + 1,
+                   pending.first_sent)
+        log.info("Resubmitted expired transaction %s as %s", pending.signature, signature,
+                 extra={"signature": pending.signature, "replacement": signature})
+        self._notify(pending, RESUBMITTED, signature)
+
+    def _resolve(self, signature: str, result: str):
+        self._notify(self.pending.pop(signature), result, None)
+
+    def _notify(self, pending: PendingSignature, result: str, replacement):
+        self.results[result] += 1
+        metrics.confirmations.inc(result)
+        for listener in list(self.listeners):
+            try:
+                listener(pending, result, replacement)
+            except Exception as e:
+                metrics.errors.inc("confirmations")
+                log.exception("Error in confirmation listener: %s", e)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "pending": len(self.pending),
+            "oldest_pending_s": round(max((now - p.first_sent for p in self.pending.values()), default=0.0), 2),
+            "polls": self.polls,
+            "errors": self.errors,
+            "poll_interval": self.poll_interval,
+            "max_resubmits": self.max_resubmits,
+            **self.results,
+        }
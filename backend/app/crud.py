@@ -1,5 +1,18 @@
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .models import Wallet
+from .models import CopiedTrade, Wallet, WalletTombstone, SyncVersion, reserve_row_versions
+
+
+def _wallet_dict(wallet: Wallet):
+    return {
+        "id": wallet.id,
+        "wallet_address": wallet.wallet_address,
+        "pnl": wallet.pnl,
+        "active_trades": wallet.active_trades if wallet.active_trades is not None else 0,
+        "allocation_percentage": wallet.allocation_percentage if wallet.allocation_percentage is not None else 10.0,
+    }
 
 
 def add_wallet(db: Session, wallet):
@@ -33,29 +46,14 @@ def remove_wallet(db: Session, wallet_id: int):
 def get_wallets(db: Session):
     """Gibt alle Wallets in der Datenbank zurück."""
     wallets = db.query(Wallet).all()
-    return [
-        {
-            "id": wallet.id,
-            "wallet_address": wallet.wallet_address,
-            "pnl": wallet.pnl,
-            "active_trades": wallet.active_trades if wallet.active_trades is not None else 0,
-            "allocation_percentage": wallet.allocation_percentage if wallet.allocation_percentage is not None else 10.0,
-        }
-        for wallet in wallets
-    ]
+    return [_wallet_dict(wallet) for wallet in wallets]
 
 
 def get_wallet_by_id(db: Session, wallet_id: int):
     """Gibt die Details einer Wallet anhand ihrer ID zurück."""
     wallet = db.query(Wallet).filter(Wallet.id == wallet_id).first()
     if wallet:
-        return {
-            "id": wallet.id,
-            "wallet_address": wallet.wallet_address,
-            "pnl": wallet.pnl,
-            "active_trades": wallet.active_trades if wallet.active_trades is not None else 0,
-            "allocation_percentage": wallet.allocation_percentage if wallet.allocation_percentage is not None else 10.0,
-        }
+        return _wallet_dict(wallet)
     return {"status": "failure", "message": "Wallet not found"}
 
 
@@ -102,3 +100,196 @@ def update_wallet_active_trades(db: Session, wallet_id: int, active_trades: int)
             "active_trades": wallet.active_trades
         }
     return {"status": "failure", "message": "Wallet not found"}
+
+
+# Asynchrone Varianten für die FastAPI-Routen, damit DB-Zugriffe den Event-Loop nicht blockieren
+
+
+async def _get_wallet_async(db: AsyncSession, wallet_id: int):
+    return await db.get(Wallet, wallet_id)
+
+
+async def add_wallet_async(db: AsyncSession, wallet):
+    """Fügt eine neue Wallet zur Datenbank hinzu."""
+    existing_wallet = await db.scalar(select(Wallet.id).where(Wallet.wallet_address == wallet.wallet_address))
+    if existing_wallet:
+        return {"status": "failure", "message": "Wallet address already exists."}
+    db_wallet = Wallet(wallet_address=wallet.wallet_address, allocation_percentage=10.0, active_trades=0)
+    db.add(db_wallet)
+    await db.commit()
+    await db.refresh(db_wallet)
+    return {"status": "success", "wallet": {
+        "id": db_wallet.id,
+        "wallet_address": db_wallet.wallet_address,
+        "allocation_percentage": db_wallet.allocation_percentage,
+        "active_trades": db_wallet.active_trades,
+        "pnl": db_wallet.pnl
+    }}
+
+
+async def remove_wallet_async(db: AsyncSession, wallet_id: int):
+    """Entfernt eine Wallet anhand ihrer ID."""
+    wallet = await _get_wallet_async(db, wallet_id)
+    if wallet:
+        await db.delete(wallet)
+        await db.commit()
+        return {"status": "success", "wallet_id": wallet_id}
+    return {"status": "failure", "message": "Wallet not found"}
+
+
+async def get_wallets_async(db: AsyncSession):
+    """Gibt alle Wallets in der Datenbank zurück."""
+    wallets = await db.scalars(select(Wallet))
+    return [_wallet_dict(wallet) for wallet in wallets]
+
+
+async def get_wallet_by_id_async(db: AsyncSession, wallet_id: int):
+    """Gibt die Details einer Wallet anhand ihrer ID zurück."""
+    wallet = await _get_wallet_async(db, wallet_id)
+    if wallet:
+        return _wallet_dict(wallet)
+    return {"status": "failure", "message": "Wallet not found"}
+
+
+async def set_allocation_async(db: AsyncSession, wallet_id: int, allocation: float):
+    """Setzt den Allokationsprozentsatz für eine Wallet."""
+    wallet = await _get_wallet_async(db, wallet_id)
+    if wallet:
+        wallet.allocation_percentage = allocation
+        await db.commit()
+        return {
+            "status": "success",
+            "wallet_id": wallet.id,
+            "allocation_percentage": wallet.allocation_percentage
+        }
+    return {"status": "failure", "message": "Wallet not found"}
+
+
+async def update_wallet_pnl_async(db: AsyncSession, wallet_id: int, pnl: float):
+    """Aktualisiert den PnL (Profit and Loss) einer Wallet."""
+    wallet = await _get_wallet_async(db, wallet_id)
+    if wallet:
+        wallet.pnl = pnl
+        await db.commit()
+        return {
+            "status": "success",
+            "wallet_id": wallet.id,
+            "pnl": wallet.pnl
+        }
+    return {"status": "failure", "message": "Wallet not found"}
+
+
+async def update_wallet_active_trades_async(db: AsyncSession, wallet_id: int, active_trades: int):
+    """Aktualisiert die Anzahl aktiver Trades einer Wallet."""
+    wallet = await _get_wallet_async(db, wallet_id)
+    if wallet:
+        wallet.active_trades = active_trades
+        await db.commit()
+        return {
+            "status": "success",
+            "wallet_id": wallet.id,
+            "active_trades": wallet.active_trades
+        }
+    return {"status": "failure", "message": "Wallet not found"}
+
+
+async def get_wallets_version_async(db: AsyncSession):
+    """Gibt den aktuellen Änderungsstand aller Wallets zurück."""
+    return await db.scalar(select(SyncVersion.value).where(SyncVersion.id == 1)) or 0
+
+
+async def get_wallets_page_async(db: AsyncSession, cursor: int = None, limit: int = None):
+    """Keyset-Pagination nach ID. Gibt (Wallets, nächster Cursor oder None) zurück."""
+    query = select(Wallet).order_by(Wallet.id)
+    if cursor is not None:
+        query = query.where(Wallet.id > cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    wallets = [_wallet_dict(wallet) for wallet in await db.scalars(query)]
+    next_cursor = wallets[-1]["id"] if limit is not None and len(wallets) == limit else None
+    return wallets, next_cursor
+
+
+async def get_wallet_changes_async(db: AsyncSession, since: int, limit: int):
+    """Gibt (bis zu `limit` Änderungen nach `since` inklusive Löschungen, weitere vorhanden) zurück."""
+    upserts = list(await db.scalars(
+        select(Wallet).where(Wallet.row_version > since).order_by(Wallet.row_version).limit(limit)))
+    deletes = list(await db.scalars(
+        select(WalletTombstone).where(WalletTombstone.row_version > since)
+        .order_by(WalletTombstone.row_version).limit(limit)))
+    changes = [{"op": "upsert", "version": wallet.row_version, "wallet": _wallet_dict(wallet)} for wallet in upserts]
+    changes += [
+        {"op": "delete", "version": tombstone.row_version, "wallet_id": tombstone.wallet_id,
+         "wallet_address": tombstone.wallet_address}
+        for tombstone in deletes
+    ]
+    changes.sort(key=lambda change: change["version"])
+    # Nicht geladene oder abgeschnittene Zeilen haben immer eine höhere Version als die letzte zurückgegebene
+    has_more = len(changes) > limit or len(upserts) == limit or len(deletes) == limit
+    return changes[:limit], has_more
+
+
+async def add_wallets_bulk_async(db: AsyncSession, rows: list):
+    """Legt (Adresse, Allokation)-Paare in einer Transaktion an und überspringt vorhandene Adressen."""
+    addresses = [address for address, _ in rows]
+    for attempt in range(2):
+        existing = set(await db.scalars(select(Wallet.wallet_address).where(Wallet.wallet_address.in_(addresses))))
+        new_rows = [(address, allocation) for address, allocation in rows if address not in existing]
+        if not new_rows:
+            return {}, existing
+        # Core-Insert umgeht die Mapper-Events, daher Versionen selbst vergeben
+        last_version = await db.run_sync(lambda session: reserve_row_versions(session.connection(), len(new_rows)))
+        first_version = last_version - len(new_rows) + 1
+        try:
+            await db.execute(insert(Wallet.__table__), [
+                {"wallet_address": address, "pnl": 0.0, "active_trades": 0,
+                 "allocation_percentage": allocation, "row_version": first_version + i}
+                for i, (address, allocation) in enumerate(new_rows)
+            ])
+            await db.commit()
+            break
+        except IntegrityError:
+            # Paralleles Anlegen derselben Adresse: Bestand neu lesen und einmal wiederholen
+            await db.rollback()
+            if attempt:
+                raise
+    created = await db.scalars(
+        select(Wallet).where(Wallet.wallet_address.in_([address for address, _ in new_rows])))
+    return {wallet.wallet_address: _wallet_dict(wallet) for wallet in created}, existing
+
+
+def _trade_dict(trade: CopiedTrade):
+    return {
+        "id": trade.id,
+        "leader_address": trade.leader_address,
+        "leader_signature": trade.leader_signature,
+        "slot": trade.slot,
+        "recipient": trade.recipient,
+        "follower": trade.follower,
+        "amount": trade.amount,
+        "tx_id": trade.tx_id,
+        "status": trade.status,
+        "pnl": trade.pnl,
+        "created_at": trade.created_at,
+        "updated_at": trade.updated_at,
+    }
+
+
+async def get_copied_trades_async(db: AsyncSession, leader_address: str = None, since: float = None,
+                                  until: float = None, cursor: int = None, limit: int = 100,
+                                  follower: str = None):
+    """Trades aus dem Ledger nach Leader, Follower und Zeitraum; gibt (Trades, nächster Cursor) zurück."""
+    query = select(CopiedTrade).order_by(CopiedTrade.id).limit(limit)
+    if leader_address is not None:
+        query = query.where(CopiedTrade.leader_address == leader_address)
+    if follower is not None:
+        query = query.where(CopiedTrade.follower == follower)
+    if since is not None:
+        query = query.where(CopiedTrade.created_at >= since)
+    if until is not None:
+        query = query.where(CopiedTrade.created_at < until)
+    if cursor is not None:
+        query = query.where(CopiedTrade.id > cursor)
+    trades = [_trade_dict(trade) for trade in await db.scalars(query)]
+    next_cursor = trades[-1]["id"] if len(trades) == limit else None
+    return trades, next_cursor
@@ -1,11 +1,55 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite:///./wallets.db"  # SQLite für einfache Tests
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./wallets.db")  # SQLite für einfache Tests
+
+# Asynchrone Treiber: aiosqlite für SQLite, asyncpg für Postgres
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # Leser blockieren den Schreiber nicht mehr
+    "PRAGMA synchronous=NORMAL",  # Im WAL-Modus sicher und deutlich schneller als FULL
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",  # ca. 20 MB Page-Cache
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def async_url(url: str):
+    """Leitet aus einer synchronen Datenbank-URL die URL mit asynchronem Treiber ab."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme.split("+")[0], scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+if IS_SQLITE:
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+else:
+    engine = create_engine(DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                       pool_pre_ping=True)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -16,3 +60,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+CAPACITY = int(os.getenv("DEDUP_CAPACITY", "100000"))
+TTL = float(os.getenv("DEDUP_TTL", "600"))  # Sekunden, die ein verarbeitetes Ereignis wiedererkannt wird
+JOURNAL_PATH = os.getenv("DEDUP_PATH", "./dedup.log")
+COMPACT_FACTOR = 4  # Journal neu schreiben, wenn es so viel größer als die Kapazität ist
+
+
+def notification_key(wallet_address: str, slot, transaction: dict):
+    """Schlüssel aus Leader, Slot und Signatur bzw. Inhalts-Hash der Transaktion."""
+    signatures = transaction.get("signatures") if isinstance(transaction, dict) else None
+    if signatures:
+        identity = signatures[0]
+    else:
+        content = json.dumps(transaction, sort_keys=True, separators=(",", ":"))
+        identity = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+    return f"{wallet_address}:{slot}:{identity}"
+
+
+class DedupIndex:
+    """Begrenzter LRU-Index verarbeiteter Notifications mit TTL und Journal."""
+
+    def __init__(self, capacity: int = CAPACITY, ttl: float = TTL, path: str = JOURNAL_PATH):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.path = path  # None: nur im Speicher
+        self.entries = OrderedDict()  # Schlüssel -> Zeitpunkt (Unix-Zeit)
+        self.file = None
+        self.journal_lines = 0
+        self.hits = 0
+
+    def load(self):
+        """Liest das Journal ein und öffnet es zum Anhängen."""
+        if self.path is None:
+            return
+        now = time.time()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    timestamp, _, key = line.rstrip("\n").partition(" ")
+                    try:
+                        seen_at = float(timestamp)
+                    except ValueError:
+                        continue
+                    if key and now - seen_at < self.ttl:
+                        self.entries[key] = seen_at
+                        self.entries.move_to_end(key)
+            self._evict(now)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        self.compact()
+
+    def seen(self, key: str):
+        """Gibt True zurück, wenn der Schlüssel bekannt ist; sonst wird er vermerkt."""
+        now = time.time()
+        self._evict(now)
+        if key in self.entries:
+            self.entries[key] = now
+            self.entries.move_to_end(key)
+            self.hits += 1
+            # Auch die Auffrischung ins Journal, sonst liefe der TTL nach einem Neustart ab der ersten Sichtung
+            self._append(key, now)
+            return True
+        self.entries[key] = now
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        self._append(key, now)
+        return False
+
+    def known(self, key: str):
+        """Prüft einen Schlüssel, ohne ihn zu vermerken."""
+        seen_at = self.entries.get(key)
+        return seen_at is not None and time.time() - seen_at < self.ttl
+
+    def _evict(self, now: float):
+        # Einträge sind nach letztem Zugriff sortiert, abgelaufene stehen vorne
+        while self.entries:
+            key, seen_at = next(iter(self.entries.items()))
+            if now - seen_at < self.ttl:
+                break
+            self.entries.popitem(last=False)
+
+    def _append(self, key: str, now: float):
+        if self.file is None:
+            return
+        self.file.write(f"{now:.3f} {key}\n")
+        self.file.flush()
+        self.journal_lines += 1
+        if self.journal_lines > COMPACT_FACTOR * self.capacity:
+            self.compact()
+
+    def compact(self):
+        """Schreibt das Journal mit den aktuell gültigen Einträgen neu."""
+        if self.path is None:
+            return
+        if self.file is not None:
+            self.file.close()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            for key, seen_at in self.entries.items():
+                f.write(f"{seen_at:.3f} {key}\n")
+        os.replace(temp_path, self.path)
+        self.journal_lines = len(self.entries)
+        self.file = open(self.path, "a")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __len__(self):
+        return len(self.entries)
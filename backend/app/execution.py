@@ -0,0 +1,187 @@
+import asyncio
+import time
+from collections import deque
+from app.metrics import metrics
+from app.logs import get_logger
+
+log = get_logger("execution")
+
+QUEUE_SIZE = 1000
+EXECUTORS = 4
+DROP_OLDEST = "drop_oldest"
+REJECT = "reject"
+WAIT_SAMPLES = 1024  # Anzahl der Wartezeiten für Perzentile
+STOP_TIMEOUT = 10.0  # Sekunden, die stop() auf laufende Intents wartet
+
+QUEUED = "queued"
+RUNNING = "running"
+DROPPED = "dropped"
+
+
+class CopyIntent:
+    """Ein zu kopierender Transfer eines Leader-Wallets."""
+
+    __slots__ = ("wallet_address", "recipient", "amount", "allocation", "trace", "signature", "slot",
+                 "enqueued_at", "state")
+
+    def __init__(self, wallet_address: str, recipient: str, amount: float, allocation: float, trace=None,
+                 signature: str = None, slot: int = None):
+        self.wallet_address = wallet_address
+        self.recipient = recipient
+        self.amount = amount  # SOL, die der Leader überwiesen hat
+        self.allocation = allocation  # Anteil 0-1
+        self.trace = trace
+        self.signature = signature  # Signatur der Leader-Transaktion, falls bekannt
+        self.slot = slot
+        self.enqueued_at = None
+        self.state = None
+
+    def __repr__(self):
+        return f"CopyIntent({self.wallet_address} -> {self.recipient}, {self.amount} SOL)"
+
+
+class TradeQueue:
+    """Begrenzte Warteschlange für Copy-Intents mit einem Pool von Executoren."""
+
+    def __init__(self, handler, maxsize: int = QUEUE_SIZE, executors: int = EXECUTORS,
+                 overflow: str = DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, REJECT):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.maxsize = maxsize
+        self.executors = executors
+        self.overflow = overflow
+        self.pending = {}  # Wallet -> deque[CopyIntent]
+        self.order = deque()  # Alle Intents in Ankunftsreihenfolge, für drop_oldest
+        self.scheduled = set()  # Wallets, die in `ready` stehen oder gerade bearbeitet werden
+        self.ready = None
+        self.tasks = []
+        self.busy = set()  # Executor-Tasks, die gerade einen Intent bearbeiten
+        self.stopping = False
+        self.size = 0
+        self.max_depth = 0
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.errors = 0
+        self.wait_times = deque(maxlen=WAIT_SAMPLES)
+
+    def start(self):
+        if self.tasks:
+            return
+        self.stopping = False
+        self.ready = asyncio.Queue()
+        for wallet in self.pending:
+            self.scheduled.add(wallet)
+            self.ready.put_nowait(wallet)
+        self.tasks = [asyncio.create_task(self._executor()) for _ in range(self.executors)]
+
+    async def stop(self, timeout: float = STOP_TIMEOUT):
+        """Beendet die Executoren; laufende Intents werden zu Ende bearbeitet, wartende bleiben für start()."""
+        self.stopping = True
+        for task in self.tasks:
+            if task not in self.busy:
+                task.cancel()
+        if self.tasks:
+            # Ein abgebrochener Intent wäre womöglich halb ausgeführt und ginge verloren
+            await asyncio.wait(self.tasks, timeout=timeout)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.busy.clear()
+        self.scheduled.clear()
+
+    def submit(self, intent: CopyIntent):
+        """Reiht einen Intent ein. Gibt False zurück, wenn er abgewiesen wurde."""
+        if self.size >= self.maxsize:
+            if self.overflow == REJECT:
+                self.rejected += 1
+                return False
+            self._drop_oldest()
+
+        intent.enqueued_at = time.monotonic()
+        intent.state = QUEUED
+        wallet = intent.wallet_address
+        self.pending.setdefault(wallet, deque()).append(intent)
+        self.order.append(intent)
+        if len(self.order) > 2 * self.maxsize:
+            self.order = deque(i for i in self.order if i.state == QUEUED)
+        self.size += 1
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.size)
+        if wallet not in self.scheduled and self.ready is not None:
+            self.scheduled.add(wallet)
+            self.ready.put_nowait(wallet)
+        return True
+
+    def _drop_oldest(self):
+        while self.order:
+            intent = self.order.popleft()
+            if intent.state != QUEUED:
+                continue
+            # Der älteste wartende Intent steht immer vorne in der Queue seiner Wallet
+            queue = self.pending[intent.wallet_address]
+            queue.popleft()
+            if not queue:
+                del self.pending[intent.wallet_address]
+            intent.state = DROPPED
+            self.size -= 1
+            self.dropped += 1
+            return
+
+    async def _executor(self):
+        task = asyncio.current_task()
+        while not self.stopping:
+            wallet = await self.ready.get()
+            queue = self.pending.get(wallet)
+            if not queue:
+                self.scheduled.discard(wallet)
+                continue
+            intent = queue.popleft()
+            if not queue:
+                del self.pending[wallet]
+            intent.state = RUNNING
+            self.size -= 1
+            self.wait_times.append(time.monotonic() - intent.enqueued_at)
+            self.busy.add(task)
+            try:
+                await self.handler(intent)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                metrics.errors.inc("execution")
+                log.exception("Error executing %s: %s", intent, e)
+            finally:
+                self.busy.discard(task)
+                self.processed += 1
+                # Hinten anstellen, damit andere Wallets nicht verhungern
+                if wallet in self.pending:
+                    self.ready.put_nowait(wallet)
+                else:
+                    self.scheduled.discard(wallet)
+
+    def stats(self):
+        waits = sorted(self.wait_times)
+
+        def percentile(p):
+            return waits[min(int(len(waits) * p), len(waits) - 1)] if waits else 0.0
+
+        return {
+            "depth": self.size,
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "wallets_pending": len(self.pending),
+            "executors": self.executors,
+            "overflow_policy": self.overflow,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "wait_p50": percentile(0.5),
+            "wait_p99": percentile(0.99),
+            "wait_max": waits[-1] if waits else 0.0,
+        }
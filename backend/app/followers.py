@@ -0,0 +1,95 @@
+import numpy as np
+from solders.keypair import Keypair
+
+
+class Follower:
+    """Ein eigenes Konto, das Leader-Trades kopiert."""
+
+    __slots__ = ("keypair", "pubkey", "allocations", "default_allocation", "primary")
+
+    def __init__(self, keypair: Keypair, allocations: dict = None, default_allocation: float = None,
+                 primary: bool = False):
+        self.keypair = keypair
+        self.pubkey = str(keypair.pubkey())
+        self.allocations = dict(allocations or {})
+        self.default_allocation = default_allocation
+        self.primary = primary  # Über /set_private_key/ gesetztes Hauptkonto
+
+    def allocation(self, leader_address: str, leader_allocation: float):
+        allocation = self.allocations.get(leader_address, self.default_allocation)
+        return leader_allocation if allocation is None else allocation
+
+    def to_dict(self):
+        """Öffentliche Sicht ohne Schlüssel, Allokationen in Prozent wie bei den Wallets."""
+        return {
+            "public_key": self.pubkey,
+            "primary": self.primary,
+            "allocation_percentage": None if self.default_allocation is None else self.default_allocation * 100,
+            "allocations": {leader: allocation * 100 for leader, allocation in self.allocations.items()},
+        }
+
+
+class FollowerSet:
+    """Die Konten, auf die jeder Leader-Trade verteilt wird."""
+
+    def __init__(self):
+        self.followers = {}  # Öffentlicher Schlüssel -> Follower, in Einfügereihenfolge
+        self.vectors = {}  # Leader -> (Leader-Allokation, Follower, Allokationen)
+
+    def __len__(self):
+        return len(self.followers)
+
+    def __iter__(self):
+        return iter(list(self.followers.values()))
+
+    def get(self, pubkey: str):
+        return self.followers.get(pubkey)
+
+    @property
+    def primary(self):
+        return next((f for f in self.followers.values() if f.primary), None)
+
+    def add(self, keypair: Keypair, allocations: dict = None, default_allocation: float = None,
+            primary: bool = False):
+        follower = Follower(keypair, allocations, default_allocation, primary)
+        existing = self.followers.get(follower.pubkey)
+        if existing is not None and existing.primary:
+            follower.primary = True  # Das Hauptkonto bleibt Hauptkonto, auch mit eigenen Allokationen
+        elif primary:
+            previous = self.primary
+            if previous is not None:
+                del self.followers[previous.pubkey]
+        self.followers[follower.pubkey] = follower
+        self.vectors.clear()
+        return follower
+
+    def remove(self, pubkey: str):
+        follower = self.followers.pop(pubkey, None)
+        self.vectors.clear()
+        return follower
+
+    def set_allocation(self, pubkey: str, leader_address: str, allocation: float = None):
+        """Setzt den Anteil eines Followers für eine Leader-Wallet; None entfernt die Sonderregel."""
+        follower = self.followers.get(pubkey)
+        if follower is None:
+            return None
+        if allocation is None:
+            follower.allocations.pop(leader_address, None)
+        else:
+            follower.allocations[leader_address] = allocation
+        self.vectors.clear()
+        return follower
+
+    def forget(self, leader_address: str):
+        """Verwirft das Array einer nicht mehr überwachten Leader-Wallet."""
+        self.vectors.pop(leader_address, None)
+
+    def vector(self, leader_address: str, leader_allocation: float):
+        """Gibt (Follower, Allokationen als float64-Array) für eine Leader-Wallet zurück."""
+        entry = self.vectors.get(leader_address)
+        if entry is None or entry[0] != leader_allocation:
+            followers = list(self.followers.values())
+            allocations = np.fromiter((f.allocation(leader_address, leader_allocation) for f in followers),
+                                      dtype=np.float64, count=len(followers))
+            entry = self.vectors[leader_address] = (leader_allocation, followers, allocations)
+        return entry[1], entry[2]
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from sqlalchemy import bindparam, func, insert, select, update
+from .models import CopiedTrade, Wallet, reserve_row_versions
+from .metrics import metrics
+from .logs import get_logger
+
+log = get_logger("ledger")
+
+BATCH_SIZE = 500  # Einträge pro Schreibtransaktion
+FLUSH_INTERVAL = 0.5  # Sekunden, die Einträge höchstens im Speicher warten
+MAX_BUFFER = 50_000  # Danach werden bei dauerhaftem Datenbankfehler die ältesten Einträge verworfen
+
+SENT = "sent"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+EXPIRED = "expired"  # Blockhash abgelaufen, ohne dass die Transaktion gelandet ist
+ACTIVE_STATUSES = (SENT,)  # Zählen als aktive Trades der Leader-Wallet
+
+
+class TradeLedger:
+    """Schreibt kopierte Trades gebündelt in `copied_trades`."""
+
+    def __init__(self, session_factory, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 on_flush=None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.records = []
+        self.settlements = {}  # tx_id -> [Status, PnL-Delta]
+        self.replacements = {}  # Alte tx_id -> neue tx_id nach erneutem Senden
+        self.written = 0
+        self.wakeup = None
+        self.task = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+
+    def record(self, leader_address: str, amount: float, status: str, tx_id: str = None,
+               leader_signature: str = None, slot: int = None, recipient: str = None, pnl: float = 0.0,
+               follower: str = None):
+        """Vermerkt einen kopierten Trade; geschrieben wird im nächsten Batch."""
+        now = time.time()
+        self.records.append({
+            "leader_address": leader_address, "leader_signature": leader_signature, "slot": slot,
+            "recipient": recipient, "follower": follower, "amount": amount, "tx_id": tx_id, "status": status, "pnl": pnl,
+            "created_at": now, "updated_at": now,
+        })
+        self._wake()
+
+    def settle(self, tx_id: str, status: str, pnl: float = 0.0):
+        """Setzt den Status eines Trades und verbucht optional ein PnL-Delta."""
+        pending = self.settlements.get(tx_id)
+        if pending is None:
+            self.settlements[tx_id] = [status, pnl]
+        else:
+            pending[0] = status
+            pending[1] += pnl
+        self._wake()
+
+    def replace(self, tx_id: str, new_tx_id: str):
+        """Überträgt die Trades einer erneut gesendeten Transaktion auf deren neue Signatur."""
+        self.replacements[tx_id] = new_tx_id
+        if tx_id in self.settlements:
+            self.settlements[new_tx_id] = self.settlements.pop(tx_id)
+        self._wake()
+
+    def _wake(self):
+        if self.wakeup is not None and \
+                len(self.records) + len(self.settlements) + len(self.replacements) >= self.batch_size:
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self.records or self.settlements or self.replacements:
+                records, self.records = self.records[:self.batch_size], self.records[self.batch_size:]
+                settlements, replacements = {}, {}
+                if not self.records:
+                    # Erst wenn alle Trades geschrieben sind, damit Settlements ihren Eintrag finden
+                    settlements, self.settlements = self.settlements, {}
+                    replacements, self.replacements = self.replacements, {}
+                try:
+                    async with self.session_factory() as db:
+                        deltas = await db.run_sync(self._write, records, settlements, replacements)
+                        await db.commit()
+                except Exception as e:
+                    metrics.errors.inc("ledger")
+                    log.error("Error writing trade ledger: %s", e)
+                    # Für den nächsten Versuch zurücklegen, neuere Settlements haben Vorrang
+                    self.records[:0] = records
+                    del self.records[:max(len(self.records) - MAX_BUFFER, 0)]
+                    settlements.update(self.settlements)
+                    self.settlements = settlements
+                    replacements.update(self.replacements)
+                    self.replacements = replacements
+                    return
+                self.written += len(records)
+                if deltas and self.on_flush is not None:
+                    self.on_flush(deltas)
+
+    @staticmethod
+    def _write(session, records: list, settlements: dict, replacements: dict = None):
+        connection = session.connection()
+        trades = CopiedTrade.__table__
+        deltas = {}  # Leader -> [PnL-Delta, Active-Delta]
+
+        if records:
+            connection.execute(insert(trades), records)
+            for record in records:
+                delta = deltas.setdefault(record["leader_address"], [0.0, 0])
+                delta[0] += record["pnl"]
+                delta[1] += record["status"] in ACTIVE_STATUSES
+
+        if replacements:
+            connection.execute(
+                update(trades).where(trades.c.tx_id == bindparam("_old"))
+                .values(tx_id=bindparam("_new"), updated_at=time.time()),
+                [{"_old": old, "_new": new} for old, new in replacements.items()])
+
+        if settlements:
+            rows = connection.execute(
+                select(trades.c.id, trades.c.leader_address, trades.c.status, trades.c.tx_id)
+                .where(trades.c.tx_id.in_(list(settlements)))).all()
+            changes = []
+            for row in rows:
+                status, pnl = settlements[row.tx_id]
+                if status == row.status and not pnl:
+                    continue
+                changes.append({"_id": row.id, "_status": status, "_pnl": pnl})
+                delta = deltas.setdefault(row.leader_address, [0.0, 0])
+                delta[0] += pnl
+                delta[1] += (status in ACTIVE_STATUSES) - (row.status in ACTIVE_STATUSES)
+            if changes:
+                connection.execute(
+                    update(trades).where(trades.c.id == bindparam("_id"))
+                    .values(status=bindparam("_status"), pnl=trades.c.pnl + bindparam("_pnl"), updated_at=time.time()),
+                    changes)
+
+        deltas = {leader: delta for leader, delta in deltas.items() if delta[0] or delta[1]}
+        if deltas:
+            # Core-Update umgeht die Mapper-Events, daher Versionen selbst vergeben
+            wallets = Wallet.__table__
+            first_version = reserve_row_versions(connection, len(deltas)) - len(deltas) + 1
+            connection.execute(
+                update(wallets).where(wallets.c.wallet_address == bindparam("_address"))
+                .values(pnl=func.coalesce(wallets.c.pnl, 0.0) + bindparam("_pnl"),
+                        active_trades=func.coalesce(wallets.c.active_trades, 0) + bindparam("_active"),
+                        row_version=bindparam("_version")),
+                [{"_address": leader, "_pnl": delta[0], "_active": delta[1], "_version": first_version + i}
+                 for i, (leader, delta) in enumerate(deltas.items())])
+        return deltas
+
+    def stats(self):
+        return {"pending": len(self.records), "pending_settlements": len(self.settlements),
+                "pending_replacements": len(self.replacements), "written": self.written}
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = "copytrader"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Je Kategorie, z. B. "notifications=DEBUG,rpc=WARNING"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "notifications=100,copies=10")  # Je Kategorie 1 von N Einträgen
+LOG_FILE = os.getenv("LOG_FILE") or None  # None: stdout
+QUEUE_SIZE = 10_000  # Einträge, die auf den Schreib-Thread warten dürfen
+
+# Attribute eines LogRecord, die nicht als eigene Felder ausgegeben werden
+RESERVED = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+
+_state = None  # (Queue, QueueHandler, QueueListener) nach setup()
+_lock = threading.Lock()
+
+
+def get_logger(category: str):
+    """Logger einer Kategorie; Level und Sampling lassen sich je Kategorie einstellen."""
+    return logging.getLogger(f"{ROOT}.{category}")
+
+
+def parse_settings(value: str):
+    """Liest "kategorie=wert,..." in ein dict."""
+    settings = {}
+    for item in (value or "").split(","):
+        category, _, setting = item.partition("=")
+        if category.strip() and setting.strip():
+            settings[category.strip()] = setting.strip()
+    return settings
+
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile je Eintrag; Felder aus `extra` werden übernommen."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "category": record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Lässt von häufigen Einträgen unter WARNING nur jeden `every`-ten je Nachrichtenvorlage durch."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        count = self.counts.get(record.msg, 0)
+        self.counts[record.msg] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every  # Gewicht des Eintrags
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Reiht Einträge unformatiert ein und verwirft bei voller Queue, statt zu warten."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, sampling: str = LOG_SAMPLING, path: str = LOG_FILE,
+          stream=None, queue_size: int = QUEUE_SIZE):
+    """Leitet alle Kategorien über eine Queue an einen Schreib-Thread; mehrfache Aufrufe richten neu ein."""
+    global _state
+    with _lock:
+        _stop()
+        log_queue = queue.Queue(queue_size)
+        handler = NonBlockingQueueHandler(log_queue)
+        output = logging.FileHandler(path) if path else logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        listener = QueueListener(log_queue, output)
+        root = logging.getLogger(ROOT)
+        root.handlers = [handler]
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.propagate = False
+        for category, category_level in parse_settings(levels).items():
+            get_logger(category).setLevel(category_level.upper())
+        for category, every in parse_settings(sampling).items():
+            logger = get_logger(category)
+            logger.filters = [f for f in logger.filters if not isinstance(f, SamplingFilter)]
+            logger.addFilter(SamplingFilter(int(every)))
+        listener.start()
+        _state = (log_queue, handler, listener)
+
+
+def _stop():
+    global _state
+    if _state is not None:
+        _, _, listener = _state
+        listener.stop()  # Schreibt die restlichen Einträge
+        for handler in listener.handlers:
+            handler.close()
+        _state = None
+
+
+def shutdown():
+    with _lock:
+        _stop()
+
+
+def stats():
+    if _state is None:
+        return {}
+    log_queue, handler, _ = _state
+    return {"queued": log_queue.qsize(), "capacity": log_queue.maxsize, "dropped": handler.dropped,
+            "level": logging.getLevelName(logging.getLogger(ROOT).level)}
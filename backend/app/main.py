@@ -1,17 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import crud, models, schemas, database
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import backtest, bulk, crud, logs, models, schemas, database
 from app.worker import MonitoringWorker
+from app.registry import WalletRegistry, REMOVED
+from app.stream import hub, WALLET, WALLET_REMOVED, BALANCE
 from app.routes import router
 from app.solana_client import SolanaClient
 from contextlib import asynccontextmanager
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from app.metrics import metrics
+from app.ratelimit import TRADE, UI
 from solders.pubkey import Pubkey
+from app.logs import get_logger
+import asyncio
 import json
+import math
+import os
+
+WORKER_SHARDS = int(os.getenv("WORKER_SHARDS", "0"))  # Anzahl Shard-Prozesse, 0: alles im API-Prozess
+MAX_PAGE_SIZE = 1000
+MAX_CHANGES = 1000
+MAX_BACKTEST_ALLOCATIONS = 1000  # Allokationswerte je Backtest-Aufruf
+HISTORY_IMPORT_BATCH = 5000  # Zeilen, die beim Historien-Import gemeinsam im Threadpool geparst werden
+STREAM_KEEPALIVE = 15.0  # Sekunden bis zum Keepalive-Kommentar im Event-Stream
+
+# Strukturierte Logs über einen Schreib-Thread, bevor Worker und Client loslegen
+logs.setup()
+log = get_logger("api")
 
 # Initialisierung von SolanaClient und MonitoringWorker
 solana_client = SolanaClient()
-worker = MonitoringWorker(solana_client)
+registry = WalletRegistry()
+worker = MonitoringWorker(solana_client, registry, shards=WORKER_SHARDS)
+history = backtest.HistoryStore()
+
+
+def _publish_wallet(event, wallet):
+    if event == REMOVED:
+        hub.forget(WALLET, wallet["id"])
+        hub.publish_event(WALLET_REMOVED, {"id": wallet["id"], "wallet_address": wallet["wallet_address"]})
+    else:
+        hub.publish(WALLET, wallet["id"], dict(wallet))
+
+
+def _publish_balance(address, lamports, slot):
+    hub.publish(BALANCE, address, {"wallet_address": address, "balance": lamports / 10**9, "slot": slot})
+
+
+registry.add_listener(_publish_wallet)
+solana_client.balances.add_listener(_publish_balance)
 
 app = FastAPI()
 
@@ -20,57 +58,132 @@ app.include_router(router)
 
 # Datenbank initialisieren
 models.Base.metadata.create_all(bind=database.engine)
+models.upgrade_schema(database.engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Verwaltet die Lebensdauer der Anwendung."""
-    print("Starting monitoring worker...")
+    log.info("Starting monitoring worker...")
     await worker.start()
-    print("Monitoring worker started successfully. Backend is fully operational.")
+    log.info("Monitoring worker started successfully. Backend is fully operational.")
 
     yield  # Anwendung läuft hier
 
-    print("Stopping monitoring worker...")
+    log.info("Stopping monitoring worker...")
     await worker.stop()
-    print("Monitoring worker stopped successfully. Backend is shutting down.")
+    log.info("Monitoring worker stopped successfully. Backend is shutting down.")
+    logs.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
+metrics.gauge("trade_queue_depth", "Wartende Copy-Intents", lambda: worker.queue.size)
+metrics.gauge("ws_connections", "Offene WebSocket-Verbindungen", lambda: len(solana_client.subscriptions.connections))
+metrics.gauge("ws_subscriptions", "Aktive Wallet-Abos", lambda: len(solana_client.subscriptions.assignments))
+metrics.gauge("dedup_index_size", "Einträge im Deduplizierungs-Index", lambda: len(worker.dedup))
+metrics.gauge("blockhash_cache_requests", "Blockhash-Cache-Zugriffe nach Ergebnis",
+              lambda: {"hit": solana_client.blockhashes.hits, "miss": solana_client.blockhashes.misses}, ("result",))
+metrics.gauge("wallet_readiness", "Überwachte Wallets nach Bereitschaft", lambda: dict(worker.readiness_counts),
+              ("state",))
+metrics.gauge("log_entries_dropped", "Wegen voller Log-Queue verworfene Einträge", lambda: logs.stats().get("dropped", 0))
+metrics.gauge("balance_cache_requests", "Kontostand-Spiegel-Zugriffe nach Ergebnis",
+              lambda: {"hit": solana_client.balances.hits, "miss": solana_client.balances.misses}, ("result",))
+
 @app.post("/wallets/")
-async def add_wallet(wallet: schemas.Wallet, db: Session = Depends(database.get_db)):
+async def add_wallet(wallet: schemas.Wallet, db: AsyncSession = Depends(database.get_async_db)):
     """API zum Hinzufügen einer neuen Wallet."""
-    result = crud.add_wallet(db, wallet)
+    result = await crud.add_wallet_async(db, wallet)
     if isinstance(result, dict) and result.get("status") == "failure":
         raise HTTPException(status_code=400, detail=result["message"])
+    registry.add(result["wallet"])
     return {"status": "success", "wallet": result["wallet"]}
 
 
 @app.delete("/wallets/{wallet_id}")
-async def remove_wallet(wallet_id: int, db: Session = Depends(database.get_db)):
+async def remove_wallet(wallet_id: int, db: AsyncSession = Depends(database.get_async_db)):
     """API zum Entfernen einer Wallet."""
-    result = crud.remove_wallet(db, wallet_id)
+    result = await crud.remove_wallet_async(db, wallet_id)
     if isinstance(result, dict) and result.get("status") == "failure":
         raise HTTPException(status_code=404, detail=result["message"])
+    registry.remove(wallet_id)
     return {"status": "success", "wallet_id": wallet_id}
 
 
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in header.split(","))
+
+
 @app.get("/wallets/")
-async def list_wallets(db: Session = Depends(database.get_db)):
-    """API zum Abrufen aller Wallets."""
-    wallets = crud.get_wallets(db)
-    return wallets if wallets else []
+async def list_wallets(request: Request, response: Response, cursor: Optional[int] = None,
+                       limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                       db: AsyncSession = Depends(database.get_async_db)):
+    """API zum Abrufen der Wallets, optional seitenweise und mit ETag."""
+    version = await crud.get_wallets_version_async(db)
+    etag = f'W/"{version}-{cursor or 0}-{limit or 0}"'
+    headers = {"ETag": etag, "X-Wallets-Version": str(version)}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    wallets, next_cursor = await crud.get_wallets_page_async(db, cursor, limit)
+    response.headers.update(headers)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return wallets
+
+
+@app.get("/wallets/changes")
+async def wallet_changes(since: int = Query(0, ge=0), limit: int = Query(MAX_CHANGES, ge=1, le=MAX_CHANGES),
+                         db: AsyncSession = Depends(database.get_async_db)):
+    """API für inkrementelle Updates: alle Änderungen nach der Version `since`."""
+    version = await crud.get_wallets_version_async(db)
+    changes, has_more = await crud.get_wallet_changes_async(db, since, limit)
+    if has_more and changes:
+        version = changes[-1]["version"]
+    return {"version": version, "has_more": has_more, "changes": changes}
+
+
+@app.post("/wallets/import")
+async def import_wallets(request: Request, format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")):
+    """API zum Massenimport von Wallets als NDJSON oder CSV."""
+    fmt = bulk.detect_format(request.headers.get("content-type"), format)
+    return await bulk.import_wallets(request.stream(), fmt, database.AsyncSessionLocal, on_created=registry.add)
+
+
+@app.get("/wallets/export")
+async def export_wallets(format: str = Query(bulk.NDJSON, pattern="^(ndjson|csv)$")):
+    """API zum Export aller Wallets als NDJSON oder CSV, seitenweise gestreamt."""
+    media_type = "text/csv" if format == bulk.CSV else "application/x-ndjson"
+    return StreamingResponse(bulk.export_wallets(format, database.AsyncSessionLocal), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="wallets.{format}"'})
 
 
 @app.put("/wallets/{wallet_id}/set_allocation/")
-async def set_allocation(wallet_id: int, allocation: schemas.Allocation, db: Session = Depends(database.get_db)):
+async def set_allocation(wallet_id: int, allocation: schemas.Allocation,
+                         db: AsyncSession = Depends(database.get_async_db)):
     """API zum Aktualisieren der Allokation einer Wallet."""
-    result = crud.set_allocation(db, wallet_id, allocation.percentage)
+    result = await crud.set_allocation_async(db, wallet_id, allocation.percentage)
     if isinstance(result, dict) and result.get("status") == "failure":
         raise HTTPException(status_code=404, detail=result["message"])
+    registry.set_allocation(wallet_id, result["allocation_percentage"])
     return result
 
 
+@app.get("/trades/")
+async def list_trades(response: Response, wallet_address: Optional[str] = None, since: Optional[float] = None,
+                      until: Optional[float] = None, cursor: Optional[int] = None,
+                      limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), follower: Optional[str] = None,
+                      db: AsyncSession = Depends(database.get_async_db)):
+    """API für das Trade-Ledger, gefiltert nach Leader-Wallet, Follower-Konto und Zeitraum (Unix-Zeit)."""
+    trades, next_cursor = await crud.get_copied_trades_async(db, wallet_address, since, until, cursor, limit,
+                                                             follower)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return trades
+
+
 @app.post("/set_private_key/")
 async def set_private_key(data: dict):
     """Setzt den privaten Schlüssel."""
@@ -84,11 +197,59 @@ async def set_private_key(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/followers/")
+async def list_followers():
+    """Gibt die Follower-Konten mit ihren Allokationen zurück, ohne Schlüssel."""
+    return [follower.to_dict() for follower in solana_client.followers]
+
+
+@app.post("/followers/")
+async def add_follower(data: schemas.Follower):
+    """Fügt ein Follower-Konto hinzu, das jeden Leader-Trade mit eigener Allokation mitkopiert."""
+    default = data.allocation_percentage / 100 if data.allocation_percentage is not None else None
+    try:
+        follower = solana_client.add_follower(data.key, {leader: percentage / 100 for leader, percentage
+                                                         in data.allocations.items()}, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return follower.to_dict()
+
+
+@app.put("/followers/{public_key}/allocation/")
+async def set_follower_allocation(public_key: str, allocation: schemas.FollowerAllocation):
+    """Setzt die Allokation eines Follower-Kontos für eine Leader-Wallet."""
+    percentage = allocation.percentage
+    follower = solana_client.followers.set_allocation(public_key, allocation.wallet_address,
+                                                      percentage / 100 if percentage is not None else None)
+    if follower is None:
+        raise HTTPException(status_code=404, detail="Follower not found")
+    return follower.to_dict()
+
+
+@app.delete("/followers/{public_key}/")
+async def remove_follower(public_key: str):
+    """Entfernt ein Follower-Konto; offene Transaktionen werden weiter verfolgt."""
+    follower = solana_client.followers.remove(public_key)
+    if follower is None:
+        raise HTTPException(status_code=404, detail="Follower not found")
+    return follower.to_dict()
+
+
+@app.get("/wallets/{wallet_address}/readiness/")
+async def get_wallet_readiness(wallet_address: str):
+    """Gibt zurück, ob eine Wallet abonniert ist und kopiert wird, samt gesichertem Checkpoint."""
+    readiness = worker.wallet_readiness(wallet_address)
+    if readiness is None:
+        raise HTTPException(status_code=404, detail="Wallet not monitored")
+    return readiness
+
+
 @app.get("/wallets/{wallet_address}/balance/")
 async def get_wallet_balance(wallet_address: str):
     """Ruft den Kontostand einer Wallet ab."""
     try:
-        balance = solana_client.get_balance(wallet_address)
+        # Gemeinsam mit gleichzeitigen Abfragen derselben Wallet, hinter Trade-Aufrufen eingereiht
+        balance = await solana_client.get_balance_async(wallet_address, priority=UI)
         if balance is None:
             raise HTTPException(status_code=404, detail="Wallet balance not found.")
         return {"wallet_address": wallet_address, "balance": balance}
@@ -116,13 +277,150 @@ async def copy_trade(data: dict):
     if not recipient_address:
         raise HTTPException(status_code=400, detail="Recipient wallet is missing")
     try:
-        balance = solana_client.get_balance(solana_client.keypair.pubkey())
+        balance = await solana_client.get_balance_async(solana_client.keypair.pubkey(), priority=TRADE)
         if balance is None or balance <= 0:
             raise HTTPException(status_code=400, detail="Insufficient balance")
         amount = balance * allocation_percentage
-        result = solana_client.execute_transaction(recipient_address, amount)
-        if result["status"] == "failure":
-            raise HTTPException(status_code=500, detail=result["error"])
-        return {"status": "success", "tx_id": result["tx_id"]}
+        # Asynchron senden; der synchrone Wrapper würde den Event-Loop samt wartenden RPC-Aufrufen blockieren
+        signature = await solana_client.execute_transaction_async(recipient_address, amount)
+        if signature is None:
+            raise HTTPException(status_code=500, detail="Transaction failed")
+        return {"status": "success", "tx_id": str(signature)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/backtest/import")
+async def import_history(request: Request):
+    """API zum Import aufgezeichneter Leader-Notifications oder Transfers (JSONL) in den Backtest-Speicher."""
+    balances = {}  # Letzter Leader-Kontostand je Wallet, über die Blöcke hinweg
+    rows = []
+    skipped = 0
+    lines = []
+    async for line in bulk.iter_lines(request.stream()):
+        lines.append(line)
+        if len(lines) >= HISTORY_IMPORT_BATCH:
+            parsed, parsed_skipped = await asyncio.to_thread(backtest.parse_history, lines, balances)
+            rows.extend(parsed)
+            skipped += parsed_skipped
+            lines = []
+    if lines:
+        parsed, parsed_skipped = await asyncio.to_thread(backtest.parse_history, lines, balances)
+        rows.extend(parsed)
+        skipped += parsed_skipped
+    # Ein einziges Einsortieren, statt den Speicher je Block neu zu sortieren
+    added = await asyncio.to_thread(history.append, rows)
+    return {"added": added, "duplicates": len(rows) - added, "skipped": skipped, **history.stats()}
+
+
+@app.get("/backtest/")
+async def history_stats():
+    """Gibt Umfang und Slot-Bereich der gespeicherten Leader-Historie zurück."""
+    return history.stats()
+
+
+@app.post("/backtest/")
+async def run_backtest(data: schemas.Backtest):
+    """Spielt Sizing und PnL über die Historie für alle Wallets und Allokationswerte (Prozent) nach."""
+    if data.allocations is not None:
+        percentages = data.allocations
+    else:
+        if data.allocation_step <= 0 or data.allocation_from > data.allocation_to:
+            raise HTTPException(status_code=400, detail="Invalid allocation range")
+        # Abrunden, damit der letzte Wert allocation_to nicht überschreitet
+        count = math.floor((data.allocation_to - data.allocation_from) / data.allocation_step + 1e-9) + 1
+        percentages = [min(data.allocation_from + i * data.allocation_step, data.allocation_to) for i in range(count)]
+    if not percentages or len(percentages) > MAX_BACKTEST_ALLOCATIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Between 1 and {MAX_BACKTEST_ALLOCATIONS} allocations are required")
+    if any(not 0 < p <= 100 for p in percentages):
+        raise HTTPException(status_code=400, detail="Allocations must be between 0 and 100")
+    if data.start_balance <= 0 or not 0 <= data.max_drawdown <= 100:
+        raise HTTPException(status_code=400, detail="Invalid start balance or drawdown")
+    # Rechnet im Threadpool, damit der Event-Loop weiter Notifications verarbeitet
+    result = await asyncio.to_thread(backtest.backtest, history, [p / 100 for p in percentages],
+                                     data.wallet_addresses, data.start_balance, max_drawdown=data.max_drawdown / 100)
+    result["allocations"] = [round(a * 100, 6) for a in result["allocations"]]
+    for wallet in result["wallets"]:
+        best = wallet["best_allocation"]
+        wallet["best_allocation"] = round(best * 100, 6) if best is not None else None
+    return result
+
+
+@app.get("/stats/batching/")
+async def batching_stats():
+    """Gibt Kennzahlen der Transfer-Bündelung zurück."""
+    return solana_client.batcher.stats() if solana_client.batcher is not None else {}
+
+
+@app.get("/stats/shards/")
+async def shard_stats():
+    """Gibt die Verteilung der Wallets auf die Shard-Prozesse zurück."""
+    return worker.shards.stats() if worker.shards is not None else {}
+
+
+@app.get("/stats/rpc/")
+async def rpc_stats():
+    """Gibt Latenz, Fehlerquote, Ratenbegrenzung und Zustand der RPC-Endpunkte zurück."""
+    return {**solana_client.rpc.stats(), "coalesced": solana_client.coalesced}
+
+
+@app.get("/stats/signing/")
+async def signing_stats():
+    """Gibt die Zahl der Follower-Konten und signierten Transaktionen zurück."""
+    return {"followers": len(solana_client.followers), **solana_client.signer.stats()}
+
+
+@app.get("/stats/confirmations/")
+async def confirmation_stats():
+    """Gibt offene und aufgelöste Signaturen gesendeter Kopien zurück."""
+    return solana_client.confirmations.stats()
+
+
+@app.get("/stats/startup/")
+async def startup_stats():
+    """Gibt die Bereitschaft der Wallets, die Anlauframpe und die Checkpoints zurück."""
+    return worker.readiness_stats()
+
+
+@app.get("/stats/blockhash/")
+async def blockhash_stats():
+    """Gibt Kennzahlen des Blockhash-Caches zurück."""
+    return solana_client.blockhashes.stats()
+
+
+@app.get("/stats/queue/")
+async def queue_stats():
+    """Gibt Tiefe und Wartezeiten der Trade-Queue zurück."""
+    return worker.queue.stats()
+
+
+@app.get("/stats/logging/")
+async def logging_stats():
+    """Gibt Füllstand und verworfene Einträge der Log-Queue zurück."""
+    return logs.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Exportiert Latenz-Histogramme und Zähler im Prometheus-Format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stream")
+async def event_stream(request: Request):
+    """Server-Sent Events mit Wallet-Zuständen, Kontoständen und kopierten Trades."""
+    async def events():
+        async with hub.subscription() as queue:
+            while not await request.is_disconnected():
+                try:
+                    batch = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(batch)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,181 @@
+import time
+from bisect import bisect_left
+
+# Bucket-Grenzen in Sekunden, grob logarithmisch von 100µs bis 10s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histogramm mit festen Buckets; `observe` kostet eine Binärsuche und zwei Additionen."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        self.series = {}  # Labels -> [Bucket-Zähler..., Summe, Anzahl]
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def quantile(self, q: float, *labels):
+        """Schätzt ein Quantil anhand der Bucket-Obergrenzen."""
+        series = self.series.get(labels)
+        if not series or not series[-1]:
+            return None
+        target = q * series[-1]
+        seen = 0
+        for index, bound in enumerate(self.buckets):
+            seen += series[index]
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                bucket = _labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            bucket = _labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Wird erst beim Export über eine Funktion ausgelesen."""
+
+    def __init__(self, name: str, help: str, read, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label_names = labels
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.read()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for labels, item in value.items():
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {item}")
+        elif value is not None:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.collectors = {}
+        self.stage_seconds = self.histogram(
+            "copy_stage_seconds", "Dauer der einzelnen Copy-Stufen", ("stage",))
+        self.copy_latency = self.histogram(
+            "copy_latency_seconds", "Zeit vom Empfang der Notification bis zum Senden der Kopie", ("wallet",))
+        self.rpc_calls = self.counter("rpc_calls_total", "Anzahl der RPC-Aufrufe", ("method",))
+        self.rpc_errors = self.counter("rpc_errors_total", "Anzahl fehlgeschlagener RPC-Aufrufe", ("method",))
+        self.ws_reconnects = self.counter("ws_reconnects_total", "Anzahl der WebSocket-Reconnects")
+        self.errors = self.counter("errors_total", "Fehler nach Komponente", ("component",))
+        self.duplicates = self.counter("duplicate_notifications_total", "Verworfene doppelte Notifications")
+        self.filtered = self.counter("filtered_notifications_total", "Vor dem Dekodieren verworfene Notifications")
+        self.fetches = self.counter("transaction_fetches_total", "Nachgeladene Transaktionen nach Ergebnis",
+                                    ("status",))
+        self.copies = self.counter("copies_total", "Kopierte Transaktionen nach Ergebnis", ("status",))
+        self.confirmations = self.counter("confirmations_total", "Aufgelöste Signaturen gesendeter Kopien",
+                                          ("result",))
+
+    def _add(self, collector):
+        existing = self.collectors.get(collector.name)
+        if existing is not None and type(existing) is type(collector) and not isinstance(collector, Gauge):
+            return existing
+        self.collectors[collector.name] = collector
+        return collector
+
+    def counter(self, name: str, help: str, labels: tuple = ()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, read, labels: tuple = ()):
+        return self._add(Gauge(name, help, read, labels))
+
+    def render(self):
+        """Exportiert alle Metriken im Prometheus-Textformat."""
+        lines = []
+        for collector in self.collectors.values():
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Misst die Stufen einer einzelnen Notification bis zum Senden der Kopie."""
+
+    __slots__ = ("wallet", "start", "last")
+
+    def __init__(self, wallet: str = None, start: float = None):
+        self.wallet = wallet
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        metrics.stage_seconds.observe(now - self.last, stage)
+        self.last = now
+
+    def fork(self):
+        """Eigene Kopie für einen von mehreren Intents derselben Notification."""
+        trace = Trace(self.wallet, self.start)
+        trace.last = self.last
+        return trace
+
+    def finish(self):
+        metrics.copy_latency.observe(time.perf_counter() - self.start, self.wallet)
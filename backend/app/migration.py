@@ -6,11 +6,12 @@ from sqlalchemy.orm import Session
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal, Base, engine
-from app.models import Wallet
+from app.models import Wallet, upgrade_schema
 
 # Tabellen sicherstellen
 print("Initialisiere Tabellen...")
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 # Verbindung zur Datenbank herstellen
 db: Session = SessionLocal()
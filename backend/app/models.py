@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Index, event, insert, inspect, select, text, update
 from .database import Base
 
 
@@ -10,3 +10,84 @@ class Wallet(Base):
     pnl = Column(Float, default=0.0)
     active_trades = Column(Integer, default=0)  # Standardwert für active_trades
     allocation_percentage = Column(Float, default=10.0)  # Standardwert für allocation_percentage
+    row_version = Column(Integer, default=0, index=True)  # Stand der letzten Änderung, siehe SyncVersion
+
+
+class WalletTombstone(Base):
+    """Merkt sich gelöschte Wallets, damit /wallets/changes auch Löschungen liefert."""
+    __tablename__ = "wallet_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    wallet_id = Column(Integer, index=True)
+    wallet_address = Column(String)
+    row_version = Column(Integer, index=True)
+
+
+class CopiedTrade(Base):
+    """Ledger aller kopierten Trades; Wallet.pnl und active_trades sind daraus fortgeschriebene Summen."""
+    __tablename__ = "copied_trades"
+    __table_args__ = (Index("ix_copied_trades_leader_time", "leader_address", "created_at"),)
+
+    id = Column(Integer, primary_key=True)
+    leader_address = Column(String, nullable=False)
+    leader_signature = Column(String, index=True)  # Signatur der kopierten Leader-Transaktion, falls bekannt
+    slot = Column(Integer)
+    recipient = Column(String)
+    follower = Column(String, index=True)  # Öffentlicher Schlüssel des kopierenden eigenen Kontos
+    amount = Column(Float, nullable=False)  # Kopierter Betrag in SOL
+    tx_id = Column(String, index=True)  # Unsere Signatur, gebündelte Transfers teilen sie; None bei Fehlschlag
+    status = Column(String, nullable=False, index=True)
+    pnl = Column(Float, default=0.0)  # Beitrag zum PnL der Leader-Wallet in SOL
+    created_at = Column(Float, nullable=False, index=True)  # Unix-Zeit
+    updated_at = Column(Float, nullable=False)
+
+
+class SyncVersion(Base):
+    """Einzeiliger, monoton steigender Zähler für alle Wallet-Änderungen."""
+    __tablename__ = "sync_version"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+def next_row_version(connection):
+    """Erhöht den globalen Zähler innerhalb der laufenden Transaktion."""
+    return reserve_row_versions(connection, 1)
+
+
+def reserve_row_versions(connection, count: int):
+    """Reserviert `count` aufeinanderfolgende Versionen und gibt die höchste zurück."""
+    table = SyncVersion.__table__
+    result = connection.execute(update(table).where(table.c.id == 1).values(value=table.c.value + count))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(id=1, value=count))
+        return count
+    return connection.execute(select(table.c.value).where(table.c.id == 1)).scalar_one()
+
+
+@event.listens_for(Wallet, "before_insert")
+@event.listens_for(Wallet, "before_update")
+def _bump_row_version(mapper, connection, target):
+    target.row_version = next_row_version(connection)
+
+
+@event.listens_for(Wallet, "after_delete")
+def _record_tombstone(mapper, connection, target):
+    connection.execute(insert(WalletTombstone.__table__).values(
+        wallet_id=target.id,
+        wallet_address=target.wallet_address,
+        row_version=next_row_version(connection),
+    ))
+
+
+def upgrade_schema(engine):
+    """Ergänzt Spalten, die create_all bei bestehenden Tabellen nicht anlegt."""
+    columns = {column["name"] for column in inspect(engine).get_columns(Wallet.__tablename__)}
+    trade_columns = {column["name"] for column in inspect(engine).get_columns(CopiedTrade.__tablename__)}
+    with engine.begin() as connection:
+        if "row_version" not in columns:
+            connection.execute(text("ALTER TABLE wallets ADD COLUMN row_version INTEGER DEFAULT 0"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_wallets_row_version ON wallets (row_version)"))
+        if trade_columns and "follower" not in trade_columns:
+            connection.execute(text("ALTER TABLE copied_trades ADD COLUMN follower VARCHAR"))
+            connection.execute(text("CREATE INDEX IF NOT EXISTS ix_copied_trades_follower ON copied_trades (follower)"))
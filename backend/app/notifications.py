@@ -0,0 +1,131 @@
+import re
+from app.dedup import notification_key
+from app.logs import get_logger
+
+log = get_logger("notifications")
+
+SYSTEM_PROGRAM_ID = "11111111111111111111111111111111"
+SYSTEM_PROGRAM_INVOKE = f"Program {SYSTEM_PROGRAM_ID} invoke"
+_ERR_NULL = re.compile(r'"err"\s*:\s*null')
+
+
+class ParsedNotification:
+    """Das Wesentliche einer accountNotification, klein genug für die Übergabe zwischen Prozessen."""
+
+    __slots__ = ("slot", "lamports", "key", "signature", "transfers")
+
+    def __init__(self, slot, lamports, key, signature, transfers):
+        self.slot = slot
+        self.lamports = lamports  # Neuer Kontostand der Leader-Wallet, falls enthalten
+        self.key = key  # Schlüssel für den Deduplizierungs-Index
+        self.signature = signature
+        self.transfers = transfers  # [(Empfänger, SOL)]
+
+    def to_tuple(self):
+        return self.slot, self.lamports, self.key, self.signature, self.transfers
+
+
+class NotificationHint:
+    """Hinweis aus einer schlanken Notification, dass sich ein Abruf der Transaktion lohnt."""
+
+    __slots__ = ("slot", "signature", "lamports")
+
+    def __init__(self, slot, signature, lamports):
+        self.slot = slot
+        self.signature = signature
+        self.lamports = lamports
+
+    def to_tuple(self):
+        return self.slot, self.signature, self.lamports
+
+
+def prefilter_logs(message: str):
+    """Verwirft rohe logsNotifications ohne erfolgreichen Aufruf des System-Programms."""
+    if '"logsNotification"' not in message:
+        return True
+    return SYSTEM_PROGRAM_INVOKE in message and _ERR_NULL.search(message) is not None
+
+
+def parse_hint(tx_data: dict):
+    """Liest Slot und Signatur bzw. Kontostand aus einer logs- oder base64-accountNotification."""
+    result = tx_data.get("result")
+    if not isinstance(result, dict):
+        return None
+    value = result.get("value") or {}
+    slot = result.get("context", {}).get("slot")
+    if "signature" in value:
+        if value.get("err") is not None or not any(SYSTEM_PROGRAM_INVOKE in line for line in value.get("logs") or ()):
+            return None
+        return NotificationHint(slot, value["signature"], None)
+    lamports = value.get("lamports")
+    if not isinstance(lamports, int):
+        return None
+    return NotificationHint(slot, None, lamports)
+
+
+def parse_transaction(wallet_address: str, result: dict):
+    """Liest die System-Transfers einer Leader-Wallet aus einer getTransaction-Antwort (jsonParsed)."""
+    slot = result.get("slot")
+    transaction = result.get("transaction") or {}
+    message = transaction.get("message") or {}
+    meta = result.get("meta") or {}
+    signatures = transaction.get("signatures")
+    key = notification_key(wallet_address, slot, transaction)
+    signature = signatures[0] if signatures else None
+    if meta.get("err") is not None:
+        return ParsedNotification(slot, None, key, signature, [])
+
+    # Kontostand nach der Transaktion, falls die Wallet unter den Konten ist
+    lamports = None
+    post_balances = meta.get("postBalances") or []
+    for index, account in enumerate(message.get("accountKeys") or []):
+        pubkey = account.get("pubkey") if isinstance(account, dict) else account
+        if pubkey == wallet_address and index < len(post_balances):
+            lamports = post_balances[index]
+            break
+
+    transfers = []
+    for instruction in message.get("instructions") or []:
+        parsed = instruction.get("parsed")
+        if instruction.get("programId") != SYSTEM_PROGRAM_ID or not isinstance(parsed, dict):
+            continue
+        info = parsed.get("info") or {}
+        if parsed.get("type") == "transfer" and info.get("source") == wallet_address and info.get("destination"):
+            transfers.append((info["destination"], info.get("lamports", 0) / 10**9))  # Lamports zu SOL umwandeln
+    return ParsedNotification(slot, lamports, key, signature, transfers)
+
+
+def parse_notification(wallet_address: str, tx_data: dict):
+    """Liest Kontostand und Transfers aus den Params einer accountNotification."""
+    # Überprüfen, ob `result` ein dict ist
+    result = tx_data.get("result")
+    if isinstance(result, int):
+        log.debug("Received an integer result: %s. No further processing required.", result)
+        return None  # Nichts zu tun, wenn `result` nur eine ID oder Ähnliches ist
+
+    if not isinstance(result, dict):
+        log.warning("Unexpected result type: %s. Expected dict.", type(result))
+        return None
+
+    value = result.get("value") or {}
+    slot = result.get("context", {}).get("slot")
+    lamports = value.get("lamports") if isinstance(value.get("lamports"), int) else None
+
+    # Extrahiere Anweisungen aus der Transaktion
+    transaction = value.get("transaction", {})
+    instructions = transaction.get("message", {}).get("instructions", [])
+    transfers = []
+    for instruction in instructions:
+        accounts = instruction.get("accounts", [])
+        if len(accounts) < 2:
+            log.debug("Invalid instruction format: %s", instruction)
+            continue
+        recipient = accounts[1]  # Empfänger
+        if recipient:
+            transfers.append((recipient, instruction.get("lamports", 0) / 10**9))  # Lamports zu SOL umwandeln
+
+    if not instructions:
+        return ParsedNotification(slot, lamports, None, None, transfers)
+    signatures = transaction.get("signatures")
+    return ParsedNotification(slot, lamports, notification_key(wallet_address, slot, transaction),
+                              signatures[0] if signatures else None, transfers)
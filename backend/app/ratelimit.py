@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# Prioritätsklassen; kleinere Werte werden zuerst bedient
+TRADE = 0  # Aufrufe auf dem Weg zur Kopie: Senden, Blockhash, Sizing, Nachladen
+UI = 1  # Anfragen aus der Oberfläche
+BACKGROUND = 2  # Abgleiche, Aufwärmen und Health-Probes
+PRIORITY_NAMES = {TRADE: "trade", UI: "ui", BACKGROUND: "background"}
+
+RETRY_AFTER = 1.0  # Sekunden Pause nach einem 429 ohne Retry-After-Header
+MIN_WAIT = 0.005  # Kürzeste Wartezeit zwischen zwei Versuchen
+
+
+class TokenBucket:
+    """Token-Bucket eines RPC-Endpunkts mit nach Priorität geordneter Warteschlange."""
+
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 1.0, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters = []  # Heap aus (Priorität, laufende Nummer, Kosten, Future)
+        self.sequence = itertools.count()
+        self.timer = None
+        self.lock = threading.Lock()  # Synchrone Aufrufer kommen aus dem Threadpool
+        self.granted = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.delayed = dict.fromkeys(PRIORITY_NAMES, 0)
+        self.throttled = 0
+
+    def _take(self, cost: float, now: float):
+        """Nimmt `cost` Tokens, sofern sie jetzt verfügbar sind."""
+        if now < self.paused_until:
+            return False
+        if self.rate is None:
+            return True
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def _wait(self, cost: float, now: float):
+        """Sekunden, bis `cost` Tokens frei wären."""
+        wait = self.paused_until - now
+        if self.rate is not None:
+            tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            wait = max(wait, (cost - tokens) / self.rate)
+        return max(wait, 0.0)
+
+    def delay(self):
+        """Geschätzte Wartezeit eines neuen Aufrufs, einschließlich der bereits Wartenden."""
+        with self.lock:
+            cost = 1 + sum(waiter[2] for waiter in self.waiters)
+            return self._wait(cost, time.monotonic())
+
+    async def acquire(self, priority: int = TRADE, cost: float = 1):
+        cost = min(cost, self.burst)
+        with self.lock:
+            if not self.waiters and self._take(cost, time.monotonic()):
+                self.granted[priority] += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.sequence), cost, future))
+            self.delayed[priority] += 1
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Token war schon zugeteilt; zurückgeben
+                with self.lock:
+                    self.tokens = min(self.burst, self.tokens + cost)
+            raise
+
+    def acquire_blocking(self, priority: int = UI, cost: float = 1):
+        """Synchrone Variante für Aufrufer ohne Event-Loop; lässt Wartende im Loop vor."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # Wartende im Loop würden nie geweckt, während dieser Thread schläft
+            raise RuntimeError("acquire_blocking called from the event loop thread; use acquire")
+        cost = min(cost, self.burst)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if not self.waiters and self._take(cost, now):
+                    self.granted[priority] += 1
+                    return
+                wait = self._wait(cost, now)
+            time.sleep(max(wait, MIN_WAIT))
+
+    def pause(self, seconds: float = RETRY_AFTER):
+        """Hält den Endpunkt nach einer 429-Antwort für `seconds` an."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.throttled += 1
+
+    def _schedule(self):
+        if self.timer is not None or not self.waiters:
+            return
+        with self.lock:
+            wait = self._wait(self.waiters[0][2], time.monotonic())
+        self.timer = asyncio.get_running_loop().call_later(max(wait, MIN_WAIT), self._wake)
+
+    def _wake(self):
+        self.timer = None
+        with self.lock:
+            now = time.monotonic()
+            while self.waiters:
+                priority, _, cost, future = self.waiters[0]
+                if future.cancelled():
+                    heapq.heappop(self.waiters)
+                    continue
+                if not self._take(cost, now):
+                    break
+                heapq.heappop(self.waiters)
+                future.set_result(None)
+                self.granted[priority] += 1
+        self._schedule()
+
+    def stats(self):
+        with self.lock:
+            tokens = None if self.rate is None else round(
+                min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate), 2)
+            waiting = len(self.waiters)
+        return {
+            "rate": self.rate,
+            "burst": self.burst if self.rate is not None else None,
+            "tokens": tokens,
+            "waiting": waiting,
+            "granted": {PRIORITY_NAMES[p]: n for p, n in self.granted.items()},
+            "delayed": {PRIORITY_NAMES[p]: n for p, n in self.delayed.items()},
+            "throttled": self.throttled,
+            "paused_for": round(max(self.paused_until - time.monotonic(), 0.0), 2),
+        }
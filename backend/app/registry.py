@@ -0,0 +1,114 @@
+from app.logs import get_logger
+
+log = get_logger("registry")
+ADDED = "added"
+REMOVED = "removed"
+UPDATED = "updated"
+TRADE_STATS = ("pnl", "active_trades")  # Vom Trade-Ledger fortgeschriebene Felder
+
+
+class WalletRegistry:
+    """Prozessinterne Sicht auf die überwachten Wallets."""
+
+    def __init__(self):
+        self.wallets = {}  # Adresse -> Wallet-Dict wie aus crud.get_wallets
+        self.by_id = {}  # ID -> Adresse
+        self.listeners = []
+        self.version = 0  # Wird bei jeder Änderung an Mitgliedschaft oder Allokation erhöht
+        self.stats_version = 0  # Wird bei jeder Fortschreibung von PnL und aktiven Trades erhöht
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _emit(self, event: str, wallet: dict):
+        self.version += 1
+        self._notify(event, wallet)
+
+    def _notify(self, event: str, wallet: dict):
+        for listener in list(self.listeners):
+            try:
+                listener(event, wallet)
+            except Exception as e:
+                log.exception("Error in wallet registry listener: %s", e)
+
+    def add(self, wallet: dict):
+        wallet = dict(wallet)
+        self.wallets[wallet["wallet_address"]] = wallet
+        self.by_id[wallet["id"]] = wallet["wallet_address"]
+        self._emit(ADDED, wallet)
+
+    def remove(self, wallet_id: int):
+        address = self.by_id.pop(wallet_id, None)
+        if address is None:
+            return None
+        wallet = self.wallets.pop(address)
+        self._emit(REMOVED, wallet)
+        return wallet
+
+    def set_allocation(self, wallet_id: int, allocation_percentage: float):
+        wallet = self.get_by_id(wallet_id)
+        if wallet is None or wallet.get("allocation_percentage") == allocation_percentage:
+            return wallet
+        wallet["allocation_percentage"] = allocation_percentage
+        self._emit(UPDATED, wallet)
+        return wallet
+
+    def apply_trade_stats(self, wallet_address: str, pnl_delta: float, active_delta: int):
+        """Schreibt PnL und aktive Trades um die Änderungen aus dem Trade-Ledger fort."""
+        wallet = self.wallets.get(wallet_address)
+        if wallet is None:
+            return None
+        wallet["pnl"] = (wallet.get("pnl") or 0.0) + pnl_delta
+        wallet["active_trades"] = (wallet.get("active_trades") or 0) + active_delta
+        # Eigener Zähler: Ledger-Flushes sollen den Datenbankabgleich nicht ständig verwerfen
+        self.stats_version += 1
+        self._notify(UPDATED, wallet)
+        return wallet
+
+    def get(self, wallet_address: str):
+        return self.wallets.get(wallet_address)
+
+    def get_by_id(self, wallet_id: int):
+        address = self.by_id.get(wallet_id)
+        return self.wallets.get(address) if address is not None else None
+
+    def allocation(self, wallet_address: str):
+        """Allokation als Anteil (0-1), 0 wenn die Wallet nicht mehr überwacht wird."""
+        wallet = self.wallets.get(wallet_address)
+        if wallet is None:
+            return 0.0
+        return wallet.get("allocation_percentage", 10.0) / 100
+
+    def reconcile(self, wallets: list, expected_version: int = None, expected_stats_version: int = None):
+        """Gleicht die Registry mit einem vollständigen Datenbankstand ab; False, wenn dieser veraltet ist."""
+        if expected_version is not None and expected_version != self.version:
+            return False
+        stats_current = expected_stats_version is None or expected_stats_version == self.stats_version
+        current = {wallet["wallet_address"]: wallet for wallet in wallets}
+        for address in list(self.wallets):
+            if address not in current:
+                self.remove(self.wallets[address]["id"])
+        for address, wallet in current.items():
+            known = self.wallets.get(address)
+            if known is None:
+                self.add(wallet)
+            elif known["id"] != wallet["id"]:
+                self.remove(known["id"])
+                self.add(wallet)
+            else:
+                # PnL und aktive Trades ohne Ereignis übernehmen, sofern der Stand nicht älter ist
+                known.update({k: v for k, v in wallet.items() if k != "allocation_percentage"
+                              and (stats_current or k not in TRADE_STATS)})
+                if known.get("allocation_percentage") != wallet.get("allocation_percentage"):
+                    self.set_allocation(wallet["id"], wallet["allocation_percentage"])
+        return True
+
+    def __len__(self):
+        return len(self.wallets)
+
+    def __contains__(self, wallet_address):
+        return wallet_address in self.wallets
@@ -0,0 +1,397 @@
+import asyncio
+import itertools
+import time
+import httpx
+from app.metrics import metrics
+from app.ratelimit import TokenBucket, TRADE, BACKGROUND, RETRY_AFTER
+from app.logs import get_logger
+
+log = get_logger("rpc")
+
+POOL_SIZE = 20
+KEEPALIVE_EXPIRY = 30.0
+TIMEOUT = 10.0
+CONNECT_TIMEOUT = 5.0
+
+# Routing im RpcPool
+HEDGED_METHODS = ("sendTransaction", "getLatestBlockhash")
+HEDGE_DELAY = 0.05  # Sekunden, frühestens danach geht eine Anfrage zusätzlich an den nächsten Endpunkt
+HEDGE_LATENCY_FACTOR = 2.0  # ... bzw. nach dem Doppelten der erwarteten Latenz
+DEFAULT_LATENCY = 0.1  # Angenommene Latenz eines noch ungemessenen Endpunkts
+LATENCY_ALPHA = 0.2  # Gewicht neuer Messwerte im gleitenden Mittel
+ERROR_PENALTY = 4.0
+FAILURE_THRESHOLD = 3  # Aufeinanderfolgende Fehler, nach denen ein Endpunkt pausiert
+COOLDOWN = 5.0
+MAX_COOLDOWN = 60.0
+PROBE_INTERVAL = 10.0
+PROBE_METHOD = "getHealth"
+# Prioritätsklasse je Methode, sofern der Aufrufer keine angibt
+METHOD_PRIORITIES = {
+    "sendTransaction": TRADE,
+    "getLatestBlockhash": TRADE,
+    "getTransaction": TRADE,
+    "getSignaturesForAddress": TRADE,
+}
+
+
+class RpcError(Exception):
+    """Fehlerantwort eines JSON-RPC-Endpunkts."""
+
+    def __init__(self, error):
+        self.code = error.get("code") if isinstance(error, dict) else None
+        message = error.get("message") if isinstance(error, dict) else error
+        super().__init__(f"RPC error {self.code}: {message}")
+
+
+class RpcClient:
+    """Schlanker Solana-JSON-RPC-Client mit gepoolten Keep-Alive-Verbindungen."""
+
+    def __init__(self, endpoint: str, pool_size: int = POOL_SIZE, timeout: float = TIMEOUT,
+                 connect_timeout: float = CONNECT_TIMEOUT, keepalive_expiry: float = KEEPALIVE_EXPIRY):
+        self.endpoint = endpoint
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.request_ids = itertools.count(1)
+        self._sync_client = None
+        self._async_client = None
+
+    @property
+    def sync_client(self):
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        return self._sync_client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._async_client
+
+    def _body(self, method: str, params: list):
+        return {"jsonrpc": "2.0", "id": next(self.request_ids), "method": method, "params": params}
+
+    @staticmethod
+    def _result(response):
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RpcError(data["error"])
+        return data.get("result")
+
+    def request(self, method: str, params: list = None):
+        """Synchroner JSON-RPC-Aufruf."""
+        metrics.rpc_calls.inc(method)
+        try:
+            response = self.sync_client.post(self.endpoint, json=self._body(method, params or []))
+            return self._result(response)
+        except Exception:
+            metrics.rpc_errors.inc(method)
+            raise
+
+    async def arequest(self, method: str, params: list = None):
+        """Asynchroner JSON-RPC-Aufruf über den gepoolten AsyncClient."""
+        metrics.rpc_calls.inc(method)
+        try:
+            response = await self.async_client.post(self.endpoint, json=self._body(method, params or []))
+            return self._result(response)
+        except Exception:
+            metrics.rpc_errors.inc(method)
+            raise
+
+    async def abatch(self, calls: list):
+        """Schickt mehrere (Methode, Params)-Aufrufe als einen JSON-RPC-Batch."""
+        bodies = [self._body(method, params or []) for method, params in calls]
+        for body in bodies:
+            metrics.rpc_calls.inc(body["method"])
+        try:
+            response = await self.async_client.post(self.endpoint, json=bodies)
+            response.raise_for_status()
+            data = response.json()
+            if isinstance(data, dict):
+                raise RpcError(data.get("error"))  # Batch als Ganzes abgelehnt
+        except Exception:
+            for body in bodies:
+                metrics.rpc_errors.inc(body["method"])
+            raise
+        by_id = {item.get("id"): item for item in data}
+        results = []
+        for body in bodies:
+            item = by_id.get(body["id"])
+            if item is None or "error" in item:
+                metrics.rpc_errors.inc(body["method"])
+                results.append(RpcError(item["error"] if item is not None else "missing from batch response"))
+            else:
+                results.append(item.get("result"))
+        return results
+
+    def close(self):
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class Endpoint:
+    """Ein RPC-Endpunkt des Pools mit laufender Latenz- und Fehlerbewertung."""
+
+    def __init__(self, url: str, client: RpcClient, bucket: TokenBucket = None):
+        self.url = url
+        self.client = client
+        self.bucket = bucket if bucket is not None else TokenBucket()
+        self.latency = None  # Gleitender Mittelwert in Sekunden
+        self.error_rate = 0.0  # Gleitender Anteil fehlgeschlagener Aufrufe
+        self.consecutive_errors = 0
+        self.cooldown = COOLDOWN
+        self.open_until = 0.0  # Bis dahin wird der Endpunkt nur als letzter Ausweg genutzt
+        self.last_used = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.hedges_won = 0
+
+    def healthy(self, now: float):
+        return now >= self.open_until
+
+    def score(self):
+        """Kleiner ist besser: erwartete Latenz, aufgeschlagen nach Fehlerquote."""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        return latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def success(self, elapsed: float = None):
+        self.calls += 1
+        self.last_used = time.monotonic()
+        if elapsed is not None:
+            self.latency = elapsed if self.latency is None else \
+                (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * elapsed
+        self.error_rate *= 1 - LATENCY_ALPHA
+        self.consecutive_errors = 0
+        self.cooldown = COOLDOWN
+
+    def failure(self):
+        now = time.monotonic()
+        self.calls += 1
+        self.errors += 1
+        self.last_used = now
+        self.error_rate = (1 - LATENCY_ALPHA) * self.error_rate + LATENCY_ALPHA
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= FAILURE_THRESHOLD:
+            # Circuit öffnen; scheitert auch der nächste Versuch danach, verdoppelt sich die Pause
+            self.open_until = now + self.cooldown
+            self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+
+    def stats(self, now: float):
+        return {
+            "url": self.url,
+            "healthy": self.healthy(now),
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "hedges_won": self.hedges_won,
+            "retry_in": round(max(self.open_until - now, 0.0), 1),
+            "rate_limit": self.bucket.stats(),
+        }
+
+
+class RpcPool:
+    """Verteilt JSON-RPC-Aufrufe auf mehrere Endpunkte nach Latenz und Fehlerquote."""
+
+    def __init__(self, endpoints, pool_size: int = POOL_SIZE, timeout: float = TIMEOUT,
+                 hedge_delay: float = HEDGE_DELAY, hedged_methods=HEDGED_METHODS,
+                 probe_interval: float = PROBE_INTERVAL, rate_limit: float = None, burst: float = None):
+        urls = [endpoints] if isinstance(endpoints, str) else list(endpoints)
+        self.endpoints = [Endpoint(url, RpcClient(url, pool_size=pool_size, timeout=timeout),
+                                   TokenBucket(rate_limit, burst)) for url in urls]
+        self.hedge_delay = hedge_delay
+        self.hedged_methods = set(hedged_methods)
+        self.probe_interval = probe_interval
+        self.hedges = 0
+        self.failovers = 0
+        self.task = None
+
+    @property
+    def endpoint(self):
+        return self.endpoints[0].url
+
+    def start(self):
+        if self.task is None and self.probe_interval and len(self.endpoints) > 1:
+            self.task = asyncio.create_task(self._probe())
+
+    def ranked(self):
+        """Gesunde Endpunkte nach Bewertung und Wartezeit auf ein Token, danach die gesperrten."""
+        now = time.monotonic()
+        healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=lambda e: e.score() + e.bucket.delay())
+        blocked = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.open_until)
+        return healthy + blocked
+
+    @staticmethod
+    def _throttled(endpoint: Endpoint, error: Exception):
+        """Pausiert den Endpunkt, wenn er mit 429 geantwortet hat."""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+            try:
+                retry_after = float(error.response.headers.get("Retry-After", RETRY_AFTER))
+            except ValueError:
+                retry_after = RETRY_AFTER
+            endpoint.bucket.pause(retry_after)
+
+    async def _attempt(self, endpoint: Endpoint, method: str, params: list, priority: int, calls: list = None):
+        """Ein Aufruf, mit `calls` ein Batch, an einen Endpunkt, sobald dessen Bucket ein Token zuteilt."""
+        await endpoint.bucket.acquire(priority, len(calls) if calls is not None else 1)
+        started = time.perf_counter()
+        try:
+            if calls is not None:
+                result = await endpoint.client.abatch(calls)
+            else:
+                result = await endpoint.client.arequest(method, params)
+        except RpcError:
+            # Fachlicher Fehler: der Endpunkt hat geantwortet
+            endpoint.success(None if calls is not None else time.perf_counter() - started)
+            raise
+        except Exception as e:
+            self._throttled(endpoint, e)
+            endpoint.failure()
+            raise
+        # Batches fließen nicht in die Latenzbewertung ein
+        endpoint.success(None if calls is not None else time.perf_counter() - started)
+        return result
+
+    async def arequest(self, method: str, params: list = None, hedge: bool = None, priority: int = None):
+        params = params or []
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(method, BACKGROUND)
+        ranked = self.ranked()
+        if hedge is None:
+            hedge = method in self.hedged_methods
+        if hedge and len(ranked) > 1:
+            return await self._hedged(ranked, method, params, priority)
+        last_error = None
+        for endpoint in ranked:
+            try:
+                return await self._attempt(endpoint, method, params, priority)
+            except RpcError:
+                raise
+            except Exception as e:
+                last_error = e
+                self.failovers += 1
+        raise last_error
+
+    async def _hedged(self, ranked: list, method: str, params: list, priority: int):
+        remaining = list(ranked)
+        tasks = {}  # Task -> Endpunkt
+        last_error = None
+
+        def launch():
+            endpoint = remaining.pop(0)
+            tasks[asyncio.create_task(self._attempt(endpoint, method, params, priority))] = endpoint
+
+        launch()
+        while self.hedge_delay == 0 and remaining:
+            launch()
+        try:
+            while tasks:
+                delay = None
+                if remaining:
+                    expected = ranked[0].latency
+                    delay = self.hedge_delay if expected is None else \
+                        max(self.hedge_delay, HEDGE_LATENCY_FACTOR * expected)
+                done, _ = await asyncio.wait(tasks, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    endpoint = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        if not isinstance(e, RpcError) and remaining and not tasks:
+                            self.failovers += 1
+                            launch()
+                        continue
+                    if endpoint is not ranked[0]:
+                        endpoint.hedges_won += 1
+                    return result
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def request(self, method: str, params: list = None, priority: int = None):
+        """Synchroner Aufruf mit Failover, ohne Hedging."""
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(method, BACKGROUND)
+        last_error = None
+        for endpoint in self.ranked():
+            endpoint.bucket.acquire_blocking(priority)
+            started = time.perf_counter()
+            try:
+                result = endpoint.client.request(method, params)
+            except RpcError:
+                endpoint.success(time.perf_counter() - started)
+                raise
+            except Exception as e:
+                self._throttled(endpoint, e)
+                endpoint.failure()
+                last_error = e
+                self.failovers += 1
+                continue
+            endpoint.success(time.perf_counter() - started)
+            return result
+        raise last_error
+
+    async def abatch(self, calls: list, priority: int = None):
+        """JSON-RPC-Batch mit Failover; jeder enthaltene Aufruf kostet ein Token."""
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(calls[0][0], BACKGROUND) if calls else BACKGROUND
+        last_error = None
+        for endpoint in self.ranked():
+            try:
+                return await self._attempt(endpoint, None, None, priority, calls)
+            except RpcError:
+                raise
+            except Exception as e:
+                last_error = e
+                self.failovers += 1
+        raise last_error
+
+    async def _probe(self):
+        """Prüft ruhende und gesperrte Endpunkte, damit ihre Bewertung aktuell bleibt."""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            now = time.monotonic()
+            idle = [e for e in self.endpoints if now - e.last_used >= self.probe_interval]
+            results = await asyncio.gather(*(self._attempt(e, PROBE_METHOD, [], BACKGROUND) for e in idle),
+                                           return_exceptions=True)
+            for endpoint, result in zip(idle, results):
+                if isinstance(result, Exception) and not isinstance(result, RpcError):
+                    log.warning("RPC endpoint %s failed health probe: %s", endpoint.url, result,
+                                extra={"endpoint": endpoint.url})
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "endpoints": [endpoint.stats(now) for endpoint in self.ranked()],
+        }
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+    async def aclose(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        for endpoint in self.endpoints:
+            await endpoint.client.aclose()
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -11,3 +12,24 @@ class PrivateKey(BaseModel):
 
 class Allocation(BaseModel):
     percentage: float
+
+
+class Follower(BaseModel):
+    key: str
+    allocation_percentage: Optional[float] = None  # Ohne Angabe gilt die Allokation der Leader-Wallet
+    allocations: Dict[str, float] = {}  # Leader-Wallet -> Prozent
+
+
+class FollowerAllocation(BaseModel):
+    wallet_address: str
+    percentage: Optional[float] = None  # None entfernt die Sonderregel für diese Leader-Wallet
+
+
+class Backtest(BaseModel):
+    wallet_addresses: Optional[List[str]] = None  # None: alle Wallets im Speicher
+    allocations: Optional[List[float]] = None  # Prozent; ohne Angabe gilt der Bereich von/bis/Schritt
+    allocation_from: float = 1.0
+    allocation_to: float = 100.0
+    allocation_step: float = 1.0
+    start_balance: float = 10.0  # SOL
+    max_drawdown: float = 50.0  # Prozent des Startkapitals
@@ -0,0 +1,364 @@
+import asyncio
+import bisect
+import hashlib
+import math
+import multiprocessing
+import time
+from app.notifications import parse_notification, parse_hint
+from app.subscriptions import SubscriptionMultiplexer, MAX_CONNECTIONS, ACCOUNT
+from app.metrics import metrics
+from app import logs
+from app.logs import get_logger
+
+log = get_logger("shards")
+
+REPLICAS = 100  # Virtuelle Knoten pro Shard auf dem Ring
+LOAD_FACTOR = 1.25  # Kein Shard trägt mehr als das 1,25-fache des Durchschnitts
+SEND_INTERVAL = 0.002  # Sekunden, in denen ein Shard Notifications für einen Pipe-Write sammelt
+WATCH_INTERVAL = 1.0  # Sekunden zwischen zwei Prüfungen auf abgestürzte Shards
+STOP_TIMEOUT = 5.0
+
+# Nachrichten Shard -> Koordinator
+NOTIFICATION = "n"
+SUBSCRIBED = "s"
+FAILED = "f"
+# Befehle Koordinator -> Shard
+SUBSCRIBE = "subscribe"
+UNSUBSCRIBE = "unsubscribe"
+STOP = "stop"
+
+
+def _hash(key: str):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Konsistentes Hashing mit virtuellen Knoten."""
+
+    def __init__(self, replicas: int = REPLICAS):
+        self.replicas = replicas
+        self.points = []  # Sortierte Hashwerte
+        self.owners = {}  # Hashwert -> Shard
+        self.nodes = set()
+
+    def add(self, node):
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}:{replica}")
+            self.owners[point] = node
+            bisect.insort(self.points, point)
+
+    def remove(self, node):
+        self.nodes.discard(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}:{replica}")
+            if self.owners.pop(point, None) is not None:
+                self.points.pop(bisect.bisect_left(self.points, point))
+
+    def candidates(self, key: str):
+        """Alle Shards in Ringreihenfolge ab der Position des Schlüssels."""
+        if not self.points:
+            return
+        start = bisect.bisect(self.points, _hash(key))
+        seen = set()
+        for i in range(len(self.points)):
+            node = self.owners[self.points[(start + i) % len(self.points)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def node_for(self, key: str):
+        return next(self.candidates(key), None)
+
+
+def run_shard(shard_id: int, ws_url, connection, max_connections: int = MAX_CONNECTIONS, mode: str = ACCOUNT):
+    """Einstiegspunkt des Shard-Prozesses."""
+    logs.setup()  # Eigener Schreib-Thread je Prozess
+    try:
+        asyncio.run(_shard_main(shard_id, ws_url, connection, max_connections, mode))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _shard_main(shard_id: int, ws_url, connection, max_connections: int, mode: str):
+    """Hält die WebSocket-Abos eines Shards, dekodiert und parst dessen Notifications."""
+    loop = asyncio.get_running_loop()
+    multiplexer = SubscriptionMultiplexer(ws_url, max_connections, mode=mode)
+    outbox = []
+    stopped = asyncio.Event()
+    tasks = set()
+
+    async def on_notification(wallet, params, trace):
+        parsed = parse_notification(wallet, params) if mode == ACCOUNT else parse_hint(params)
+        if parsed is not None:
+            outbox.append((NOTIFICATION, wallet, parsed.to_tuple(), trace.start))
+
+    async def subscribe(wallet):
+        try:
+            await multiplexer.subscribe(wallet, on_notification)
+            outbox.append((SUBSCRIBED, wallet))
+        except Exception as e:
+            log.warning("Shard %s: error subscribing to %s: %s", shard_id, wallet, e,
+                        extra={"shard": shard_id, "wallet": wallet})
+            outbox.append((FAILED, wallet))
+
+    def start_task(coroutine):
+        task = loop.create_task(coroutine)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def on_command():
+        try:
+            while connection.poll():
+                command, wallet = connection.recv()
+                if command == SUBSCRIBE:
+                    start_task(subscribe(wallet))
+                elif command == UNSUBSCRIBE:
+                    start_task(multiplexer.unsubscribe(wallet))
+                elif command == STOP:
+                    stopped.set()
+        except (EOFError, OSError):
+            stopped.set()  # Koordinator ist weg
+
+    loop.add_reader(connection.fileno(), on_command)
+    try:
+        while not stopped.is_set():
+            try:
+                await asyncio.wait_for(stopped.wait(), SEND_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            if outbox:
+                batch, outbox[:] = list(outbox), []
+                connection.send(batch)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        loop.remove_reader(connection.fileno())
+        for task in list(tasks):
+            task.cancel()
+        await multiplexer.close()
+
+
+class ShardCoordinator:
+    """Verteilt Leader-Wallets per konsistentem Hashing auf Shard-Prozesse."""
+
+    def __init__(self, ws_url, shards: int, on_notification, max_connections: int = MAX_CONNECTIONS,
+                 load_factor: float = LOAD_FACTOR, mode: str = ACCOUNT, on_status=None):
+        self.mode = mode
+        self.ws_urls = [ws_url] if isinstance(ws_url, str) else list(ws_url)
+        self.shard_count = shards
+        self.on_notification = on_notification  # (Wallet, Tupel aus dem Shard, Empfangszeit)
+        self.on_status = on_status  # (Wallet, True/False: Abo bestätigt/fehlgeschlagen, None: nach Neustart offen)
+        self.max_connections = max_connections
+        self.load_factor = load_factor
+        self.context = multiprocessing.get_context("spawn")  # Kein fork eines laufenden Event-Loops
+        self.ring = HashRing()
+        self.processes = {}  # Shard -> Process
+        self.connections = {}  # Shard -> Pipe-Ende des Koordinators
+        self.assignments = {}  # Wallet -> Shard
+        self.loads = {}  # Shard -> Anzahl Wallets
+        self.draining = {}  # Wallet -> bisheriger Shard, bis der neue das Abo bestätigt
+        self.subscribed = set()
+        self.restarts = 0
+        self.moves = 0
+        self.loop = None
+        self.watcher = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        for shard_id in range(self.shard_count):
+            self._spawn(shard_id)
+            self.ring.add(shard_id)
+            self.loads[shard_id] = 0
+        self.watcher = asyncio.create_task(self._watch())
+
+    def _rotated_urls(self, shard_id: int):
+        """Versetzt die Endpunktliste je Shard, damit sich die ersten Verbindungen verteilen."""
+        offset = shard_id % len(self.ws_urls)
+        return self.ws_urls[offset:] + self.ws_urls[:offset]
+
+    def _spawn(self, shard_id: int):
+        parent_end, child_end = self.context.Pipe()
+        process = self.context.Process(target=run_shard, name=f"shard-{shard_id}", daemon=True,
+                                       args=(shard_id, self._rotated_urls(shard_id), child_end, self.max_connections,
+                                             self.mode))
+        process.start()
+        child_end.close()
+        self.processes[shard_id] = process
+        self.connections[shard_id] = parent_end
+        self.loop.add_reader(parent_end.fileno(), self._receive, shard_id)
+
+    def _close_connection(self, shard_id: int):
+        connection = self.connections.pop(shard_id, None)
+        if connection is not None:
+            self.loop.remove_reader(connection.fileno())
+            connection.close()
+
+    def _receive(self, shard_id: int):
+        connection = self.connections.get(shard_id)
+        try:
+            while connection is not None and connection.poll():
+                for message in connection.recv():
+                    kind, wallet = message[0], message[1]
+                    if kind == NOTIFICATION:
+                        if self.assignments.get(wallet) == shard_id or self.draining.get(wallet) == shard_id:
+                            self.on_notification(wallet, message[2], message[3])
+                    elif kind == SUBSCRIBED:
+                        if self.assignments.get(wallet) == shard_id:
+                            self.subscribed.add(wallet)
+                            # Erst jetzt beim alten Shard kündigen, damit beim Umzug nichts verloren geht
+                            previous = self.draining.pop(wallet, None)
+                            if previous is not None:
+                                self._send(previous, UNSUBSCRIBE, wallet)
+                            if self.on_status is not None:
+                                self.on_status(wallet, True)
+                    elif kind == FAILED:
+                        self.subscribed.discard(wallet)
+                        if self.on_status is not None and self.assignments.get(wallet) == shard_id:
+                            self.on_status(wallet, False)
+        except (EOFError, OSError):
+            # Shard beendet; der Watcher startet ihn neu
+            self._close_connection(shard_id)
+        except Exception as e:
+            metrics.errors.inc("sharding")
+            log.exception("Error handling messages from shard %s: %s", shard_id, e, extra={"shard": shard_id})
+
+    def _send(self, shard_id: int, command: str, wallet: str = None):
+        connection = self.connections.get(shard_id)
+        if connection is None:
+            return False
+        try:
+            connection.send((command, wallet))
+            return True
+        except (BrokenPipeError, OSError):
+            self._close_connection(shard_id)
+            return False
+
+    def _capacity(self, wallets: int):
+        return max(math.ceil(self.load_factor * wallets / max(len(self.ring.nodes), 1)), 1)
+
+    def _place(self, wallet: str, capacity: int):
+        """Erster Shard auf dem Ring, der noch unter der Kapazität liegt."""
+        for shard_id in self.ring.candidates(wallet):
+            if self.loads.get(shard_id, 0) < capacity:
+                return shard_id
+        return self.ring.node_for(wallet)
+
+    def _move(self, wallet: str, shard_id: int):
+        current = self.assignments.get(wallet)
+        if current is not None:
+            # Der alte Shard liefert weiter, bis der neue bestätigt; Doppeltes fängt der Dedup-Index ab
+            self.subscribed.discard(wallet)
+            previous = self.draining.pop(wallet, None)
+            if previous is not None and previous != shard_id:
+                self._send(previous, UNSUBSCRIBE, wallet)
+            self.draining[wallet] = current
+            self.moves += 1
+        self.assignments[wallet] = shard_id
+        self.loads[shard_id] = self.loads.get(shard_id, 0) + 1
+        self._send(shard_id, SUBSCRIBE, wallet)
+
+    def assign(self, wallet: str):
+        if wallet in self.assignments:
+            return self.assignments[wallet]
+        shard_id = self._place(wallet, self._capacity(len(self.assignments) + 1))
+        self._move(wallet, shard_id)
+        return shard_id
+
+    def release(self, wallet: str):
+        shard_id = self.assignments.pop(wallet, None)
+        if shard_id is None:
+            return
+        self.loads[shard_id] -= 1
+        self.subscribed.discard(wallet)
+        self._send(shard_id, UNSUBSCRIBE, wallet)
+        previous = self.draining.pop(wallet, None)
+        if previous is not None:
+            self._send(previous, UNSUBSCRIBE, wallet)
+        if max(self.loads.values(), default=0) > self._capacity(len(self.assignments)):
+            self.rebalance()
+
+    def rebalance(self, prefer_owner: bool = False):
+        """Zieht Wallets von überlasteten oder entfernten Shards um."""
+        capacity = self._capacity(len(self.assignments))
+        for wallet in sorted(self.assignments, key=_hash):
+            current = self.assignments[wallet]
+            if current in self.ring.nodes and self.loads[current] <= capacity:
+                owner = self.ring.node_for(wallet)
+                if not prefer_owner or owner == current or self.loads[owner] >= capacity:
+                    continue
+            self.loads[current] -= 1
+            target = self._place(wallet, capacity)
+            if target == current:
+                self.loads[current] += 1
+                continue
+            self._move(wallet, target)
+        self.loads = {shard_id: self.loads.get(shard_id, 0) for shard_id in self.ring.nodes}
+
+    def resize(self, shards: int):
+        """Ändert die Zahl der Shard-Prozesse und zieht betroffene Wallets um."""
+        for shard_id in range(self.shard_count, shards):
+            self._spawn(shard_id)
+            self.ring.add(shard_id)
+            self.loads[shard_id] = 0
+        removed = list(range(shards, self.shard_count))
+        for shard_id in removed:
+            self.ring.remove(shard_id)
+        self.shard_count = shards
+        self.rebalance(prefer_owner=True)
+        for shard_id in removed:
+            self._send(shard_id, STOP)
+            self._close_connection(shard_id)
+            self.loop.run_in_executor(None, self.processes.pop(shard_id).join, STOP_TIMEOUT)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            for shard_id, process in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+                log.warning("Shard %s exited with code %s, restarting.", shard_id, process.exitcode,
+                            extra={"shard": shard_id})
+                self._restart(shard_id)
+
+    def _restart(self, shard_id: int):
+        self.restarts += 1
+        metrics.errors.inc("sharding")
+        self._close_connection(shard_id)
+        self._spawn(shard_id)
+        for wallet, assigned in list(self.assignments.items()):
+            if assigned == shard_id:
+                self.subscribed.discard(wallet)
+                self._send(shard_id, SUBSCRIBE, wallet)
+                if self.on_status is not None:
+                    self.on_status(wallet, None)
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            await asyncio.gather(self.watcher, return_exceptions=True)
+            self.watcher = None
+        for shard_id in list(self.connections):
+            self._send(shard_id, STOP)
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in self.processes.values():
+            await asyncio.get_running_loop().run_in_executor(
+                None, process.join, max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+        for shard_id in list(self.connections):
+            self._close_connection(shard_id)
+        self.processes = {}
+
+    def stats(self):
+        return {
+            "shards": self.shard_count,
+            "alive": sum(process.is_alive() for process in self.processes.values()),
+            "wallets": len(self.assignments),
+            "subscribed": len(self.subscribed),
+            "loads": dict(self.loads),
+            "moves": self.moves,
+            "restarts": self.restarts,
+        }
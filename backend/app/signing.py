@@ -0,0 +1,75 @@
+import asyncio
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.system_program import transfer, TransferParams
+from solders.transaction import Transaction
+
+# Ein Kern bleibt dem Event-Loop; auf einem Kern wird im Loop signiert
+SIGNING_WORKERS = int(os.getenv("SIGNING_WORKERS") or max((os.cpu_count() or 1) - 1, 0))
+MIN_PARALLEL = 8  # Darunter wird im Event-Loop signiert, der Prozesspool lohnt sich nicht
+
+
+def build_transaction(keypair: Keypair, transfers: list, blockhash: str):
+    """Eine signierte Transaktion mit je einer Transfer-Anweisung pro (Empfänger, Lamports)."""
+    payer = keypair.pubkey()
+    instructions = [
+        transfer(TransferParams(from_pubkey=payer, to_pubkey=Pubkey.from_string(recipient), lamports=lamports))
+        for recipient, lamports in transfers
+    ]
+    return Transaction([keypair], Message(instructions, payer), Hash.from_string(blockhash))
+
+
+def _sign_chunk(jobs: list):
+    """Läuft im Pool-Prozess; Keypairs kommen als Bytes, da sie sich nicht picklen lassen."""
+    return [bytes(build_transaction(Keypair.from_bytes(secret), transfers, blockhash))
+            for secret, transfers, blockhash in jobs]
+
+
+class TransactionSigner:
+    """Signiert die Transaktionen mehrerer Follower-Konten parallel in einem Prozesspool."""
+
+    def __init__(self, workers: int = SIGNING_WORKERS, min_parallel: int = MIN_PARALLEL):
+        self.workers = workers
+        self.min_parallel = min_parallel
+        self.pool = None
+        self.signed = 0
+        self.parallel = 0  # Davon im Prozesspool signiert
+
+    def _pool(self):
+        if self.pool is None:
+            # Kein fork eines laufenden Event-Loops
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    def start(self):
+        """Startet die Pool-Prozesse vorab, damit der erste große Flush nicht auf ihren Start wartet."""
+        if self.workers >= 1:
+            pool = self._pool()
+            for _ in range(self.workers):
+                pool.submit(_sign_chunk, [])
+
+    async def sign(self, jobs: list):
+        """Signiert [(Keypair, [(Empfänger, Lamports)], Blockhash)] und gibt die serialisierten Transaktionen zurück."""
+        self.signed += len(jobs)
+        if self.workers < 1 or len(jobs) < self.min_parallel:
+            return [bytes(build_transaction(keypair, transfers, blockhash)) for keypair, transfers, blockhash in jobs]
+        self.parallel += len(jobs)
+        payload = [(bytes(keypair), transfers, blockhash) for keypair, transfers, blockhash in jobs]
+        size = -(-len(payload) // self.workers)
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(loop.run_in_executor(self._pool(), _sign_chunk, payload[i:i + size])
+                                        for i in range(0, len(payload), size)))
+        return [transaction for chunk in chunks for transaction in chunk]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def stats(self):
+        return {"workers": self.workers, "signed": self.signed, "parallel": self.parallel}
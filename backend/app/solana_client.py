@@ -1,81 +1,345 @@
 import asyncio
-import websockets
+import base64
 import json
+import os
 from solders.pubkey import Pubkey
 from solders.keypair import Keypair
-from solana.rpc.api import Client
-from solders.transaction import Transaction
-from solders.message import Message
-from solders.system_program import transfer, TransferParams
-from solders.hash import Hash
+from app.balances import BalanceStore
+from app.blockhash import BlockhashCache
+from app.confirmations import ConfirmationTracker, MAX_RESUBMITS, FAILED, EXPIRED
+from app.batching import TransferBatcher, PendingTransfer, MAX_WAIT
+from app.followers import FollowerSet
+from app.signing import TransactionSigner, SIGNING_WORKERS, build_transaction
+from app.rpc import RpcPool, POOL_SIZE, TIMEOUT, HEDGE_DELAY
+from app.ratelimit import TRADE, BACKGROUND
+from app.subscriptions import SubscriptionMultiplexer, ACCOUNT
+from app.logs import get_logger
+
+log = get_logger("client")
 
 SOLANA_RPC_URL = "https://api.mainnet-beta.solana.com"
 WS_URL = "wss://api.mainnet-beta.solana.com"
+# Kommagetrennte Listen weiterer Endpunkte, der erste ist der bevorzugte
+SOLANA_RPC_URLS = os.getenv("SOLANA_RPC_URLS", SOLANA_RPC_URL).split(",")
+WS_URLS = os.getenv("SOLANA_WS_URLS", WS_URL).split(",")
+SUBSCRIPTION_MODE = os.getenv("SUBSCRIPTION_MODE", ACCOUNT)
+# Aufrufe pro Sekunde und Endpunkt; leer oder 0 begrenzt nicht
+RPC_RATE_LIMIT = float(os.getenv("RPC_RATE_LIMIT") or 0) or None
+RPC_BURST = float(os.getenv("RPC_BURST") or 0) or None
+MULTIPLE_ACCOUNTS_LIMIT = 100  # Obergrenze von getMultipleAccounts je Aufruf
+SIGNATURE_LIMIT = 10  # Signaturen, die pro Kontostandsänderung nachgeschlagen werden
+COMMITMENT = "confirmed"
+SIGNATURE_FEE_LAMPORTS = 5000
+
+
+def keypair_from_hex(private_key: str):
+    """Liest einen Schlüssel als Hex: 64 Byte Keypair oder 32 Byte Seed. ValueError bei ungültigem Schlüssel."""
+    secret = bytes.fromhex(private_key.strip())
+    if len(secret) == 32:
+        return Keypair.from_seed(secret)
+    if len(secret) == 64:
+        return Keypair.from_bytes(secret)
+    raise ValueError(f"Private key must be 32 or 64 bytes, got {len(secret)}")
+
 
 class SolanaClient:
-    def __init__(self):
-        self.client = Client(SOLANA_RPC_URL)
-        self.keypair = None
-        self.subscribed_wallets = set()
+    def __init__(self, rpc_url=SOLANA_RPC_URLS, ws_url=WS_URLS, pool_size: int = POOL_SIZE,
+                 timeout: float = TIMEOUT, batch_wait: float = MAX_WAIT, hedge_delay: float = HEDGE_DELAY,
+                 subscription_mode: str = SUBSCRIPTION_MODE, rate_limit: float = RPC_RATE_LIMIT,
+                 burst: float = RPC_BURST, max_resubmits: int = MAX_RESUBMITS,
+                 signing_workers: int = SIGNING_WORKERS):
+        # rpc_url und ws_url: eine URL oder eine Liste von Endpunkten
+        self.rpc = RpcPool(rpc_url, pool_size=pool_size, timeout=timeout, hedge_delay=hedge_delay,
+                           rate_limit=rate_limit, burst=burst)
+        self.inflight = {}  # (Methode, Params) -> (Task, Priorität) laufender Leseanfragen
+        self.coalesced = 0
+        self.followers = FollowerSet()
+        self.signer = TransactionSigner(signing_workers)
+        self.subscriptions = SubscriptionMultiplexer(ws_url, mode=subscription_mode)
+        self.balances = BalanceStore()
+        self.blockhashes = BlockhashCache(self.rpc, COMMITMENT)
+        self.confirmations = ConfirmationTracker(self.rpc, self.blockhashes, self._resend,
+                                                 max_resubmits=max_resubmits)
+        self.confirmations.add_listener(self._on_confirmation)
+        # None: jeder Transfer wird einzeln gesendet
+        self.batcher = TransferBatcher(self._send_batches, batch_wait) if batch_wait else None
+
+    @property
+    def keypair(self):
+        """Keypair des Hauptkontos oder None."""
+        primary = self.followers.primary
+        return primary.keypair if primary is not None else None
+
+    @keypair.setter
+    def keypair(self, keypair: Keypair):
+        if keypair is None:
+            primary = self.followers.primary
+            if primary is not None:
+                self.followers.remove(primary.pubkey)
+        else:
+            self.followers.add(keypair, primary=True)
 
     def set_private_key(self, private_key: str):
         try:
-            secret_key = bytes.fromhex(private_key)
-            self.keypair = Keypair.from_secret_key(secret_key)
-            print(f"Private key set successfully. Public Key: {self.keypair.pubkey()}")
+            self.keypair = keypair_from_hex(private_key)
+            log.info("Private key set successfully. Public Key: %s", self.keypair.pubkey())
         except Exception as e:
-            print(f"Error setting private key: {e}")
+            log.error("Error setting private key: %s", e)
+
+    def add_follower(self, private_key: str, allocations: dict = None, default_allocation: float = None):
+        """Fügt ein weiteres eigenes Konto hinzu, das jeden Leader-Trade mitkopiert."""
+        keypair = keypair_from_hex(private_key)
+        follower = self.followers.add(keypair, allocations, default_allocation)
+        log.info("Follower added. Public Key: %s", follower.pubkey, extra={"follower": follower.pubkey})
+        return follower
+
+    @staticmethod
+    def _balance_params(wallet_address):
+        pubkey = Pubkey.from_string(str(wallet_address))
+        return [str(pubkey), {"commitment": COMMITMENT}]
 
     def get_balance(self, wallet_address: str):
+        """Synchroner Wrapper für Routen ohne Event-Loop."""
         try:
-            pubkey = Pubkey.from_string(wallet_address)
-            response = self.client.get_balance(pubkey)
-            return response.value / 10**9 if response.value else 0.0
+            result = self.rpc.request("getBalance", self._balance_params(wallet_address))
+            return result["value"] / 10**9 if result["value"] else 0.0
         except Exception as e:
-            print(f"Error fetching balance for {wallet_address}: {e}")
+            log.warning("Error fetching balance for %s: %s", wallet_address, e, extra={"wallet": wallet_address})
             return 0.0
 
+    async def _single_flight(self, method: str, params: list, priority: int):
+        """Identische gleichzeitige Leseanfragen teilen sich einen RPC-Aufruf und dessen Antwort."""
+        key = (method, json.dumps(params, sort_keys=True))
+        entry = self.inflight.get(key)
+        if entry is not None and entry[1] <= priority:
+            self.coalesced += 1
+            task = entry[0]
+        else:
+            # Eine dringlichere Anfrage wartet nicht auf eine nachrangig eingereihte
+            task = asyncio.ensure_future(self.rpc.arequest(method, params, priority=priority))
+            self.inflight[key] = (task, priority)
+            task.add_done_callback(lambda done: self._flight_done(key, done))
+        # Abbruch eines Wartenden beendet nicht den gemeinsamen Aufruf
+        return await asyncio.shield(task)
+
+    def _flight_done(self, key, task):
+        entry = self.inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            task.exception()  # Als abgerufen markieren, auch wenn niemand mehr wartet
+
+    async def get_balance_async(self, wallet_address: str, priority: int = BACKGROUND):
+        """Fragt den Kontostand ab, ohne den Event-Loop zu blockieren."""
+        try:
+            result = await self._single_flight("getBalance", self._balance_params(wallet_address), priority)
+            self.balances.update(str(wallet_address), result["value"], result["context"]["slot"])
+            return result["value"] / 10**9 if result["value"] else 0.0
+        except Exception as e:
+            log.warning("Error fetching balance for %s: %s", wallet_address, e, extra={"wallet": wallet_address})
+            return 0.0
+
+    async def get_balance_cached(self, wallet_address: str, priority: int = TRADE):
+        """Liest den Kontostand aus dem lokalen Spiegel, RPC nur bei Kaltstart oder veraltetem Eintrag."""
+        lamports = self.balances.get(str(wallet_address))
+        if lamports is None:
+            return await self.get_balance_async(wallet_address, priority)
+        return lamports / 10**9
+
+    async def get_balances_cached(self, wallet_addresses: list, priority: int = TRADE):
+        """Kontostände mehrerer Konten in Lamports aus dem Spiegel, fehlende gemeinsam nachgeladen."""
+        lamports = [self.balances.get(address) for address in wallet_addresses]
+        missing = [address for address, value in zip(wallet_addresses, lamports) if value is None]
+        if not missing:
+            return lamports
+        # Nur Lamports, keine Kontodaten
+        config = {"commitment": COMMITMENT, "encoding": "base64", "dataSlice": {"offset": 0, "length": 0}}
+        chunks = [missing[i:i + MULTIPLE_ACCOUNTS_LIMIT] for i in range(0, len(missing), MULTIPLE_ACCOUNTS_LIMIT)]
+        results = await asyncio.gather(*(self._single_flight("getMultipleAccounts", [chunk, config], priority)
+                                         for chunk in chunks), return_exceptions=True)
+        fetched = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                log.warning("Error fetching balances of %s accounts: %s", len(chunk), result)
+                continue
+            slot = result["context"]["slot"]
+            for address, account in zip(chunk, result["value"]):
+                fetched[address] = account["lamports"] if account else 0
+                self.balances.update(address, fetched[address], slot)
+        return [self.balances.available(address, fetched.get(address, 0)) if value is None else value
+                for address, value in zip(wallet_addresses, lamports)]
+
+    async def get_transactions_batch_async(self, signatures: list):
+        """Lädt bestätigte Transaktionen (jsonParsed) in einem JSON-RPC-Batch nach."""
+        config = {"encoding": "jsonParsed", "commitment": COMMITMENT, "maxSupportedTransactionVersion": 0}
+        return await self.rpc.abatch([("getTransaction", [signature, config]) for signature in signatures])
+
+    async def get_signatures_batch_async(self, wallet_addresses: list, limit: int = SIGNATURE_LIMIT):
+        """Gibt je Wallet die jüngsten Signaturen zurück, neueste zuerst (oder einen RpcError)."""
+        config = {"limit": limit, "commitment": COMMITMENT}
+        return await self.rpc.abatch([("getSignaturesForAddress", [str(address), config])
+                                      for address in wallet_addresses])
+
+    @property
+    def subscribed_wallets(self):
+        return set(self.subscriptions.assignments)
+
     async def subscribe_to_transactions(self, wallet_address: str, callback):
-        if wallet_address in self.subscribed_wallets:
-            print(f"Already subscribed to wallet: {wallet_address}")
+        """Abonniert eine Wallet über die gemeinsame WebSocket-Verbindung."""
+        if self.subscriptions.is_subscribed(wallet_address):
+            log.info("Already subscribed to wallet: %s", wallet_address, extra={"wallet": wallet_address})
             return
 
-        self.subscribed_wallets.add(wallet_address)
         try:
-            async with websockets.connect(WS_URL) as websocket:
-                subscription_request = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "accountSubscribe",
-                    "params": [wallet_address, {"encoding": "jsonParsed"}]
-                }
-                await websocket.send(json.dumps(subscription_request))
-                print(f"Subscribed to wallet: {wallet_address}")
-
-                while True:
-                    response = await websocket.recv()
-                    data = json.loads(response)
-                    await callback(wallet_address, data)
+            await self.subscriptions.subscribe(wallet_address, callback)
+            log.info("Subscribed to wallet: %s", wallet_address, extra={"wallet": wallet_address})
         except Exception as e:
-            print(f"Error in WebSocket subscription for {wallet_address}: {e}")
-            self.subscribed_wallets.remove(wallet_address)
+            log.error("Error in WebSocket subscription for %s: %s", wallet_address, e, extra={"wallet": wallet_address})
+            raise
+
+    async def unsubscribe_from_transactions(self, wallet_address: str):
+        """Beendet das Abo einer Wallet, andere Abos bleiben verbunden."""
+        if await self.subscriptions.unsubscribe(wallet_address):
+            log.info("Unsubscribed from wallet: %s", wallet_address, extra={"wallet": wallet_address})
+
+    def _build_transaction(self, recipient_address: str, amount: float, blockhash: str, payer: Keypair = None):
+        return build_transaction(payer or self.keypair, [(recipient_address, int(amount * 10**9))], blockhash)
+
+    @staticmethod
+    def _send_params(transaction):
+        encoded = base64.b64encode(bytes(transaction)).decode()
+        return [encoded, {"encoding": "base64", "preflightCommitment": COMMITMENT}]
 
     def execute_transaction(self, recipient_address: str, amount: float):
+        """Synchroner Wrapper für Routen ohne Event-Loop."""
+        try:
+            blockhash = self.blockhashes.peek()
+            if blockhash is None:
+                self.blockhashes.misses += 1
+                result = self.rpc.request("getLatestBlockhash", [{"commitment": COMMITMENT}])
+                self.blockhashes.store(result["value"])
+                blockhash = result["value"]["blockhash"]
+            transaction = self._build_transaction(recipient_address, amount, blockhash)
+            return self.rpc.request("sendTransaction", self._send_params(transaction)) or None
+        except Exception as e:
+            log.error("Error executing transaction: %s", e)
+            return None
+
+    async def execute_transaction_async(self, recipient_address: str, amount: float, trace=None,
+                                        payer: Keypair = None):
+        """Signiert und sendet einen Transfer, ohne den Event-Loop zu blockieren."""
+        payer = payer or self.keypair
         try:
-            recipient_pubkey = Pubkey.from_string(recipient_address)
-            lamports = int(amount * 10**9)
-            instruction = transfer(
-                TransferParams(
-                    from_pubkey=self.keypair.pubkey(),
-                    to_pubkey=recipient_pubkey,
-                    lamports=lamports
-                )
-            )
-            blockhash = self.client.get_recent_blockhash().value.blockhash
-            message = Message([instruction], self.keypair.pubkey())
-            transaction = Transaction(message, [self.keypair], Hash.from_string(blockhash))
-            response = self.client.send_transaction(transaction)
-            return response.value if response.value else None
+            blockhash = await self.blockhashes.get()
+            if trace is not None:
+                trace.mark("blockhash")
+            transaction = self._build_transaction(recipient_address, amount, blockhash, payer)
+            if trace is not None:
+                trace.mark("sign")
+            signature = await self.rpc.arequest("sendTransaction", self._send_params(transaction))
+            if trace is not None:
+                trace.mark("send")
+            if signature:
+                # Eigenen Stand sofort nachführen; neuere Slots oder der nächste RPC-Abgleich korrigieren ihn
+                self.balances.adjust(str(payer.pubkey()), -(int(amount * 10**9) + SIGNATURE_FEE_LAMPORTS))
+                self.confirmations.track(signature, self.blockhashes.valid_until(blockhash),
+                                         [(recipient_address, int(amount * 10**9))], payer)
+            return signature or None
         except Exception as e:
-            print(f"Error executing transaction: {e}")
+            log.error("Error executing transaction: %s", e)
             return None
+
+    async def queue_transfer(self, recipient_address: str, amount: float, trace=None, payer: Keypair = None):
+        """Reiht einen Transfer ein, gebündelt mit anderen aus demselben Zeitfenster."""
+        payer = payer or self.keypair
+        lamports = int(amount * 10**9)
+        address = str(payer.pubkey())
+        needed = lamports + SIGNATURE_FEE_LAMPORTS
+        if not self.balances.reserve(address, needed):
+            log.warning("Insufficient balance in %s for a transfer of %s lamports.", address, lamports,
+                        extra={"follower": address})
+            return self._rejected_transfer(recipient_address, lamports, trace, payer)
+        if self.batcher is None:
+            future = asyncio.ensure_future(self.execute_transaction_async(recipient_address, amount, trace, payer))
+            transfer = PendingTransfer(recipient_address, lamports, trace, future, payer)
+        else:
+            try:
+                Pubkey.from_string(recipient_address)
+            except ValueError as e:
+                # Ein ungültiger Empfänger darf nicht den ganzen Batch scheitern lassen
+                log.error("Error executing transaction: %s", e)
+                self.balances.release(address, needed)
+                return self._rejected_transfer(recipient_address, lamports, trace, payer)
+            try:
+                transfer = await self.batcher.submit(recipient_address, lamports, trace, payer)
+            except BaseException:
+                self.balances.release(address, needed)
+                raise
+        # Nach dem Senden ist der Betrag abgebucht (oder nie abgeflossen); die Vormerkung endet
+        transfer.future.add_done_callback(lambda _: self.balances.release(address, needed))
+        return transfer
+
+    @staticmethod
+    def _rejected_transfer(recipient_address: str, lamports: int, trace, payer: Keypair):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return PendingTransfer(recipient_address, lamports, trace, future, payer)
+
+    async def _send_batches(self, batches: list):
+        """Signiert die Batches aller Follower-Konten gemeinsam und sendet sie in einem JSON-RPC-Batch."""
+        blockhash = await self.blockhashes.get()
+        traces = [pending.trace for _, batch in batches for pending in batch if pending.trace is not None]
+        for trace in traces:
+            trace.mark("blockhash")
+        jobs = [(payer, [(pending.recipient, pending.lamports) for pending in batch], blockhash)
+                for payer, batch in batches]
+        transactions = await self.signer.sign(jobs)
+        for trace in traces:
+            trace.mark("sign")
+        if len(transactions) == 1:
+            results = [await self.rpc.arequest("sendTransaction", self._send_params(transactions[0]))]
+        else:
+            # Alle Follower-Transaktionen in einem HTTP-Aufruf statt vieler paralleler Verbindungen
+            results = await self.rpc.abatch([("sendTransaction", self._send_params(transaction))
+                                             for transaction in transactions])
+        for trace in traces:
+            trace.mark("send")
+        valid_until = self.blockhashes.valid_until(blockhash)
+        signatures = []
+        for (payer, transfers, _), signature in zip(jobs, results):
+            if isinstance(signature, Exception):
+                log.warning("Error sending transfer batch of %s: %s", payer.pubkey(), signature)
+                signature = None
+            if signature:
+                total = sum(lamports for _, lamports in transfers)
+                self.balances.adjust(str(payer.pubkey()), -(total + SIGNATURE_FEE_LAMPORTS))
+                self.confirmations.track(signature, valid_until, transfers, payer)
+            signatures.append(signature or None)
+        return signatures
+
+    def _on_confirmation(self, pending, result: str, replacement):
+        """Bucht beim Senden abgezogene Beträge zurück, die nie abgeflossen sind."""
+        if result == FAILED:
+            refund = sum(lamports for _, lamports in pending.transfers)  # Die Gebühr ist trotzdem fällig
+        elif result == EXPIRED:
+            refund = sum(lamports for _, lamports in pending.transfers) + SIGNATURE_FEE_LAMPORTS
+        else:
+            return
+        if pending.payer is not None:
+            self.balances.adjust(str(pending.payer.pubkey()), refund)
+
+    async def _resend(self, payer: Keypair, transfers: list):
+        """Sendet die Transfers einer abgelaufenen Transaktion mit frischem Blockhash erneut."""
+        blockhash = await self.blockhashes.get()
+        transaction = build_transaction(payer or self.keypair, transfers, blockhash)
+        signature = await self.rpc.arequest("sendTransaction", self._send_params(transaction))
+        return signature or None, self.blockhashes.valid_until(blockhash)
+
+    async def close(self):
+        if self.batcher is not None:
+            await self.batcher.close()
+        await self.confirmations.stop()
+        await self.blockhashes.stop()
+        await self.subscriptions.close()
+        await self.rpc.aclose()
+        self.signer.close()
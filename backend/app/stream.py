@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+FLUSH_INTERVAL = 0.25  # Sekunden, in denen Zustandsänderungen gesammelt werden
+SUBSCRIBER_QUEUE_SIZE = 100  # Batches pro Client, danach wird der älteste verworfen
+
+WALLET = "wallet"
+WALLET_REMOVED = "wallet_removed"
+BALANCE = "balance"
+COPY = "copy"
+
+
+class StreamHub:
+    """Verteilt Zustandsänderungen gebündelt an alle verbundenen Clients."""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.pending = {}  # (Typ, Schlüssel) -> Nachricht
+        self.snapshot = {}  # Letzter Zustand je (Typ, Schlüssel) für neue Clients
+        self.subscribers = set()
+        self.event_ids = itertools.count(1)
+        self.task = None
+
+    def publish(self, kind: str, key, data: dict):
+        """Meldet einen Zustand; ältere, noch nicht verschickte Stände desselben Schlüssels entfallen."""
+        message = {"type": kind, "key": key, "data": data}
+        self.pending[(kind, key)] = message
+        self.snapshot[(kind, key)] = message
+
+    def forget(self, kind: str, key):
+        self.snapshot.pop((kind, key), None)
+        self.pending.pop((kind, key), None)
+
+    def publish_event(self, kind: str, data: dict):
+        """Meldet ein einzelnes Ereignis, das nicht zusammengefasst wird."""
+        if self.subscribers:
+            self.pending[(kind, next(self.event_ids))] = {"type": kind, "data": data}
+
+    def _deliver(self, queue: asyncio.Queue, batch: list):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(batch)
+
+    async def _run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            if not self.pending:
+                continue
+            batch = list(self.pending.values())
+            self.pending = {}
+            for queue in list(self.subscribers):
+                self._deliver(queue, batch)
+        self.task = None
+
+    @asynccontextmanager
+    async def subscription(self):
+        """Liefert eine Queue mit Batches, beginnend mit dem aktuellen Gesamtzustand."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.snapshot:
+            queue.put_nowait(list(self.snapshot.values()))
+        self.subscribers.add(queue)
+        if self.task is None:
+            # Neue Clients starten mit dem Snapshot, Liegengebliebenes ist darin enthalten
+            self.pending = {}
+            self.task = asyncio.create_task(self._run())
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+
+hub = StreamHub()
@@ -0,0 +1,309 @@
+import asyncio
+import itertools
+import json
+import time
+import websockets
+from app.metrics import metrics, Trace
+from app.notifications import prefilter_logs
+from app.logs import get_logger
+
+log = get_logger("subscriptions")
+
+MAX_SUBSCRIPTIONS_PER_CONNECTION = 1000
+MAX_CONNECTIONS = 4
+REQUEST_TIMEOUT = 10.0
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+COMMITMENT = "confirmed"
+
+# Abo-Arten: was der Server pro Wallet schickt
+ACCOUNT = "account"  # accountSubscribe mit jsonParsed, enthält die Transaktion
+ACCOUNT_BASE64 = "account_base64"  # accountSubscribe mit base64, nur Kontostand; Transaktion wird nachgeladen
+LOGS = "logs"  # logsSubscribe mit mentions-Filter, nur Signatur und Logs; Transaktion wird nachgeladen
+MODES = {
+    ACCOUNT: ("accountSubscribe", "accountUnsubscribe"),
+    ACCOUNT_BASE64: ("accountSubscribe", "accountUnsubscribe"),
+    LOGS: ("logsSubscribe", "logsUnsubscribe"),
+}
+
+
+class _Connection:
+    """Eine WebSocket-Verbindung, über die mehrere Abos laufen."""
+
+    def __init__(self, multiplexer, index: int):
+        self.multiplexer = multiplexer
+        self.index = index
+        self.websocket = None
+        self.connected = asyncio.Event()
+        self.reader_task = None
+        self.tasks = set()  # Resubscribe und Aufräumen verwaister Abos; close() bricht sie ab
+        self.pending = {}  # Request-ID -> (Future, Wallet oder None)
+        self.routes = {}  # Subscription-ID -> Wallet
+        self.subscription_ids = {}  # Wallet -> Subscription-ID
+        self.wallets = set()  # Wallets, die dieser Verbindung zugeordnet sind
+        self.subscribing = set()  # Wallets mit laufender Abo-Anfrage
+        self.url_index = index  # Verbindungen verteilen sich reihum auf die Endpunkte
+
+    @property
+    def url(self):
+        urls = self.multiplexer.ws_urls
+        return urls[self.url_index % len(urls)]
+
+    @property
+    def load(self):
+        return len(self.wallets)
+
+    async def send(self, method: str, params: list, wallet: str = None):
+        """Sendet eine JSON-RPC-Anfrage und wartet auf die passende Antwort."""
+        await asyncio.wait_for(self.connected.wait(), REQUEST_TIMEOUT)
+        request_id = next(self.multiplexer.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (future, wallet)
+        try:
+            await self.websocket.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": method,
+                "params": params,
+            }))
+            return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def run(self):
+        """Hält die Verbindung offen und verbindet bei Abbrüchen neu."""
+        delay = RECONNECT_DELAY
+        while not self.multiplexer.closed:
+            try:
+                async with websockets.connect(self.url, max_size=None) as websocket:
+                    self.websocket = websocket
+                    self.connected.set()
+                    delay = RECONNECT_DELAY
+                    if self.wallets:
+                        self._spawn(self.resubscribe())
+                    async for message in websocket:
+                        await self.dispatch(message, time.perf_counter())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.errors.inc("subscription")
+                log.warning("WebSocket connection %s to %s failed: %s", self.index, self.url, e,
+                            extra={"connection": self.index, "endpoint": self.url})
+                # Beim nächsten Versuch den nächsten Endpunkt nehmen
+                self.url_index += 1
+            finally:
+                self.connected.clear()
+                self.websocket = None
+                self.fail_pending(ConnectionError("WebSocket connection closed"))
+
+            if self.multiplexer.closed:
+                break
+            self.multiplexer.reconnects += 1
+            metrics.ws_reconnects.inc()
+            # Alte Subscription-IDs sind nach dem Reconnect ungültig
+            self.routes.clear()
+            self.subscription_ids.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def dispatch(self, message, received_at: float = None):
+        prefilter = self.multiplexer.prefilter
+        if prefilter is not None and not prefilter(message):
+            self.multiplexer.filtered += 1
+            metrics.filtered.inc()
+            return
+        data = json.loads(message)
+        request_id = data.get("id")
+        if request_id is not None:
+            entry = self.pending.get(request_id)
+            if entry is None:
+                return
+            future, wallet = entry
+            if future.done():
+                return
+            if "error" in data:
+                future.set_exception(RuntimeError(data["error"]))
+                return
+            if wallet is not None:
+                if wallet in self.wallets:
+                    # Route sofort setzen, damit keine direkt folgende Notification verloren geht
+                    self.routes[data["result"]] = wallet
+                    self.subscription_ids[wallet] = data["result"]
+                else:
+                    # Während der Anfrage abgemeldet: sonst bliebe das Abo serverseitig offen
+                    self._spawn(self.unsubscribe(data["result"]))
+            future.set_result(data["result"])
+            return
+
+        params = data.get("params")
+        if not params:
+            return
+        wallet = self.routes.get(params.get("subscription"))
+        if wallet is None:
+            return
+        callback = self.multiplexer.callbacks.get(wallet)
+        if callback is not None:
+            trace = Trace(wallet, received_at)
+            trace.mark("decode")
+            await callback(wallet, params, trace)
+
+    async def subscribe(self, wallet: str):
+        self.subscribing.add(wallet)
+        try:
+            return await self.send(self.multiplexer.subscribe_method, self.multiplexer.subscribe_params(wallet),
+                                   wallet)
+        finally:
+            self.subscribing.discard(wallet)
+
+    async def resubscribe(self):
+        """Meldet nach einem Reconnect alle Wallets dieser Verbindung erneut an."""
+        wallets = [w for w in self.wallets if w not in self.subscribing and w not in self.subscription_ids]
+        results = await asyncio.gather(*(self.subscribe(w) for w in wallets), return_exceptions=True)
+        for wallet, result in zip(wallets, results):
+            if isinstance(result, Exception):
+                log.warning("Error resubscribing wallet %s: %s", wallet, result, extra={"wallet": wallet})
+
+    async def unsubscribe(self, subscription_id):
+        await self.send(self.multiplexer.unsubscribe_method, [subscription_id])
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("Background task of WebSocket connection %s failed: %s", self.index, task.exception(),
+                        extra={"connection": self.index})
+
+    def fail_pending(self, error: Exception):
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.reader_task:
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.fail_pending(ConnectionError("WebSocket connection closed"))
+
+
+class SubscriptionMultiplexer:
+    """Verteilt viele Wallet-Abos auf einen kleinen Pool von WebSocket-Verbindungen."""
+
+    def __init__(self, ws_url, max_connections: int = MAX_CONNECTIONS,
+                 max_subscriptions_per_connection: int = MAX_SUBSCRIPTIONS_PER_CONNECTION, mode: str = ACCOUNT):
+        if mode not in MODES:
+            raise ValueError(f"Unknown subscription mode: {mode}")
+        # Eine URL oder eine Liste; bei mehreren wechselt eine Verbindung nach Abbrüchen den Endpunkt
+        self.ws_urls = [ws_url] if isinstance(ws_url, str) else list(ws_url)
+        self.ws_url = self.ws_urls[0]
+        self.max_connections = max_connections
+        self.mode = mode
+        self.subscribe_method, self.unsubscribe_method = MODES[mode]
+        # Verwirft irrelevante Nachrichten, bevor sie dekodiert werden
+        self.prefilter = prefilter_logs if mode == LOGS else None
+        self.filtered = 0
+        self.max_subscriptions_per_connection = max_subscriptions_per_connection
+        self.connections = []
+        self.callbacks = {}  # Wallet -> Callback
+        self.assignments = {}  # Wallet -> _Connection
+        self.request_ids = itertools.count(1)
+        self.reconnects = 0
+        self.closed = False
+        self._lock = asyncio.Lock()
+
+    def subscribe_params(self, wallet_address: str):
+        if self.mode == LOGS:
+            return [{"mentions": [wallet_address]}, {"commitment": COMMITMENT}]
+        if self.mode == ACCOUNT_BASE64:
+            return [wallet_address, {"encoding": "base64", "commitment": COMMITMENT}]
+        return [wallet_address, {"encoding": "jsonParsed"}]
+
+    def _pick_connection(self):
+        """Wählt die am wenigsten ausgelastete Verbindung oder öffnet eine neue."""
+        available = [c for c in self.connections if c.load < self.max_subscriptions_per_connection]
+        if available:
+            return min(available, key=lambda c: c.load)
+        if len(self.connections) < self.max_connections:
+            connection = _Connection(self, len(self.connections))
+            connection.reader_task = asyncio.create_task(connection.run())
+            self.connections.append(connection)
+            return connection
+        # Pool ist voll: auf die Verbindung mit der geringsten Last legen
+        return min(self.connections, key=lambda c: c.load)
+
+    async def subscribe(self, wallet_address: str, callback):
+        """Abonniert eine Wallet. Gibt die Subscription-ID zurück."""
+        async with self._lock:
+            if self.closed:
+                raise RuntimeError("Subscription multiplexer is closed")
+            if wallet_address in self.assignments:
+                self.callbacks[wallet_address] = callback
+                return self.assignments[wallet_address].subscription_ids.get(wallet_address)
+            connection = self._pick_connection()
+            connection.wallets.add(wallet_address)
+            self.assignments[wallet_address] = connection
+            self.callbacks[wallet_address] = callback
+
+        try:
+            return await connection.subscribe(wallet_address)
+        except Exception:
+            self._forget(wallet_address)
+            raise
+
+    async def unsubscribe(self, wallet_address: str):
+        """Beendet das Abo einer Wallet, ohne die Verbindung zu schließen."""
+        connection = self.assignments.get(wallet_address)
+        if connection is None:
+            return False
+        subscription_id = self._forget(wallet_address)
+        if subscription_id is None:
+            return True
+        try:
+            await connection.unsubscribe(subscription_id)
+        except Exception as e:
+            log.warning("Error unsubscribing wallet %s: %s", wallet_address, e, extra={"wallet": wallet_address})
+        return True
+
+    def _forget(self, wallet_address: str):
+        """Entfernt alle Zuordnungen einer Wallet und gibt ihre Subscription-ID zurück."""
+        connection = self.assignments.pop(wallet_address, None)
+        self.callbacks.pop(wallet_address, None)
+        if connection is None:
+            return None
+        connection.wallets.discard(wallet_address)
+        subscription_id = connection.subscription_ids.pop(wallet_address, None)
+        if subscription_id is not None:
+            connection.routes.pop(subscription_id, None)
+        return subscription_id
+
+    def is_subscribed(self, wallet_address: str):
+        return wallet_address in self.assignments
+
+    def stats(self):
+        return {
+            "connections": len(self.connections),
+            "subscriptions": len(self.assignments),
+            "reconnects": self.reconnects,
+            "mode": self.mode,
+            "filtered": self.filtered,
+            "per_connection": [c.load for c in self.connections],
+            "endpoints": {url: sum(1 for c in self.connections if c.url == url) for url in self.ws_urls},
+        }
+
+    async def close(self):
+        self.closed = True
+        for connection in self.connections:
+            await connection.close()
+        self.connections.clear()
+        self.assignments.clear()
+        self.callbacks.clear()
@@ -1,111 +1,597 @@
 import asyncio
-from app.database import SessionLocal
-from app.crud import get_wallets
-import traceback
+import os
+import time
+import numpy as np
+from app.database import AsyncSessionLocal
+from app.crud import get_wallets_async
+from app.registry import WalletRegistry, ADDED, REMOVED
+from app.execution import TradeQueue, CopyIntent, QUEUE_SIZE, EXECUTORS, DROP_OLDEST
+from app.dedup import DedupIndex, CAPACITY as DEDUP_CAPACITY, TTL as DEDUP_TTL, JOURNAL_PATH
+from app.dedup import notification_key
+from app.notifications import ParsedNotification, NotificationHint, parse_notification, parse_hint, parse_transaction
+from app.subscriptions import ACCOUNT
+from app.sharding import ShardCoordinator
+from app.ledger import TradeLedger, SENT, FAILED, CONFIRMED, EXPIRED
+from app import confirmations
+from app.solana_client import SIGNATURE_FEE_LAMPORTS
+from app.metrics import metrics, Trace
+from app.stream import hub, COPY
+from app.backtest import HistoryRecorder, HISTORY_PATH
+from app.checkpoints import CheckpointStore, CHECKPOINT_PATH, CHECKPOINT_INTERVAL
+from app.ratelimit import TokenBucket, BACKGROUND
+from app.logs import get_logger
+
+log = get_logger("worker")
+notification_log = get_logger("notifications")  # Je Notification, standardmäßig gesampelt
+copy_log = get_logger("copies")
+
+RECONCILE_INTERVAL = 60  # Sekunden zwischen zwei Abgleichen mit der Datenbank
+FETCH_CONCURRENCY = 4  # Gleichzeitige Batch-Abrufe nachgeladener Transaktionen
+FETCH_BATCH_SIZE = 50  # Transaktionen pro JSON-RPC-Batch
+FETCH_ATTEMPTS = 5  # Versuche je Hinweis, bis die Transaktion aufgegeben wird
+FETCH_RETRY_DELAY = 0.5  # Sekunden bis zum zweiten Versuch, danach jeweils doppelt so lange
+HINT_QUEUE_SIZE = 10_000  # Hinweise, die auf das Nachladen warten dürfen
+SUBSCRIBE_RATE = float(os.getenv("SUBSCRIBE_RATE", "100"))  # Neue Abos pro Sekunde beim (Wieder-)Anlauf
+SUBSCRIBE_BURST = 100  # Abos, die auf einmal angestoßen werden dürfen
+SUBSCRIBE_RETRY = 5.0  # Sekunden bis zum erneuten Versuch eines fehlgeschlagenen Abos
+# Bereitschaft einer Wallet
+QUEUED = "queued"  # Wartet auf ein Token der Anlauframpe
+SUBSCRIBING = "subscribing"
+READY = "ready"  # Abo bestätigt, Notifications werden kopiert
+RETRYING = "retrying"  # Abo fehlgeschlagen, neuer Versuch nach SUBSCRIBE_RETRY
+READINESS_STATES = (QUEUED, SUBSCRIBING, READY, RETRYING)
+# Ergebnis der Bestätigungsverfolgung -> Status im Ledger
+SETTLED_STATUSES = {confirmations.LANDED: CONFIRMED, confirmations.FAILED: FAILED, confirmations.EXPIRED: EXPIRED}
 
 class MonitoringWorker:
-    def __init__(self, solana_client):
+    def __init__(self, solana_client, registry: WalletRegistry = None, queue_size: int = QUEUE_SIZE,
+                 executors: int = EXECUTORS, overflow: str = DROP_OLDEST,
+                 reconcile_interval: float = RECONCILE_INTERVAL, dedup_path: str = JOURNAL_PATH,
+                 ledger_sessions=AsyncSessionLocal, shards: int = 0, history_path: str = HISTORY_PATH,
+                 checkpoint_path: str = CHECKPOINT_PATH, subscribe_rate: float = SUBSCRIBE_RATE,
+                 dedup_capacity: int = DEDUP_CAPACITY, dedup_ttl: float = DEDUP_TTL):
         self.client = solana_client
+        self.reconcile_interval = reconcile_interval  # None deaktiviert den Datenbankabgleich
+        self.registry = registry if registry is not None else WalletRegistry()
+        self.dedup = DedupIndex(dedup_capacity, dedup_ttl, dedup_path)
+        self.history = HistoryRecorder(history_path)  # Leader-Transfers für den Backtest
+        self.checkpoints = CheckpointStore(checkpoint_path)
+        # Begrenzt neue Abos samt Kontostandsabfragen, damit ein Neustart keinen Verbindungssturm auslöst
+        self.ramp = TokenBucket(subscribe_rate, SUBSCRIBE_BURST)
+        # None: kopierte Trades nicht protokollieren (z. B. im Benchmark)
+        self.ledger = TradeLedger(ledger_sessions, on_flush=self._apply_trade_stats) if ledger_sessions else None
+        # shards > 0: Abos, Dekodieren und Parsen laufen in eigenen Prozessen
+        self.mode = solana_client.subscriptions.mode
+        self.shards = ShardCoordinator(solana_client.subscriptions.ws_urls, shards, self._on_shard_notification,
+                                       mode=self.mode, on_status=self._on_shard_status) if shards else None
+        self.queue = TradeQueue(self.execute_intent, maxsize=queue_size, executors=executors, overflow=overflow)
         self.running = False
         self.subscribed_wallets = set()
+        self.readiness = {}  # Wallet -> [Zustand, seit (Unix-Zeit), Warmstart]
+        self.readiness_counts = dict.fromkeys(READINESS_STATES, 0)
+        self.started_at = None
+        self.all_ready_after = None  # Sekunden ab Start, bis erstmals alle Wallets bereit waren
+        self.warm_starts = 0
+        self.pending_subscriptions = None  # Wallets vor der Anlauframpe
+        self.subscribe_tasks = set()
+        self.events = None
+        self.tasks = []
+        self.hints = None  # Notifications, deren Transaktionen nachgeladen werden
+        self._listener = None
 
     async def start(self):
         if self.running:
-            print("Monitoring worker already running.")
+            log.info("Monitoring worker already running.")
             return
 
         self.running = True
-        asyncio.create_task(self.monitor_wallets())
-        print("Monitoring worker started.")
+        self.started_at = time.time()
+        self.all_ready_after = None
+        self.dedup.load()
+        self.history.open()
+        self.checkpoints.load()
+        self.warm_start()
+        self.events = asyncio.Queue()
+        self.pending_subscriptions = asyncio.Queue()
+        self.hints = asyncio.Queue(HINT_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        # Endpunkte können auch aus dem Threadpool heraus Änderungen melden
+        self._listener = lambda event, wallet: loop.call_soon_threadsafe(self.events.put_nowait, (event, wallet))
+        self.registry.add_listener(self._listener)
+        self.client.rpc.start()
+        self.client.blockhashes.start()
+        self.queue.start()
+        if self.ledger is not None:
+            self.ledger.start()
+            self.client.confirmations.add_listener(self._on_confirmation)
+        self.client.confirmations.start()
+        self.client.signer.start()
+        if self.shards is not None:
+            self.shards.start()
+        self.tasks = [asyncio.create_task(self.monitor_wallets()), asyncio.create_task(self.subscribe_wallets()),
+                      asyncio.create_task(self.save_checkpoints())]
+        if self.mode != ACCOUNT:
+            self.tasks.extend(asyncio.create_task(self.fetch_transactions()) for _ in range(FETCH_CONCURRENCY))
+        if self.reconcile_interval is not None:
+            self.tasks.append(asyncio.create_task(self.reconcile_wallets()))
+        log.info("Monitoring worker started.")
 
     async def stop(self):
         self.running = False
-        print("Monitoring worker stopped.")
+        self.registry.remove_listener(self._listener)
+        for task in self.tasks:
+            task.cancel()
+        for task in self.subscribe_tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.subscribe_tasks, return_exceptions=True)
+        self.tasks = []
+        self.subscribe_tasks.clear()
+        await self._save_checkpoint()
+        if self.shards is not None:
+            await self.shards.stop()
+        await self.queue.stop()
+        if self.client.batcher is not None:
+            # Offene Batches senden, solange das Ledger ihre Ergebnisse noch annimmt
+            await self.client.batcher.close()
+        await self.client.confirmations.stop()
+        if self.ledger is not None:
+            self.client.confirmations.remove_listener(self._on_confirmation)
+            await self.ledger.stop()
+        self.dedup.close()
+        self.history.close()
+        await self.client.close()
+        log.info("Monitoring worker stopped.")
 
-    async def monitor_wallets(self):
+    def _apply_trade_stats(self, deltas: dict):
+        for wallet_address, (pnl_delta, active_delta) in deltas.items():
+            self.registry.apply_trade_stats(wallet_address, pnl_delta, active_delta)
+
+    def _on_confirmation(self, pending, result: str, replacement):
+        """Schreibt das Ergebnis einer gesendeten Kopie ins Ledger, die Zähler folgen im selben Batch."""
+        if result == confirmations.RESUBMITTED:
+            self.ledger.replace(pending.signature, replacement)
+            return
+        # Eine nie gelandete Transaktion kostet keine Gebühr; den beim Senden gebuchten Anteil erstatten
+        fee = SIGNATURE_FEE_LAMPORTS / len(pending.transfers) / 10**9 if result == confirmations.EXPIRED else 0.0
+        self.ledger.settle(pending.signature, SETTLED_STATUSES[result], pnl=fee)
+
+    @staticmethod
+    async def _load_wallets():
+        async with AsyncSessionLocal() as session:
+            return await get_wallets_async(session)
+
+    async def reconcile(self):
+        """Gleicht die Registry mit der Datenbank ab, Änderungen laufen als Ereignisse ein."""
+        for _ in range(3):
+            version, stats_version = self.registry.version, self.registry.stats_version
+            wallets = await self._load_wallets()
+            if self.registry.reconcile(wallets, version, stats_version):
+                return
+
+    async def reconcile_wallets(self):
+        """Langsamer Sicherheitsabgleich, falls eine Änderung an der Registry vorbeiging."""
         while self.running:
             try:
-                with SessionLocal() as session:
-                    wallets = get_wallets(session)
-                    for wallet in wallets:
-                        wallet_address = wallet["wallet_address"]
-                        allocation = wallet["allocation_percentage"] / 100
-                        # Check if already subscribed
-                        if wallet_address not in self.subscribed_wallets:
-                            asyncio.create_task(self.subscribe_and_monitor(wallet_address, allocation))
+                await self.reconcile()
             except Exception as e:
-                print(f"Error in monitoring loop: {e}")
-                traceback.print_exc()
-            finally:
-                await asyncio.sleep(1)
+                log.exception("Error reconciling wallets: %s", e)
+            await asyncio.sleep(self.reconcile_interval)
 
-    async def subscribe_and_monitor(self, wallet_address: str, allocation: float):
-        try:
-            self.subscribed_wallets.add(wallet_address)
-            balance = self.client.get_balance(wallet_address)
-            print(f"Wallet {wallet_address} Balance: {balance:.4f} SOL")
+    def warm_start(self):
+        """Übernimmt gesicherte Kontostände, damit beim Anlauf keine Einzelabfrage je Wallet nötig ist."""
+        self.warm_starts = 0
+        if not self.checkpoints.fresh():
+            return
+        for wallet_address, checkpoint in self.checkpoints.checkpoints.items():
+            if checkpoint.lamports is not None and checkpoint.balance_slot is not None:
+                self.client.balances.restore(wallet_address, checkpoint.lamports, checkpoint.balance_slot)
+                self.warm_starts += 1
+        log.info("Warm start with %s wallet checkpoints.", self.warm_starts)
+
+    async def save_checkpoints(self):
+        while self.running:
+            await asyncio.sleep(CHECKPOINT_INTERVAL)
+            if self.checkpoints.dirty:
+                try:
+                    await self._save_checkpoint()
+                except Exception as e:
+                    log.error("Error saving wallet checkpoints: %s", e)
+
+    async def _save_checkpoint(self):
+        # Im Loop serialisieren, im Threadpool schreiben
+        content = self.checkpoints.snapshot(self.subscribed_wallets, self.client.balances)
+        await asyncio.to_thread(self.checkpoints.write, content)
+
+    def _set_readiness(self, wallet_address: str, state: str):
+        entry = self.readiness.get(wallet_address)
+        if entry is None:
+            warm = self.client.balances.last(wallet_address) is not None
+            entry = self.readiness[wallet_address] = [state, time.time(), warm]
+        else:
+            self.readiness_counts[entry[0]] -= 1
+            entry[0], entry[1] = state, time.time()
+        self.readiness_counts[state] += 1
+        if state == READY:
+            self.checkpoints.dirty = True
+            if self.all_ready_after is None and self.readiness_counts[READY] == len(self.readiness):
+                self.all_ready_after = time.time() - self.started_at
+                log.info("All %s wallets ready after %.2f s.", len(self.readiness), self.all_ready_after)
+
+    def _drop_readiness(self, wallet_address: str):
+        entry = self.readiness.pop(wallet_address, None)
+        if entry is not None:
+            self.readiness_counts[entry[0]] -= 1
+
+    def wallet_readiness(self, wallet_address: str):
+        """Bereitschaft einer Wallet samt Checkpoint, oder None, wenn sie nicht überwacht wird."""
+        entry = self.readiness.get(wallet_address)
+        if entry is None:
+            return None
+        checkpoint = self.checkpoints.get(wallet_address)
+        return {"wallet_address": wallet_address, "state": entry[0], "since": entry[1], "warm_start": entry[2],
+                "checkpoint": checkpoint.to_dict() if checkpoint is not None else None}
+
+    def readiness_stats(self):
+        return {
+            **self.readiness_counts,
+            "wallets": len(self.readiness),
+            "warm_starts": self.warm_starts,
+            "all_ready_after_s": round(self.all_ready_after, 3) if self.all_ready_after is not None else None,
+            "ramp": self.ramp.stats(),
+            "checkpoints": self.checkpoints.stats(),
+        }
 
+    def _enqueue_subscription(self, wallet_address: str):
+        self.subscribed_wallets.add(wallet_address)
+        self._set_readiness(wallet_address, QUEUED)
+        self.pending_subscriptions.put_nowait(wallet_address)
+
+    async def subscribe_wallets(self):
+        """Anlauframpe: nimmt wartende Wallets gesammelt entgegen, sobald der Token-Bucket es erlaubt."""
+        while self.running:
+            batch = [await self.pending_subscriptions.get()]
+            while len(batch) < SUBSCRIBE_BURST and not self.pending_subscriptions.empty():
+                batch.append(self.pending_subscriptions.get_nowait())
+            # Inzwischen entfernte Wallets nicht mehr abonnieren
+            batch = [w for w in batch if w in self.readiness and self.readiness[w][0] == QUEUED]
+            if not batch:
+                continue
+            await self.ramp.acquire(BACKGROUND, cost=len(batch))
+            task = asyncio.create_task(self.subscribe_batch(batch))
+            self.subscribe_tasks.add(task)
+            task.add_done_callback(self.subscribe_tasks.discard)
+
+    async def subscribe_batch(self, wallets: list):
+        for wallet_address in wallets:
+            self._set_readiness(wallet_address, SUBSCRIBING)
+        # Kontostände ohne Checkpoint gemeinsam per getMultipleAccounts statt einzeln laden
+        cold = [w for w in wallets if self.client.balances.last(w) is None]
+        if cold:
+            try:
+                await self.client.get_balances_cached(cold, priority=BACKGROUND)
+            except Exception as e:
+                log.warning("Error fetching balances of %s wallets: %s", len(cold), e)
+        await asyncio.gather(*(self.subscribe_and_monitor(w) for w in wallets))
+
+    async def subscribe_and_monitor(self, wallet_address: str):
+        try:
+            if self.shards is not None:
+                # Bereit, sobald der Shard das Abo bestätigt (_on_shard_status)
+                shard_id = self.shards.assign(wallet_address)
+                log.info("Wallet %s assigned to shard %s", wallet_address, shard_id,
+                         extra={"wallet": wallet_address, "shard": shard_id})
+                return
             await self.client.subscribe_to_transactions(
                 wallet_address,
-                lambda addr, tx_data: self.handle_transaction(addr, tx_data, allocation)
+                lambda addr, tx_data, trace: self.handle_transaction(addr, tx_data, self.registry.allocation(addr), trace)
             )
+            if wallet_address not in self.subscribed_wallets:
+                # Während des Abonnierens entfernt
+                await self.client.unsubscribe_from_transactions(wallet_address)
+                return
+            self._set_readiness(wallet_address, READY)
         except Exception as e:
-            print(f"Error monitoring wallet {wallet_address}: {e}")
-            self.subscribed_wallets.discard(wallet_address)
+            log.error("Error monitoring wallet %s: %s", wallet_address, e, extra={"wallet": wallet_address})
+            self._retry_later(wallet_address)
 
-    async def handle_transaction(self, wallet_address: str, tx_data: dict, allocation: float):
-        try:
-            print(f"Transaction Update for {wallet_address}: {tx_data}")
+    def _retry_later(self, wallet_address: str):
+        if wallet_address not in self.readiness:
+            return
+        self._set_readiness(wallet_address, RETRYING)
+        asyncio.get_running_loop().call_later(SUBSCRIBE_RETRY, self._retry, wallet_address)
+
+    def _retry(self, wallet_address: str):
+        entry = self.readiness.get(wallet_address)
+        if not self.running or entry is None or entry[0] != RETRYING:
+            return
+        if self.shards is not None:
+            self.shards.release(wallet_address)
+        self._enqueue_subscription(wallet_address)
+
+    def _on_shard_status(self, wallet_address: str, subscribed: bool):
+        if wallet_address not in self.readiness:
+            return
+        if subscribed is None:
+            # Shard neu gestartet: bis zur erneuten Bestätigung kommen keine Notifications
+            if self.readiness[wallet_address][0] == READY:
+                self._set_readiness(wallet_address, SUBSCRIBING)
+        elif subscribed:
+            self._set_readiness(wallet_address, READY)
+        elif self.readiness[wallet_address][0] != RETRYING:
+            self._retry_later(wallet_address)
+
+    async def monitor_wallets(self):
+        """Abonniert oder kündigt Wallets, sobald sich die Registry ändert."""
+        while self.running:
+            event, wallet = await self.events.get()
+            try:
+                wallet_address = wallet["wallet_address"]
+                if event == ADDED and wallet_address not in self.subscribed_wallets:
+                    self._enqueue_subscription(wallet_address)
+                elif event == REMOVED:
+                    await self.unsubscribe(wallet_address)
+                # UPDATED: die Allokation wird bei jeder Transaktion frisch aus der Registry gelesen
+            except Exception as e:
+                log.exception("Error in monitoring loop: %s", e)
 
-            # Überprüfen, ob `result` ein dict ist
-            result = tx_data.get("result")
-            if isinstance(result, int):
-                print(f"Received an integer result: {result}. No further processing required.")
-                return  # Nichts zu tun, wenn `result` nur eine ID oder Ähnliches ist
+    async def unsubscribe(self, wallet_address: str):
+        self.subscribed_wallets.discard(wallet_address)
+        self._drop_readiness(wallet_address)
+        self.checkpoints.discard(wallet_address)
+        if self.shards is not None:
+            self.shards.release(wallet_address)
+        else:
+            await self.client.unsubscribe_from_transactions(wallet_address)
+        self.client.balances.discard(wallet_address)
+        self.client.followers.forget(wallet_address)
 
-            if not isinstance(result, dict):
-                print(f"Unexpected result type: {type(result)}. Expected dict.")
+    async def handle_transaction(self, wallet_address: str, tx_data: dict, allocation: float, trace=None):
+        try:
+            notification_log.debug("Transaction update for %s: %s", wallet_address, tx_data, extra={"wallet": wallet_address})
+            if self.mode != ACCOUNT:
+                hint = parse_hint(tx_data)
+                if hint is not None:
+                    self.handle_hint(wallet_address, hint, trace)
                 return
+            parsed = parse_notification(wallet_address, tx_data)
+            if parsed is not None:
+                self.handle_parsed(wallet_address, parsed, allocation, trace)
+        except Exception as e:
+            metrics.errors.inc("worker")
+            log.exception("Error handling transaction for %s: %s", wallet_address, e, extra={"wallet": wallet_address})
+
+    def _on_shard_notification(self, wallet_address: str, parsed: tuple, received_at: float):
+        try:
+            trace = Trace(wallet_address, received_at)
+            trace.mark("shard")  # Dekodieren, Parsen und IPC im Shard-Prozess
+            if self.mode != ACCOUNT:
+                self.handle_hint(wallet_address, NotificationHint(*parsed), trace)
+                return
+            self.handle_parsed(wallet_address, ParsedNotification(*parsed), self.registry.allocation(wallet_address),
+                               trace)
+        except Exception as e:
+            metrics.errors.inc("worker")
+            log.exception("Error handling transaction for %s: %s", wallet_address, e, extra={"wallet": wallet_address})
 
-            # Extrahiere Anweisungen aus der Transaktion
-            transaction = result.get("value", {}).get("transaction", {})
-            message = transaction.get("message", {})
-            instructions = message.get("instructions", [])
-            if not instructions:
-                print("No valid instructions found in the transaction.")
+    def handle_hint(self, wallet_address: str, hint: NotificationHint, trace=None):
+        """Lädt die Transaktion hinter einer schlanken Notification nach, sofern sie kopierbar sein kann."""
+        since = None
+        if hint.lamports is not None:
+            # base64-Abo: nur ein gesunkener Kontostand kann einen ausgehenden Transfer bedeuten
+            last = self.client.balances.last(wallet_address)
+            if last is not None and hint.lamports >= last[0]:
+                if hint.slot is not None:
+                    self.client.balances.update(wallet_address, hint.lamports, hint.slot)
                 return
+            # Den gesunkenen Stand erst nach dem Nachladen übernehmen: Bis dahin decken
+            # spätere Hinweise den Zeitraum seit `since` mit ab
+            since = last[1] if last is not None else None
+        elif self.dedup.known(notification_key(wallet_address, hint.slot, {"signatures": [hint.signature]})):
+            metrics.duplicates.inc()
+            return
+        if trace is not None:
+            trace.mark("filter")
+        self._enqueue_hint((wallet_address, hint, since, trace, 0))
+
+    def _enqueue_hint(self, item: tuple):
+        try:
+            self.hints.put_nowait(item)
+        except asyncio.QueueFull:
+            metrics.fetches.inc("dropped")
+            log.warning("Hint queue full, dropping notification of %s.", item[0], extra={"wallet": item[0]})
+
+    def _retry_hint(self, item: tuple):
+        """Versucht einen Hinweis mit wachsendem Abstand erneut, höchstens FETCH_ATTEMPTS-mal."""
+        wallet_address, hint, since, trace, attempt = item
+        if attempt + 1 >= FETCH_ATTEMPTS:
+            metrics.fetches.inc("abandoned")
+            log.warning("Giving up on transaction of %s at slot %s after %s attempts.", wallet_address, hint.slot,
+                        FETCH_ATTEMPTS, extra={"wallet": wallet_address, "signature": hint.signature})
+            self._advance_balance(wallet_address, hint)
+            return
+        metrics.fetches.inc("retried")
+        asyncio.get_running_loop().call_later(FETCH_RETRY_DELAY * 2 ** attempt, self._requeue_hint,
+                                              (wallet_address, hint, since, trace, attempt + 1))
 
-            # Verarbeite jede Anweisung
-            for instruction in instructions:
-                accounts = instruction.get("accounts", [])
-                if len(accounts) < 2:
-                    print(f"Invalid instruction format: {instruction}")
+    def _requeue_hint(self, item: tuple):
+        if self.running and item[0] in self.subscribed_wallets:
+            self._enqueue_hint(item)
+
+    def _advance_balance(self, wallet_address: str, hint: NotificationHint):
+        if hint.lamports is not None and hint.slot is not None:
+            self.client.balances.update(wallet_address, hint.lamports, hint.slot)
+
+    async def fetch_transactions(self):
+        """Lädt Transaktionen zu eingereihten Hinweisen nach, alles bereits Wartende in einem Batch."""
+        while self.running:
+            batch = [await self.hints.get()]
+            while len(batch) < FETCH_BATCH_SIZE and not self.hints.empty():
+                batch.append(self.hints.get_nowait())
+            try:
+                await self._fetch(batch)
+            except Exception as e:
+                metrics.fetches.inc("failed")
+                log.error("Error fetching transactions: %s", e)
+                for item in batch:
+                    self._retry_hint(item)
+
+    async def _fetch(self, batch: list):
+        # base64-Hinweise: erst die Signaturen der Kontostandsänderung nachschlagen
+        lookups = [item for item in batch if item[1].signature is None]
+        signatures = dict(zip((item[0] for item in lookups),
+                              await self.client.get_signatures_batch_async([item[0] for item in lookups]))) \
+            if lookups else {}
+        wanted = []  # (Index des Hinweises, Wallet, Signatur, Slot, Trace)
+        failed = set()  # Indizes der Hinweise, die erneut versucht werden
+        keys = set()
+        for index, (wallet_address, hint, since, trace, _) in enumerate(batch):
+            if hint.signature is not None:
+                candidates = [(hint.signature, hint.slot)]
+            else:
+                entries = signatures.get(wallet_address)
+                if isinstance(entries, Exception):
+                    metrics.fetches.inc("failed")
+                    log.warning("Error fetching signatures for %s: %s", wallet_address, entries, extra={"wallet": wallet_address})
+                    failed.add(index)
+                    continue
+                # Ohne bekannten Vorgängerstand nur Transaktionen aus dem Slot der Notification
+                candidates = [(entry["signature"], entry["slot"]) for entry in entries or ()
+                              if entry.get("err") is None and entry["slot"] <= hint.slot
+                              and (entry["slot"] > since if since is not None else entry["slot"] == hint.slot)]
+                if not candidates:
+                    # Der Signatur-Index hinkt der Notification hinterher
+                    metrics.fetches.inc("missing")
+                    failed.add(index)
                     continue
+            for signature, slot in candidates:
+                key = notification_key(wallet_address, slot, {"signatures": [signature]})
+                if key in keys or self.dedup.known(key):
+                    metrics.duplicates.inc()
+                    continue
+                keys.add(key)
+                wanted.append((index, wallet_address, signature, slot, trace))
 
-                recipient = accounts[1]  # Empfänger
-                amount = instruction.get("lamports", 0) / 10**9  # Lamports zu SOL umwandeln
-
-                # Berechne die Positionsgröße basierend auf der Allokation
-                source_balance = self.client.get_balance(wallet_address)
-                if source_balance <= 0:
-                    print(f"Source wallet {wallet_address} has insufficient balance.")
-                    return
-
-                own_balance = self.client.get_balance(self.client.keypair.pubkey())
-                if own_balance <= 0:
-                    print("Insufficient balance in own wallet. Skipping transaction.")
-                    return
-
-                position_size = own_balance * allocation * (amount / source_balance)
-                print(f"Calculated position size: {position_size} SOL for recipient {recipient}")
-
-                # Führe die Transaktion aus
-                if recipient:
-                    result = self.client.execute_transaction(recipient, position_size)
-                    if result:
-                        print(f"Copied transaction: {position_size:.4f} SOL to {recipient}")
-                    else:
-                        print("Failed to copy transaction.")
-        except Exception as e:
-            print(f"Error handling transaction for {wallet_address}: {e}")
+        results = await self.client.get_transactions_batch_async([item[2] for item in wanted]) if wanted else []
+        for (index, wallet_address, signature, slot, trace), result in zip(wanted, results):
+            if isinstance(result, Exception):
+                metrics.fetches.inc("failed")
+                log.warning("Error fetching transaction %s of %s: %s", signature, wallet_address, result,
+                            extra={"wallet": wallet_address, "signature": signature})
+                failed.add(index)
+                continue
+            if result is None:
+                metrics.fetches.inc("missing")
+                notification_log.debug("Transaction %s of %s not available yet.", signature, wallet_address,
+                                       extra={"wallet": wallet_address, "signature": signature})
+                failed.add(index)
+                continue
+            metrics.fetches.inc("found")
+            if trace is not None:
+                trace.mark("fetch")
+            self.handle_parsed(wallet_address, parse_transaction(wallet_address, result),
+                               self.registry.allocation(wallet_address), trace)
+        # Bereits kopierte Transaktionen eines erneut versuchten Hinweises fängt der Dedup-Index ab
+        for index, item in enumerate(batch):
+            if index in failed:
+                self._retry_hint(item)
+            else:
+                self._advance_balance(item[0], item[1])
+
+    def handle_parsed(self, wallet_address: str, parsed: ParsedNotification, allocation: float, trace=None):
+        """Übernimmt den Kontostand und reiht die Transfers einer Notification als Copy-Intents ein."""
+        # Lokalen Kontostand-Spiegel aus der Notification aktualisieren
+        if parsed.lamports is not None and parsed.slot is not None:
+            self.client.balances.update(wallet_address, parsed.lamports, parsed.slot)
+
+        if not parsed.transfers:
+            notification_log.debug("No valid instructions found in the transaction.", extra={"wallet": wallet_address})
+            return
+
+        # Bereits verarbeitete Ereignisse (Reconnect, überlappende Abos) nicht erneut kopieren
+        if self.dedup.seen(parsed.key):
+            metrics.duplicates.inc()
+            notification_log.debug("Skipping duplicate notification for %s.", wallet_address, extra={"wallet": wallet_address})
+            return
+        if trace is not None:
+            trace.mark("parse")
+        self.history.record(wallet_address, parsed.slot, parsed.lamports, parsed.transfers)
+        self.checkpoints.record(wallet_address, parsed.slot, parsed.signature)
+
+        # Jede Anweisung als Copy-Intent einreihen; Sizing und Ausführung laufen in den Executoren
+        for recipient, amount in parsed.transfers:
+            intent = CopyIntent(wallet_address, recipient, amount, allocation, trace.fork() if trace else None,
+                                signature=parsed.signature, slot=parsed.slot)
+            if not self.queue.submit(intent):
+                copy_log.warning("Trade queue full, rejected copy of %s SOL from %s.", amount, wallet_address, extra={"wallet": wallet_address})
+
+    async def execute_intent(self, intent: CopyIntent):
+        """Berechnet die Positionsgrößen aller Follower-Konten und führt ihre Transfers aus."""
+        wallet_address = intent.wallet_address
+        trace = intent.trace
+        if trace is not None:
+            trace.mark("queue")
+        source_balance = await self.client.get_balance_cached(wallet_address)
+        if source_balance <= 0:
+            copy_log.info("Source wallet %s has insufficient balance.", wallet_address, extra={"wallet": wallet_address})
+            return
+
+        followers, allocations = self.client.followers.vector(wallet_address, intent.allocation)
+        if not followers:
+            copy_log.warning("No follower account set. Skipping transaction.", extra={"wallet": wallet_address})
+            return
+        balances = np.array(await self.client.get_balances_cached([f.pubkey for f in followers]),
+                            dtype=np.float64) / 10**9
+        # Positionsgrößen aller Follower in einem Durchgang, basierend auf ihren Allokationen
+        sizes = balances * allocations * (intent.amount / source_balance)
+        if trace is not None:
+            trace.mark("sizing")
+        if not (sizes > 0).any():
+            copy_log.info("Insufficient balance in follower accounts. Skipping transaction.", extra={"wallet": wallet_address})
+            return
+
+        transfers = []
+        for follower, position_size in zip(followers, sizes.tolist()):
+            if position_size <= 0:
+                continue
+            copy_log.debug("Calculated position size: %s SOL for recipient %s from %s", position_size,
+                           intent.recipient, follower.pubkey,
+                           extra={"wallet": wallet_address, "follower": follower.pubkey})
+            # Wartet bei vollem Batcher auf einen freien Platz; so bremst er die Executoren
+            transfer = await self.client.queue_transfer(intent.recipient, position_size,
+                                                        trace.fork() if trace is not None else None, follower.keypair)
+            transfer.future.add_done_callback(
+                lambda _, f=follower, size=position_size, t=transfer: self._copy_finished(intent, f.pubkey, size, t))
+            transfers.append(transfer)
+        if self.client.batcher is None:
+            # Ohne Bündelung begrenzen die Executoren die Zahl paralleler Sends
+            await asyncio.gather(*(transfer.future for transfer in transfers), return_exceptions=True)
+        # Mit Bündelung wartet der Executor nicht, damit sich weitere Intents im selben Batch sammeln
 
+    def _copy_finished(self, intent: CopyIntent, follower: str, position_size: float, transfer):
+        wallet_address = intent.wallet_address
+        trace = transfer.trace
+        result = None if transfer.future.cancelled() else transfer.future.result()
+        hub.publish_event(COPY, {
+            "wallet_address": wallet_address,
+            "follower": follower,
+            "recipient": intent.recipient,
+            "amount": position_size,
+            "tx_id": str(result) if result else None,
+            "status": SENT if result else FAILED,
+        })
+        if self.ledger is not None:
+            # Die Netzwerkgebühr ist der sicher realisierte Anteil am PnL; gebündelte Transfers teilen sie sich
+            fee = SIGNATURE_FEE_LAMPORTS / transfer.batch_size / 10**9
+            self.ledger.record(wallet_address, position_size, SENT if result else FAILED,
+                               tx_id=str(result) if result else None, leader_signature=intent.signature,
+                               slot=intent.slot, recipient=intent.recipient, pnl=-fee if result else 0.0,
+                               follower=follower)
+        if result:
+            metrics.copies.inc("sent")
+            if trace is not None:
+                trace.finish()
+            copy_log.info("Copied transaction: %.4f SOL to %s", position_size, intent.recipient,
+                          extra={"wallet": wallet_address, "follower": follower, "tx_id": str(result)})
+        else:
+            metrics.copies.inc("failed")
+            copy_log.warning("Failed to copy transaction.", extra={"wallet": wallet_address, "follower": follower})
@@ -0,0 +1,301 @@
+"""Replay-Benchmark für den MonitoringWorker gegen lokale Stand-in-Server.
+
+Aufruf aus dem backend-Verzeichnis:
+
+    python benchmarks/bench.py --wallets 200 --rate 2000 --duration 10 --quiet
+
+Statt synthetischer Notifications kann mit `--replay datei.jsonl` ein
+aufgezeichneter Strom abgespielt werden; jede Zeile hat die Form
+{"wallet": <Adresse>, "slot": <Slot>, "value": <accountNotification-Value>}.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from solders.keypair import Keypair
+
+# Als Skript gestartet: backend-Verzeichnis für app und tests.stubs in den Suchpfad
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import logs
+from app.batching import MAX_WAIT
+from app.metrics import metrics
+from app.rpc import HEDGE_DELAY
+from app.registry import WalletRegistry
+from app.solana_client import SolanaClient
+from app.signing import SIGNING_WORKERS
+from app.subscriptions import ACCOUNT, MODES
+from app.worker import MonitoringWorker, SUBSCRIBE_RATE
+from tests.stubs import StubLedger, StubRpcServer, StubWebSocketServer
+
+LAG_INTERVAL = 0.005
+START_LAMPORTS = 100 * 10**9  # Anfangsbestand jeder synthetischen Leader-Wallet
+DRAIN_TIMEOUT = 30.0
+
+
+class StubEnvironment:
+    """Betreibt die Stand-in-Server in einem eigenen Thread mit eigenem Event-Loop."""
+
+    def __init__(self, rpc_delays=(0.0,)):
+        # Ein Stand-in-Server je Verzögerung, der erste ist der bevorzugte Endpunkt
+        self.ledger = StubLedger()
+        self.rpcs = [StubRpcServer(delay=delay, ledger=self.ledger) for delay in rpc_delays]
+        self.rpc = self.rpcs[0]
+        self.ws = StubWebSocketServer(ledger=self.ledger)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        for rpc in self.rpcs:
+            self.run(rpc.start()).result()
+        self.run(self.ws.start()).result()
+        return self
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.run(self.ws.stop()).result()
+        for rpc in self.rpcs:
+            self.run(rpc.stop()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def synthetic_events(wallets: list, count: int, seed: int = 1):
+    """Erzeugt deterministische Notifications mit je einem Transfer; der Leader-Bestand sinkt entsprechend."""
+    rng = random.Random(seed)
+    recipients = [str(Keypair.from_seed(rng.randbytes(32)).pubkey()) for _ in range(64)]
+    balances = dict.fromkeys(wallets, START_LAMPORTS)
+    events = []
+    for index in range(count):
+        wallet = wallets[index % len(wallets)]
+        lamports = rng.randint(10**6, 10**9)
+        balances[wallet] -= lamports
+        events.append({
+            "wallet": wallet,
+            "slot": index + 1,
+            "value": {
+                "lamports": balances[wallet],
+                "owner": "11111111111111111111111111111111",
+                "transaction": {"message": {"instructions": [
+                    {"accounts": [wallet, rng.choice(recipients)], "lamports": lamports},
+                ]}},
+            },
+        })
+    return events
+
+
+def load_events(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(ws: StubWebSocketServer, events: list, rate: float):
+    """Spielt die Events mit fester Rate ab (läuft im Loop der Stand-in-Server)."""
+    start = time.perf_counter()
+    for index, event in enumerate(events):
+        due = start + index / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await ws.notify(event["wallet"], event["value"], event.get("slot", 0))
+    return time.perf_counter() - start
+
+
+async def sample_loop_lag(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(time.perf_counter() - before - LAG_INTERVAL)
+
+
+def merged_quantiles(histogram, quantiles):
+    """Schätzt Quantile über alle Label-Reihen, linear innerhalb der Buckets interpoliert."""
+    buckets = histogram.buckets
+    counts = [0] * (len(buckets) + 1)
+    total = 0
+    for series in histogram.series.values():
+        for index in range(len(counts)):
+            counts[index] += series[index]
+        total += series[-1]
+    result = {}
+    for q in quantiles:
+        if not total:
+            result[q] = None
+            continue
+        target = q * total
+        seen = 0
+        lower = 0.0
+        for index, count in enumerate(counts):
+            upper = buckets[index] if index < len(buckets) else buckets[-1]
+            if count and seen + count >= target:
+                result[q] = lower + (upper - lower) * (target - seen) / count
+                break
+            seen += count
+            lower = upper
+    return result
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def subscribed_count(worker: MonitoringWorker):
+    if worker.shards is not None:
+        return len(worker.shards.subscribed)
+    return sum(len(c.subscription_ids) for c in worker.client.subscriptions.connections)
+
+
+async def run_benchmark(wallets: int = 100, rate: float = 1000, duration: float = 10.0,
+                        executors: int = 4, queue_size: int = 10000, rpc_delays=(0.0,),
+                        replay_path: str = None, seed: int = 1, batch_wait: float = MAX_WAIT, shards: int = 0,
+                        hedge_delay: float = HEDGE_DELAY, mode: str = ACCOUNT, rate_limit: float = None,
+                        followers: int = 1, signing_workers: int = SIGNING_WORKERS,
+                        subscribe_rate: float = SUBSCRIBE_RATE):
+    env = StubEnvironment(rpc_delays).start()
+    client = SolanaClient(rpc_url=[rpc.url for rpc in env.rpcs], ws_url=env.ws.url, batch_wait=batch_wait,
+                          hedge_delay=hedge_delay, subscription_mode=mode, rate_limit=rate_limit,
+                          signing_workers=signing_workers)
+    # Eigene Schlüssel aus separatem Seed, sonst wäre der erste identisch mit der ersten Leader-Wallet
+    key_rng = random.Random(f"keypair-{seed}")
+    client.keypair = Keypair.from_seed(key_rng.randbytes(32))
+    for _ in range(followers - 1):
+        client.followers.add(Keypair.from_seed(key_rng.randbytes(32)))
+    registry = WalletRegistry()
+    worker = MonitoringWorker(client, registry, queue_size=queue_size, executors=executors,
+                              reconcile_interval=None, dedup_path=None, ledger_sessions=None, shards=shards,
+                              checkpoint_path=None, subscribe_rate=subscribe_rate)
+    try:
+        await worker.start()
+        if replay_path:
+            events = load_events(replay_path)
+            addresses = sorted({event["wallet"] for event in events})
+        else:
+            rng = random.Random(seed)
+            addresses = [str(Keypair.from_seed(rng.randbytes(32)).pubkey()) for _ in range(wallets)]
+            events = synthetic_events(addresses, int(rate * duration), seed)
+        for rpc in env.rpcs:
+            rpc.balances.update(dict.fromkeys(addresses, START_LAMPORTS))
+            rpc.slot = 0  # Anfangsbestände gelten vor dem ersten Event (Slot 1)
+
+        for index, address in enumerate(addresses):
+            registry.add({"id": index + 1, "wallet_address": address, "pnl": 0.0,
+                          "active_trades": 0, "allocation_percentage": 10.0})
+        subscribe_started = time.perf_counter()
+        while subscribed_count(worker) < len(addresses):
+            await asyncio.sleep(0.01)
+        subscribe_seconds = time.perf_counter() - subscribe_started
+
+        metrics.copy_latency.series.clear()
+        metrics.stage_seconds.series.clear()
+        copies_before = metrics.copies.get("sent") + metrics.copies.get("failed")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        lag_samples = []
+        stop_lag = asyncio.Event()
+        lag_task = asyncio.create_task(sample_loop_lag(lag_samples, stop_lag))
+
+        started = time.perf_counter()
+        replay_seconds = await asyncio.wrap_future(env.run(replay(env.ws, events, rate)))
+        deadline = time.perf_counter() + DRAIN_TIMEOUT
+        while time.perf_counter() < deadline:
+            handled = metrics.copies.get("sent") + metrics.copies.get("failed") - copies_before
+            if handled >= len(events) * followers and worker.queue.size == 0:
+                break
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        stop_lag.set()
+        await lag_task
+
+        copies = metrics.copies.get("sent") + metrics.copies.get("failed") - copies_before
+        decoded = sum(series[-1] for labels, series in metrics.stage_seconds.series.items()
+                      if labels in (("decode",), ("shard",)))
+        latency = merged_quantiles(metrics.copy_latency, (0.5, 0.99))
+        return {
+            "wallets": len(addresses),
+            "notifications_sent": len(events),
+            "target_rate": rate,
+            "replay_seconds": round(replay_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "subscribe_seconds": round(subscribe_seconds, 3),
+            "notifications_per_sec": round(decoded / elapsed, 1),
+            "copies": copies,
+            "copies_per_sec": round(copies / elapsed, 1),
+            "copy_latency_p50_ms": round(latency[0.5] * 1000, 3) if latency[0.5] is not None else None,
+            "copy_latency_p99_ms": round(latency[0.99] * 1000, 3) if latency[0.99] is not None else None,
+            "loop_lag_p99_ms": round(percentile(lag_samples, 0.99) * 1000, 3),
+            "loop_lag_max_ms": round(max(lag_samples, default=0.0) * 1000, 3),
+            "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+            "queue": worker.queue.stats(),
+            "shards": worker.shards.stats() if worker.shards is not None else None,
+            "batching": client.batcher.stats() if client.batcher is not None else None,
+            "signing": {"followers": len(client.followers), **client.signer.stats()},
+            "subscriptions": {"mode": mode, "filtered": metrics.filtered.get(),
+                              "fetches": {status: metrics.fetches.get(status) for status in ("found", "missing", "failed", "retried", "abandoned", "dropped")}},
+            "rpc_calls": [dict(rpc.calls) for rpc in env.rpcs],
+            "rpc_pool": client.rpc.stats(),
+            "rpc_coalesced": client.coalesced,
+            "confirmations": client.confirmations.stats(),
+            "logging": logs.stats(),
+            "startup": worker.readiness_stats(),
+        }
+    finally:
+        await worker.stop()
+        env.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay-Benchmark für den MonitoringWorker")
+    parser.add_argument("--wallets", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1000, help="Notifications pro Sekunde")
+    parser.add_argument("--duration", type=float, default=10.0, help="Sekunden synthetischer Last")
+    parser.add_argument("--executors", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--rpc-delay", default="0",
+                        help="Künstliche RPC-Latenz in Sekunden; kommagetrennt für mehrere Endpunkte")
+    parser.add_argument("--hedge-delay", type=float, default=HEDGE_DELAY,
+                        help="Sekunden bis zur zusätzlichen Anfrage an den nächsten Endpunkt")
+    parser.add_argument("--replay", help="JSONL-Datei mit aufgezeichneten Notifications")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=0, help="Shard-Prozesse für Abos und Parsing")
+    parser.add_argument("--batch-wait", type=float, default=MAX_WAIT,
+                        help="Sekunden, die Transfers gebündelt werden; 0 sendet einzeln")
+    parser.add_argument("--rate-limit", type=float, help="RPC-Aufrufe pro Sekunde und Endpunkt")
+    parser.add_argument("--mode", choices=sorted(MODES), default=ACCOUNT, help="Abo-Art der Leader-Wallets")
+    parser.add_argument("--followers", type=int, default=1, help="Eigene Konten, auf die jeder Trade verteilt wird")
+    parser.add_argument("--signing-workers", type=int, default=SIGNING_WORKERS,
+                        help="Prozesse für paralleles Signieren; 0 signiert im Event-Loop")
+    parser.add_argument("--subscribe-rate", type=float, default=SUBSCRIBE_RATE,
+                        help="Neue Abos pro Sekunde in der Anlauframpe")
+    parser.add_argument("--quiet", action="store_true", help="Ausgaben des Workers unterdrücken")
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(args.wallets, args.rate, args.duration, args.executors, args.queue_size,
+                              [float(delay) for delay in args.rpc_delay.split(",")], args.replay, args.seed,
+                              args.batch_wait, args.shards, args.hedge_delay, args.mode, args.rate_limit,
+                              args.followers, args.signing_workers, args.subscribe_rate)
+    if args.quiet:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            logs.setup(stream=devnull)
+            report = asyncio.run(benchmark)
+            logs.shutdown()
+    else:
+        logs.setup()
+        report = asyncio.run(benchmark)
+        logs.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Laufzeitdateien der App in ein temporäres Verzeichnis, bevor die app-Module importiert werden
+RUNTIME_DIR = tempfile.mkdtemp(prefix="copytrader-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{RUNTIME_DIR}/wallets.db")
+os.environ.setdefault("HISTORY_DIR", os.path.join(RUNTIME_DIR, "history"))
+os.environ.setdefault("CHECKPOINT_PATH", os.path.join(RUNTIME_DIR, "checkpoints.json"))
+os.environ.setdefault("DEDUP_PATH", os.path.join(RUNTIME_DIR, "dedup.log"))
@@ -0,0 +1,368 @@
+"""Stand-in-Server für Tests und den Benchmark (benchmarks/bench.py); nicht Teil der Anwendung."""
+import asyncio
+import base64
+import itertools
+import json
+import random
+import websockets
+from collections import deque
+from solders.hash import Hash
+from solders.signature import Signature
+from solders.transaction import Transaction
+
+SYSTEM_PROGRAM_ID = "11111111111111111111111111111111"
+SIGNATURE_HISTORY = 1000  # Signaturen, die je Adresse für getSignaturesForAddress vorgehalten werden
+
+
+class StubLedger:
+    """Gemeinsamer Transaktionsbestand der Stand-in-Server.
+
+    Der WebSocket-Server trägt jede Notification mit Transaktion ein, der
+    RPC-Server beantwortet daraus getTransaction und getSignaturesForAddress.
+    """
+
+    def __init__(self, history: int = SIGNATURE_HISTORY):
+        self.history = history
+        self.transactions = {}  # Signatur -> getTransaction-Ergebnis (jsonParsed)
+        self.signatures = {}  # Adresse -> deque[(Slot, Signatur)], neueste zuletzt
+
+    def record(self, wallet_address: str, slot: int, value: dict):
+        """Legt die Transaktion einer accountNotification ab und gibt ihre Signatur zurück."""
+        transaction = value.get("transaction") or {}
+        signatures = transaction.get("signatures")
+        signature = signatures[0] if signatures else str(Signature.new_unique())
+        instructions = []
+        for instruction in transaction.get("message", {}).get("instructions", []):
+            accounts = instruction.get("accounts", [])
+            if len(accounts) < 2:
+                continue
+            instructions.append({
+                "program": "system",
+                "programId": SYSTEM_PROGRAM_ID,
+                "parsed": {"type": "transfer", "info": {
+                    "source": accounts[0], "destination": accounts[1], "lamports": instruction.get("lamports", 0),
+                }},
+            })
+        self.transactions[signature] = {
+            "slot": slot,
+            "blockTime": None,
+            "transaction": {
+                "signatures": [signature],
+                "message": {
+                    "accountKeys": [{"pubkey": wallet_address, "signer": True, "writable": True}],
+                    "instructions": instructions,
+                },
+            },
+            "meta": {"err": None, "fee": 5000, "postBalances": [value.get("lamports", 0)]},
+        }
+        self.signatures.setdefault(wallet_address, deque(maxlen=self.history)).append((slot, signature))
+        return signature
+
+
+class StubWebSocketServer:
+    """Minimaler Solana-PubSub-Server für account- und logsSubscribe.
+
+    Verschickt Notifications nur auf Anforderung über `notify`, damit Tests und
+    Benchmarks den Nachrichtenstrom selbst steuern können.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ledger: StubLedger = None,
+                 response_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.response_delay = response_delay  # Sekunden bis zur Antwort auf eine Anfrage
+        self.ledger = ledger if ledger is not None else StubLedger()
+        self.server = None
+        self.connections = set()
+        self.subscriptions = {}  # Subscription-ID -> (Verbindung, Wallet, Notification-Methode, Encoding)
+        self.by_wallet = {}  # Wallet -> {Subscription-ID}
+        self.subscription_ids = itertools.count(1)
+        self.total_connections = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, self.host, self.port, max_size=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def handler(self, websocket):
+        self.connections.add(websocket)
+        self.total_connections += 1
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                response = self.handle_request(websocket, request)
+                if self.response_delay:
+                    await asyncio.sleep(self.response_delay)
+                await websocket.send(json.dumps(response))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(websocket)
+            for subscription_id, entry in list(self.subscriptions.items()):
+                if entry[0] is websocket:
+                    self._drop(subscription_id)
+
+    def handle_request(self, websocket, request):
+        method = request.get("method")
+        params = request.get("params") or []
+        if method in ("accountSubscribe", "logsSubscribe"):
+            if method == "logsSubscribe":
+                wallet, notification, encoding = params[0]["mentions"][0], "logsNotification", None
+            else:
+                config = params[1] if len(params) > 1 else {}
+                wallet, notification, encoding = params[0], "accountNotification", config.get("encoding")
+            subscription_id = next(self.subscription_ids)
+            self.subscriptions[subscription_id] = (websocket, wallet, notification, encoding)
+            self.by_wallet.setdefault(wallet, set()).add(subscription_id)
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": subscription_id}
+        if method in ("accountUnsubscribe", "logsUnsubscribe"):
+            found = self._drop(params[0])
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": found}
+        return {
+            "jsonrpc": "2.0",
+            "id": request.get("id"),
+            "error": {"code": -32601, "message": "Method not found"},
+        }
+
+    def _drop(self, subscription_id):
+        entry = self.subscriptions.pop(subscription_id, None)
+        if entry is None:
+            return False
+        wallet_ids = self.by_wallet.get(entry[1])
+        if wallet_ids is not None:
+            wallet_ids.discard(subscription_id)
+            if not wallet_ids:
+                del self.by_wallet[entry[1]]
+        return True
+
+    async def notify(self, wallet_address: str, value: dict, slot: int = 0):
+        """Schickt eine Notification an alle Abonnenten einer Wallet.
+
+        `value` hat die Form einer jsonParsed-accountNotification; base64- und
+        logs-Abonnenten erhalten die entsprechend reduzierte Fassung.
+        """
+        sent = 0
+        signature = self.ledger.record(wallet_address, slot, value) if value.get("transaction") else None
+        for subscription_id in list(self.by_wallet.get(wallet_address, ())):
+            entry = self.subscriptions.get(subscription_id)
+            if entry is None:
+                continue
+            notification, encoding = entry[2], entry[3]
+            if notification == "logsNotification":
+                if signature is None:
+                    continue  # Reine Kontostandsänderung ohne Transaktion
+                payload = {"signature": signature, "err": None, "logs": [
+                    f"Program {SYSTEM_PROGRAM_ID} invoke [1]", f"Program {SYSTEM_PROGRAM_ID} success",
+                ]}
+            elif encoding == "base64":
+                payload = {"lamports": value.get("lamports", 0), "data": ["", "base64"], "owner": value.get("owner"),
+                           "executable": False, "rentEpoch": 0, "space": 0}
+            else:
+                payload = value
+            message = {
+                "jsonrpc": "2.0",
+                "method": notification,
+                "params": {
+                    "result": {"context": {"slot": slot}, "value": payload},
+                    "subscription": subscription_id,
+                },
+            }
+            try:
+                await entry[0].send(json.dumps(message))
+                sent += 1
+            except websockets.ConnectionClosed:
+                pass
+        return sent
+
+    async def drop_connections(self):
+        """Trennt alle Clients, um Reconnect-Verhalten zu testen."""
+        for websocket in list(self.connections):
+            await websocket.close()
+        await asyncio.sleep(0)
+
+
+class StubRpcServer:
+    """Minimaler Solana-JSON-RPC-Server über HTTP/1.1 mit Keep-Alive.
+
+    Beantwortet die Methoden, die das Backend nutzt, aus einem lokalen Zustand.
+    `delay` bzw. `method_delays` verzögern Antworten künstlich. Mit `max_rate`
+    beantwortet er mehr als so viele Aufrufe pro Sekunde mit HTTP 429. Der Anteil
+    `drop_rate` gesendeter Transaktionen wird angenommen, landet aber nie. Ist
+    `error_status` gesetzt, scheitert jeder Aufruf mit diesem HTTP-Status.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0,
+                 default_balance: int = 10 * 10**9, ledger: StubLedger = None, max_rate: int = None,
+                 drop_rate: float = 0.0):
+        self.host = host
+        self.port = port
+        self.ledger = ledger if ledger is not None else StubLedger()
+        self.delay = delay
+        self.method_delays = {}
+        self.default_balance = default_balance
+        self.balances = {}  # Adresse -> Lamports
+        self.slot = 1
+        self.block_height = 1
+        self.calls = {}  # Methode -> Anzahl
+        self.max_rate = max_rate
+        self.window = (0, 0)  # (Sekunde, Aufrufe darin)
+        self.rejected = 0
+        self.sent_transactions = []
+        self.landed = {}  # Signatur -> Slot
+        self.drop_rate = drop_rate
+        self.error_status = None
+        self.failed = 0  # Mit error_status abgelehnte Anfragen
+        self.random = random.Random(0)
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                body = await reader.readexactly(length) if length else b""
+                payload = json.loads(body)
+                if self.error_status is not None:
+                    self.failed += 1
+                    writer.write(f"HTTP/1.1 {self.error_status} Error\r\nContent-Length: 0\r\n\r\n".encode())
+                    await writer.drain()
+                    continue
+                if self._over_limit(len(payload) if isinstance(payload, list) else 1):
+                    writer.write(b"HTTP/1.1 429 Too Many Requests\r\nRetry-After: 1\r\nContent-Length: 0\r\n\r\n")
+                    await writer.drain()
+                    continue
+                payload = await self.handle_payload(payload)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _over_limit(self, calls: int):
+        if self.max_rate is None:
+            return False
+        second = int(asyncio.get_running_loop().time())
+        start, count = self.window
+        count = count + calls if start == second else calls
+        self.window = (second, count)
+        if count > self.max_rate:
+            self.rejected += calls
+            return True
+        return False
+
+    async def handle_payload(self, payload):
+        if isinstance(payload, list):
+            return list(await asyncio.gather(*(self.handle_request(request) for request in payload)))
+        return await self.handle_request(payload)
+
+    async def handle_request(self, request):
+        method = request.get("method")
+        self.calls[method] = self.calls.get(method, 0) + 1
+        delay = self.method_delays.get(method, self.delay)
+        if delay:
+            await asyncio.sleep(delay)
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": handler(*(request.get("params") or []))}
+
+    def context(self):
+        return {"slot": self.slot}
+
+    def rpc_getBalance(self, address, config=None):
+        return {"context": self.context(), "value": self.balances.get(address, self.default_balance)}
+
+    def rpc_getMultipleAccounts(self, addresses, config=None):
+        return {"context": self.context(),
+                "value": [{"lamports": self.balances.get(address, self.default_balance), "owner": SYSTEM_PROGRAM_ID,
+                           "data": ["", "base64"], "executable": False, "rentEpoch": 0} for address in addresses]}
+
+    def rpc_getLatestBlockhash(self, config=None):
+        return {
+            "context": self.context(),
+            "value": {"blockhash": str(Hash.new_unique()), "lastValidBlockHeight": self.block_height + 150},
+        }
+
+    def rpc_getBlockHeight(self, config=None):
+        return self.block_height
+
+    def rpc_getHealth(self):
+        return "ok"
+
+    def rpc_getTransaction(self, signature, config=None):
+        return self.ledger.transactions.get(signature)
+
+    def rpc_getSignaturesForAddress(self, address, config=None):
+        limit = (config or {}).get("limit", 1000)
+        entries = list(self.ledger.signatures.get(address, ()))[-limit:]
+        return [{"signature": signature, "slot": slot, "err": None, "memo": None, "blockTime": None,
+                 "confirmationStatus": "confirmed"} for slot, signature in reversed(entries)]
+
+    def rpc_sendTransaction(self, encoded, config=None):
+        transaction = Transaction.from_bytes(base64.b64decode(encoded))
+        signature = str(transaction.signatures[0])
+        self.sent_transactions.append(signature)
+        if self.random.random() >= self.drop_rate:
+            self.landed[signature] = self.slot
+        return signature
+
+    def rpc_getSignatureStatuses(self, signatures, config=None):
+        statuses = []
+        for signature in signatures:
+            slot = self.landed.get(signature)
+            statuses.append(None if slot is None else {"slot": slot, "confirmations": None, "err": None,
+                                                       "status": {"Ok": None}, "confirmationStatus": "confirmed"})
+        return {"context": self.context(), "value": statuses}
@@ -0,0 +1,99 @@
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from solders.keypair import Keypair
+from app import main
+from app.ratelimit import UI
+from app.solana_client import SolanaClient
+from tests.stubs import StubRpcServer
+
+TIMEOUT = 5.0
+
+
+def stub_client(rpc_url: str):
+    client = SolanaClient(rpc_url=rpc_url, ws_url="ws://127.0.0.1:9", batch_wait=0, signing_workers=0)
+    client.keypair = Keypair()
+    return client
+
+
+def test_copy_trade_does_not_block_queued_rpc_calls(monkeypatch):
+    async def run():
+        async with StubRpcServer() as rpc:
+            client = stub_client(rpc.url)
+            monkeypatch.setattr(main, "solana_client", client)
+            bucket = client.rpc.endpoints[0].bucket
+            bucket.pause(0.2)  # wie nach einer 429-Antwort
+            waiter = asyncio.create_task(client.get_balance_async(str(Keypair().pubkey()), priority=UI))
+            while not bucket.waiters:
+                await asyncio.sleep(0)
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                             base_url="http://test") as http:
+                    response = await asyncio.wait_for(
+                        http.post("/copy_trade/", json={"recipient_wallet": str(Keypair().pubkey())}), TIMEOUT)
+                assert response.status_code == 200
+                assert response.json()["tx_id"] in rpc.sent_transactions
+                assert await asyncio.wait_for(waiter, TIMEOUT) == rpc.default_balance / 10**9
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def add_wallets(http, count):
+    wallets = []
+    for _ in range(count):
+        response = http.post("/wallets/", json={"wallet_address": str(Keypair().pubkey())})
+        assert response.status_code == 200
+        wallets.append(response.json()["wallet"])
+    return wallets
+
+
+def test_wallet_changes_pages_with_since_and_reports_deletes():
+    http = TestClient(main.app)  # Ohne Kontextmanager: kein Worker-Start über die Lifespan
+    since = http.get("/wallets/changes").json()["version"]
+    wallets = add_wallets(http, 5)
+    assert http.delete(f"/wallets/{wallets[1]['id']}").status_code == 200
+    assert http.put(f"/wallets/{wallets[3]['id']}/set_allocation/", json={"percentage": 25.0}).status_code == 200
+
+    changes, pages = [], 0
+    while True:
+        page = http.get("/wallets/changes", params={"since": since, "limit": 2}).json()
+        assert len(page["changes"]) <= 2 and page["version"] > since
+        changes += page["changes"]
+        since, pages = page["version"], pages + 1
+        if not page["has_more"]:
+            break
+    assert pages >= 2
+    versions = [change["version"] for change in changes]
+    assert versions == sorted(versions) and len(set(versions)) == len(versions)
+
+    upserts = {change["wallet"]["id"]: change["wallet"] for change in changes if change["op"] == "upsert"}
+    deletes = [change for change in changes if change["op"] == "delete"]
+    assert set(upserts) == {wallets[0]["id"], wallets[2]["id"], wallets[3]["id"], wallets[4]["id"]}
+    assert upserts[wallets[3]["id"]]["allocation_percentage"] == 25.0
+    assert deletes == [{"op": "delete", "version": deletes[0]["version"], "wallet_id": wallets[1]["id"],
+                        "wallet_address": wallets[1]["wallet_address"]}]
+
+    # Ohne neue Änderungen bleibt die Version stehen und die Liste leer
+    assert http.get("/wallets/changes", params={"since": since}).json() == {
+        "version": since, "has_more": False, "changes": []}
+
+
+def test_wallet_list_answers_304_for_matching_etag():
+    http = TestClient(main.app)
+    add_wallets(http, 1)
+    first = http.get("/wallets/", params={"limit": 10})
+    assert first.status_code == 200 and first.headers["ETag"].startswith('W/"')
+
+    cached = http.get("/wallets/", params={"limit": 10}, headers={"If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304 and not cached.content
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    # Andere Seitengröße ist eine andere Repräsentation
+    assert http.get("/wallets/", params={"limit": 5},
+                    headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+    add_wallets(http, 1)
+    changed = http.get("/wallets/", params={"limit": 10}, headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+    assert int(changed.headers["X-Wallets-Version"]) > int(first.headers["X-Wallets-Version"])
@@ -0,0 +1,83 @@
+import random
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.backtest import HistoryStore, backtest
+
+FEE = 0.001
+
+
+def reference(events, allocation: float, start_balance: float, fee: float):
+    """Schleife über die Events einer Wallet, wie das Live-Sizing kopieren würde."""
+    balance, copies, volume = start_balance, 0, 0.0
+    for amount, source in events:
+        size = balance * allocation * amount / source
+        if allocation * amount / source >= 1 or balance - size - fee < 0:
+            break
+        balance -= size + fee
+        copies += 1
+        volume += size
+    return copies, volume, balance
+
+
+def make_store(tmp_path, events_by_wallet: dict):
+    store = HistoryStore(str(tmp_path / "history"))
+    store.append([(wallet, slot, amount, source) for wallet, events in events_by_wallet.items()
+                  for slot, (amount, source) in enumerate(events)])
+    return store
+
+
+def random_history(seed: int = 0):
+    rng = random.Random(seed)
+    return {f"wallet-{w}": [(rng.uniform(0.01, 5.0), rng.uniform(5.0, 50.0)) for _ in range(rng.randint(1, 60))]
+            for w in range(12)}
+
+
+@pytest.mark.parametrize("chunk_cells", [50, 2_000_000])  # Viele kleine Blöcke bzw. einer
+def test_vectorized_sweep_matches_reference_loop(tmp_path, chunk_cells):
+    history = random_history()
+    allocations = [0.01, 0.1, 0.25, 0.5, 0.9, 1.0]
+    result = backtest(make_store(tmp_path, history), allocations, start_balance=1.0, fee=FEE,
+                      max_drawdown=0.5, chunk_cells=chunk_cells)
+    assert result["allocations"] == allocations
+    assert {w["wallet_address"] for w in result["wallets"]} == set(history)
+    for wallet in result["wallets"]:
+        events = history[wallet["wallet_address"]]
+        expected = [reference(events, allocation, 1.0, FEE) for allocation in allocations]
+        assert wallet["events"] == len(events)
+        assert wallet["copies"] == [copies for copies, _, _ in expected]
+        np.testing.assert_allclose(wallet["volume"], [volume for _, volume, _ in expected], rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(wallet["final_balance"], [balance for _, _, balance in expected],
+                                   rtol=1e-9, atol=1e-12)
+        complete = [a for a, (copies, _, balance) in zip(allocations, expected)
+                    if copies == len(events) and balance >= 0.5]
+        assert wallet["best_allocation"] == (max(complete) if complete else None)
+
+
+def test_drawdown_floor_edge_cases(tmp_path):
+    # Jede Kopie verbraucht 10 % des Kontos; nach drei Kopien bleiben 0.729 * Start minus Gebühren
+    store = make_store(tmp_path, {"leader": [(1.0, 1.0)] * 3})
+    allocations = [0.1, 0.5, 1.0]
+
+    def best(**kwargs):
+        return backtest(store, allocations, start_balance=1.0, **kwargs)["wallets"][0]["best_allocation"]
+
+    assert best(fee=0.0, max_drawdown=1.0) == 0.5  # Allokation 1.0 würde das ganze Konto überweisen
+    assert best(fee=0.0, max_drawdown=0.271) == 0.1  # Untergrenze 0.729 genau erreicht
+    assert best(fee=0.0, max_drawdown=0.27) is None  # knapp darüber
+    assert best(fee=FEE, max_drawdown=0.0) is None  # Gebühren unterschreiten jede Untergrenze von 100 %
+    # Das Konto reicht nicht für die Gebühren aller Events: unvollständig, nie empfohlen
+    result = backtest(store, allocations, start_balance=0.002, fee=FEE, max_drawdown=1.0)["wallets"][0]
+    assert result["copies"] == [1, 1, 0] and result["best_allocation"] is None
+
+
+def test_sweep_never_exceeds_allocation_to():
+    client = TestClient(main.app)
+    response = client.post("/backtest/", json={"allocation_from": 0.5, "allocation_to": 100,
+                                               "allocation_step": 0.3})
+    assert response.status_code == 200
+    allocations = response.json()["allocations"]
+    assert len(allocations) == 332 and allocations[0] == 0.5 and allocations[-1] == pytest.approx(99.8)
+    response = client.post("/backtest/", json={"allocation_from": 1, "allocation_to": 100, "allocation_step": 1})
+    assert response.json()["allocations"][-1] == 100
@@ -0,0 +1,100 @@
+import asyncio
+from solders.hash import Hash
+from solders.keypair import Keypair
+from app.batching import TransferBatcher, PACKET_DATA_SIZE
+from app.signing import build_transaction
+from app.solana_client import SolanaClient, SIGNATURE_FEE_LAMPORTS
+from tests.stubs import StubRpcServer
+
+TIMEOUT = 5.0
+
+
+class Sender:
+    """Nimmt die Batches des TransferBatcher entgegen; `release` gibt das Senden frei."""
+
+    def __init__(self, blocked: bool = False):
+        self.batches = []
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def __call__(self, batches):
+        await self.release.wait()
+        self.batches.extend(batches)
+        return ["signature"] * len(batches)
+
+
+def serialized_size(payer, batch):
+    transfers = [(pending.recipient, pending.lamports) for pending in batch]
+    return len(bytes(build_transaction(payer, transfers, str(Hash.new_unique()))))
+
+
+def test_batches_split_at_the_transaction_size_limit():
+    async def run():
+        sender = Sender()
+        batcher = TransferBatcher(sender, max_wait=0.01)
+        payer = Keypair()
+        distinct = [await batcher.submit(str(Keypair().pubkey()), 1, payer=payer) for _ in range(50)]
+        await asyncio.wait_for(asyncio.gather(*(pending.future for pending in distinct)), TIMEOUT)
+        sizes = [len(batch) for _, batch in sender.batches]
+        assert sizes == [21, 21, 8]
+        assert all(serialized_size(payer, batch) <= PACKET_DATA_SIZE for _, batch in sender.batches)
+        # Eine Anweisung mehr passt nicht mehr ins Paket; die Grenze ist also nicht zu vorsichtig
+        first = sender.batches[0][1]
+        assert serialized_size(payer, first + distinct[21:22]) > PACKET_DATA_SIZE
+        assert distinct[0].batch_size == 21
+
+        sender.batches.clear()
+        recipient = str(Keypair().pubkey())
+        same = [await batcher.submit(recipient, 1, payer=payer) for _ in range(100)]
+        await asyncio.wait_for(asyncio.gather(*(pending.future for pending in same)), TIMEOUT)
+        assert [len(batch) for _, batch in sender.batches] == [60, 40]
+        assert serialized_size(payer, sender.batches[0][1]) <= PACKET_DATA_SIZE
+        await batcher.close()
+
+    asyncio.run(run())
+
+
+def test_submit_waits_while_max_in_flight_transfers_are_open():
+    async def run():
+        sender = Sender(blocked=True)
+        batcher = TransferBatcher(sender, max_wait=0.001, max_in_flight=3)
+        payer = Keypair()
+        pending = [await batcher.submit(str(Keypair().pubkey()), 1, payer=payer) for _ in range(3)]
+        blocked = asyncio.create_task(batcher.submit(str(Keypair().pubkey()), 1, payer=payer))
+        await asyncio.sleep(0.05)
+        assert not blocked.done() and batcher.in_flight == 3
+        sender.release.set()
+        fourth = await asyncio.wait_for(blocked, TIMEOUT)
+        await asyncio.wait_for(asyncio.gather(*(p.future for p in pending + [fourth])), TIMEOUT)
+        assert batcher.in_flight == 0
+        await batcher.close()
+
+    asyncio.run(run())
+
+
+def test_queue_transfer_never_reserves_more_than_the_balance():
+    async def run():
+        async with StubRpcServer() as rpc:
+            client = SolanaClient(rpc_url=rpc.url, ws_url="ws://127.0.0.1:9", batch_wait=0.05, signing_workers=0)
+            client.keypair = Keypair()
+            payer = str(client.keypair.pubkey())
+            client.balances.update(payer, 10**9, rpc.slot)
+            try:
+                transfers = [await client.queue_transfer(str(Keypair().pubkey()), 0.4) for _ in range(3)]
+                # Die dritte Kopie passt nicht mehr in den vorgemerkten Stand und wird allein verworfen
+                assert transfers[2].future.done() and transfers[2].future.result() is None
+                assert client.balances.reserved[payer] == 2 * (4 * 10**8 + SIGNATURE_FEE_LAMPORTS)
+                assert client.balances.reserved[payer] <= client.balances.last(payer)[0]
+                assert await client.get_balances_cached([payer]) == [
+                    10**9 - 2 * (4 * 10**8 + SIGNATURE_FEE_LAMPORTS)]
+
+                signatures = await asyncio.wait_for(asyncio.gather(*(t.future for t in transfers[:2])), TIMEOUT)
+                assert signatures[0] and signatures[0] == signatures[1]  # Eine gemeinsame Transaktion
+                assert rpc.sent_transactions == [signatures[0]]
+                assert payer not in client.balances.reserved
+                assert client.balances.last(payer)[0] == 10**9 - 8 * 10**8 - SIGNATURE_FEE_LAMPORTS
+            finally:
+                await client.close()
+
+    asyncio.run(run())
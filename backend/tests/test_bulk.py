@@ -0,0 +1,90 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from solders.keypair import Keypair
+from sqlalchemy.exc import OperationalError
+from app import bulk, crud, database, main
+
+
+def address():
+    return str(Keypair().pubkey())
+
+
+async def chunks(body: bytes, size: int = 7):
+    # Kleine Stücke, damit Zeilen über Chunk-Grenzen hinweg zerlegt werden
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def test_import_report_lists_duplicates_invalid_rows_and_existing_wallets():
+    http = TestClient(main.app)
+    existing = address()
+    assert http.post("/wallets/", json={"wallet_address": existing}).status_code == 200
+    first, second = address(), address()
+    lines = [
+        json.dumps({"wallet_address": first, "allocation_percentage": 20}),
+        json.dumps(second),
+        "",
+        json.dumps({"wallet_address": first}),
+        json.dumps({"wallet_address": "not-a-wallet"}),
+        json.dumps({"wallet_address": address(), "allocation_percentage": 150}),
+        "{broken",
+        json.dumps({"wallet_address": existing}),
+    ]
+    response = http.post("/wallets/import", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["total"] == 7
+    assert report["summary"] == {"created": 2, "exists": 1, "duplicate": 1, "invalid": 3, "failed": 0}
+    statuses = {result["line"]: result["status"] for result in report["results"]}
+    assert statuses == {1: "created", 2: "created", 4: "duplicate", 5: "invalid", 6: "invalid", 7: "invalid",
+                        8: "exists"}
+    errors = {result["line"]: result["error"] for result in report["results"] if "error" in result}
+    assert errors[5] == "not a valid base58 public key" and "between 0 and 100" in errors[6]
+    assert errors[7].startswith("unparsable row")
+    assert main.registry.get(first)["allocation_percentage"] == 20.0
+    assert main.registry.get(second)["allocation_percentage"] == bulk.DEFAULT_ALLOCATION
+
+
+def test_csv_import_with_header_skips_the_header_row():
+    http = TestClient(main.app)
+    wallet = address()
+    body = f"allocation_percentage,wallet_address\n5,{wallet}\n,{wallet}\n"
+    report = http.post("/wallets/import", params={"format": "csv"}, content=body).json()
+    assert report["summary"]["created"] == 1 and report["summary"]["duplicate"] == 1
+    assert [result["line"] for result in report["results"]] == [2, 3]
+    assert main.registry.get(wallet)["allocation_percentage"] == 5.0
+
+
+def test_failed_batch_is_reported_and_other_batches_are_kept(monkeypatch):
+    add_bulk = crud.add_wallets_bulk_async
+    calls = []
+
+    async def flaky_add(db, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return await add_bulk(db, rows)
+
+    monkeypatch.setattr(crud, "add_wallets_bulk_async", flaky_add)
+    wallets = [address() for _ in range(5)]
+    body = "".join(json.dumps(wallet) + "\n" for wallet in wallets).encode()
+
+    async def run():
+        created = []
+        report = await bulk.import_wallets(chunks(body), bulk.NDJSON, database.AsyncSessionLocal,
+                                           on_created=created.append, batch_size=2)
+        return report, created
+
+    report, created = asyncio.run(run())
+    assert calls == [2, 2, 1]
+    assert report["summary"] == {"created": 3, "exists": 0, "duplicate": 0, "invalid": 0, "failed": 2}
+    assert [result["status"] for result in report["results"]] == ["created", "created", "failed", "failed",
+                                                                  "created"]
+    assert [wallet["wallet_address"] for wallet in created] == wallets[:2] + wallets[4:]
+
+    # Die fehlgeschlagenen Zeilen lassen sich erneut importieren, der Rest ist schon vorhanden
+    monkeypatch.setattr(crud, "add_wallets_bulk_async", add_bulk)
+    report, created = asyncio.run(run())
+    assert report["summary"]["created"] == 2 and report["summary"]["exists"] == 3
+    assert [wallet["wallet_address"] for wallet in created] == wallets[2:4]
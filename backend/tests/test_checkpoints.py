@@ -0,0 +1,56 @@
+import asyncio
+import json
+from app.checkpoints import CheckpointStore
+from app.solana_client import SolanaClient
+from app.worker import MonitoringWorker, QUEUED
+
+
+def make_worker(tmp_path):
+    client = SolanaClient(rpc_url="http://127.0.0.1:9", ws_url="ws://127.0.0.1:9", batch_wait=0, signing_workers=0)
+    return MonitoringWorker(client, ledger_sessions=None, dedup_path=str(tmp_path / "dedup.log"),
+                            history_path=None, checkpoint_path=str(tmp_path / "checkpoints.json"))
+
+
+def test_worker_resumes_from_checkpoints_after_restart(tmp_path):
+    async def run():
+        before = make_worker(tmp_path)
+        before.subscribed_wallets.update(("a", "b", "c"))
+        before.client.balances.update("a", 5 * 10**9, 100)
+        before.client.balances.update("b", 10**9, 90)
+        before.checkpoints.record("a", 101, "sig-a")
+        before.checkpoints.record("a", 99, "older")  # Ältere Slots überschreiben nichts
+        await before._save_checkpoint()
+        await before.client.close()
+
+        after = make_worker(tmp_path)
+        after.checkpoints.load()
+        after.warm_start()
+        try:
+            assert after.checkpoints.fresh() and after.warm_starts == 2
+            assert after.client.balances.last("a") == (5 * 10**9, 100)
+            assert after.client.balances.last("b") == (10**9, 90)
+            assert after.client.balances.last("c") is None
+            assert after.checkpoints.get("a").to_dict() == {"slot": 101, "signature": "sig-a",
+                                                            "lamports": 5 * 10**9, "balance_slot": 100}
+            # Der gesicherte Stand ist nur Ausgangswert und wird vor dem nächsten Sizing neu geladen
+            assert after.client.balances.get("a") is None
+            after._set_readiness("a", QUEUED)
+            after._set_readiness("c", QUEUED)
+            assert after.wallet_readiness("a")["warm_start"] and not after.wallet_readiness("c")["warm_start"]
+        finally:
+            await after.client.close()
+
+    asyncio.run(run())
+
+
+def test_stale_or_unreadable_checkpoints_start_cold(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    path.write_text(json.dumps({"saved_at": 1.0, "wallets": {
+        "a": {"slot": 1, "signature": None, "lamports": 10, "balance_slot": 1}}}))
+    store = CheckpointStore(str(path), max_age=300)
+    store.load()
+    assert store.get("a").lamports == 10 and not store.fresh()
+
+    path.write_text('{"saved_at": 1.0, "wallets": {"a": {"unknown": 1}}}')
+    store.load()
+    assert store.checkpoints == {} and store.saved_at is None and not store.fresh()
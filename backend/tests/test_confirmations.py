@@ -0,0 +1,89 @@
+import asyncio
+from solders.keypair import Keypair
+from app.blockhash import MAX_BLOCKHASH_AGE, SLOT_TIME
+from app.confirmations import LANDED, EXPIRED, RESUBMITTED
+from app.solana_client import SolanaClient, SIGNATURE_FEE_LAMPORTS
+from tests.stubs import StubRpcServer
+
+START_LAMPORTS = 10 * 10**9
+AMOUNT = 0.5  # SOL
+AMOUNT_LAMPORTS = int(AMOUNT * 10**9)
+
+
+def run_with_client(test, drop_rate: float, max_resubmits: int = 1):
+    async def run():
+        async with StubRpcServer(drop_rate=drop_rate) as rpc:
+            client = SolanaClient(rpc_url=rpc.url, ws_url="ws://127.0.0.1:9", batch_wait=0, signing_workers=0,
+                                  max_resubmits=max_resubmits)
+            client.keypair = Keypair()
+            results = []
+            client.confirmations.add_listener(lambda pending, result, replacement: results.append(result))
+            client.balances.update(str(client.keypair.pubkey()), START_LAMPORTS, rpc.slot)
+            try:
+                await test(rpc, client, results)
+            finally:
+                await client.close()
+
+    asyncio.run(run())
+
+
+def expire_blockhashes(rpc, client):
+    """Lässt Stub und Blockhash-Cache über die Gültigkeit der bisherigen Blockhashes hinauslaufen."""
+    rpc.block_height += MAX_BLOCKHASH_AGE + 1
+    client.blockhashes.fetched_at -= (MAX_BLOCKHASH_AGE + 1) * SLOT_TIME
+
+
+def balance(client):
+    return client.balances.last(str(client.keypair.pubkey()))[0]
+
+
+def test_landed_signature_is_confirmed():
+    async def test(rpc, client, results):
+        signature = await client.execute_transaction_async(str(Keypair().pubkey()), AMOUNT)
+        assert signature in client.confirmations.pending
+        await client.confirmations.poll()
+        assert results == [LANDED]
+        assert not client.confirmations.pending
+        assert balance(client) == START_LAMPORTS - AMOUNT_LAMPORTS - SIGNATURE_FEE_LAMPORTS
+
+    run_with_client(test, drop_rate=0.0)
+
+
+def test_expired_signature_refunds_amount_and_fee():
+    async def test(rpc, client, results):
+        signature = await client.execute_transaction_async(str(Keypair().pubkey()), AMOUNT)
+        assert balance(client) == START_LAMPORTS - AMOUNT_LAMPORTS - SIGNATURE_FEE_LAMPORTS
+        await client.confirmations.poll()
+        assert results == [] and signature in client.confirmations.pending  # Blockhash noch gültig
+
+        expire_blockhashes(rpc, client)
+        await client.confirmations.poll()
+        assert results == [EXPIRED]
+        assert not client.confirmations.pending
+        assert balance(client) == START_LAMPORTS
+        assert rpc.sent_transactions == [signature]
+
+    run_with_client(test, drop_rate=1.0, max_resubmits=0)
+
+
+def test_expired_signature_is_resubmitted_with_fresh_blockhash():
+    async def test(rpc, client, results):
+        signature = await client.execute_transaction_async(str(Keypair().pubkey()), AMOUNT)
+        old_blockhash = client.blockhashes.blockhash
+        expire_blockhashes(rpc, client)
+        rpc.drop_rate = 0.0
+        await client.confirmations.poll()
+
+        assert results == [RESUBMITTED]
+        assert client.blockhashes.blockhash != old_blockhash
+        assert len(rpc.sent_transactions) == 2 and rpc.sent_transactions[0] == signature
+        replacement = client.confirmations.pending[rpc.sent_transactions[1]]
+        assert replacement.attempts == 1
+        assert replacement.last_valid_block_height == rpc.block_height + MAX_BLOCKHASH_AGE
+
+        await client.confirmations.poll()
+        assert results == [RESUBMITTED, LANDED]
+        # Der Betrag fließt nur einmal ab
+        assert balance(client) == START_LAMPORTS - AMOUNT_LAMPORTS - SIGNATURE_FEE_LAMPORTS
+
+    run_with_client(test, drop_rate=1.0)
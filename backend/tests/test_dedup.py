@@ -0,0 +1,72 @@
+from app import dedup
+from app.dedup import DedupIndex
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_ttl_evicts_expired_keys(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup, "time", clock)
+    index = DedupIndex(capacity=10, ttl=60.0, path=None)
+    assert not index.seen("a")
+    clock.now += 30
+    assert index.seen("a")  # Treffer frischt den Zeitpunkt auf
+    clock.now += 59
+    assert index.known("a")
+    clock.now += 2
+    assert not index.known("a")
+    assert not index.seen("a")
+
+
+def test_capacity_evicts_least_recently_seen(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup, "time", clock)
+    index = DedupIndex(capacity=3, ttl=60.0, path=None)
+    for key in "abc":
+        index.seen(key)
+    index.seen("a")
+    index.seen("d")
+    assert len(index) == 3
+    assert not index.known("b")
+    assert all(index.known(key) for key in "acd")
+
+
+def test_reload_keeps_refreshed_keys_within_ttl(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(dedup, "time", clock)
+    path = str(tmp_path / "dedup.log")
+    index = DedupIndex(capacity=10, ttl=60.0, path=path)
+    index.load()
+    index.seen("a")
+    index.seen("b")
+    clock.now += 50
+    assert index.seen("a")
+    index.close()
+
+    clock.now += 20  # "b" ist abgelaufen, "a" dank Auffrischung nicht
+    restarted = DedupIndex(capacity=10, ttl=60.0, path=path)
+    restarted.load()
+    assert restarted.known("a")
+    assert not restarted.known("b")
+    assert len(restarted) == 1
+    restarted.close()
+
+
+def test_journal_is_compacted(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(dedup, "time", clock)
+    path = tmp_path / "dedup.log"
+    index = DedupIndex(capacity=5, ttl=60.0, path=str(path))
+    index.load()
+    for i in range(5 * dedup.COMPACT_FACTOR + 1):
+        index.seen(f"key-{i}")
+    lines = path.read_text().splitlines()
+    assert len(lines) <= 5
+    assert [line.split(" ")[1] for line in lines] == list(index.entries)
+    index.close()
@@ -0,0 +1,117 @@
+import asyncio
+import random
+from app.execution import TradeQueue, CopyIntent, DROP_OLDEST, REJECT, QUEUED
+
+TIMEOUT = 5.0
+
+
+def intent(wallet: str, sequence: int):
+    return CopyIntent(wallet, "recipient", sequence, 0.1)
+
+
+async def wait_until(condition, timeout: float = TIMEOUT):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.001)
+
+
+def test_keeps_per_wallet_order_across_executors():
+    async def run():
+        handled = {}
+        active = set()
+        rng = random.Random(0)
+
+        async def handler(item):
+            assert item.wallet_address not in active  # nie zwei Executoren an derselben Wallet
+            active.add(item.wallet_address)
+            await asyncio.sleep(rng.random() * 0.002)
+            handled.setdefault(item.wallet_address, []).append(item.amount)
+            active.discard(item.wallet_address)
+
+        queue = TradeQueue(handler, maxsize=1000, executors=4)
+        queue.start()
+        for sequence in range(50):
+            for wallet in ("a", "b", "c", "d", "e", "f"):
+                assert queue.submit(intent(wallet, sequence))
+        await wait_until(lambda: queue.processed == 300)
+        await queue.stop()
+        assert handled == {wallet: list(range(50)) for wallet in "abcdef"}
+        assert queue.errors == 0
+
+    asyncio.run(run())
+
+
+def test_drop_oldest_keeps_the_newest_intents():
+    async def run():
+        handled = []
+
+        async def handler(item):
+            handled.append((item.wallet_address, item.amount))
+
+        queue = TradeQueue(handler, maxsize=3, executors=2, overflow=DROP_OLDEST)
+        for sequence, wallet in enumerate("abab"):
+            assert queue.submit(intent(wallet, sequence))
+        assert queue.submit(intent("c", 4))
+        assert queue.size == 3 and queue.max_depth == 3 and queue.dropped == 2
+        queue.start()
+        await wait_until(lambda: queue.processed == 3)
+        await queue.stop()
+        assert sorted(handled) == [("a", 2), ("b", 3), ("c", 4)]
+
+    asyncio.run(run())
+
+
+def test_reject_bounds_the_queue_while_executors_are_busy():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(item):
+            await release.wait()
+
+        queue = TradeQueue(handler, maxsize=5, executors=1, overflow=REJECT)
+        queue.start()
+        assert queue.submit(intent("a", 0))
+        await wait_until(lambda: queue.size == 0)  # Der erste Intent läuft und blockiert den Executor
+        results = [queue.submit(intent("a", sequence)) for sequence in range(1, 10)]
+        assert results == [True] * 5 + [False] * 4
+        assert queue.size == queue.max_depth == 5 and queue.rejected == 4
+        release.set()
+        await wait_until(lambda: queue.processed == 6)
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_stop_finishes_running_intents_and_keeps_queued_ones():
+    async def run():
+        release = asyncio.Event()
+        started = []
+        finished = []
+
+        async def handler(item):
+            started.append(item.amount)
+            await release.wait()
+            finished.append(item.amount)
+
+        queue = TradeQueue(handler, maxsize=100, executors=2)
+        queue.start()
+        items = [intent(wallet, sequence) for sequence, wallet in enumerate("aabbcc")]
+        for item in items:
+            queue.submit(item)
+        await wait_until(lambda: len(started) == 2)
+
+        stop = asyncio.create_task(queue.stop())
+        await asyncio.sleep(0.01)
+        assert not stop.done()  # Wartet auf die laufenden Intents
+        release.set()
+        await asyncio.wait_for(stop, TIMEOUT)
+        assert sorted(finished) == [0, 2]
+        assert queue.size == 4 and all(item.state == QUEUED for item in items if item.amount not in finished)
+
+        queue.start()
+        await wait_until(lambda: queue.processed == 6)
+        await queue.stop()
+        assert sorted(finished) == list(range(6))
+
+    asyncio.run(run())
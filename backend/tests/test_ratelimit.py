@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from solders.keypair import Keypair
+from app.ratelimit import TokenBucket, TRADE, UI, BACKGROUND
+from app.solana_client import SolanaClient
+from tests.stubs import StubRpcServer
+
+
+def test_acquire_blocking_refuses_event_loop_thread():
+    async def run():
+        with pytest.raises(RuntimeError):
+            TokenBucket(10).acquire_blocking()
+
+    asyncio.run(run())
+    TokenBucket(10).acquire_blocking()  # Ohne laufenden Loop erlaubt
+
+
+def test_trade_waiter_is_served_before_earlier_ui_waiters():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=1)
+        await bucket.acquire(UI)  # Bucket leeren
+        order = []
+
+        async def acquire(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        tasks = [asyncio.create_task(acquire(f"ui-{i}", UI)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(acquire("trade", TRADE)))
+        await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        assert order == ["trade", "ui-0", "ui-1", "ui-2"]
+        assert bucket.delayed == {TRADE: 1, UI: 3, BACKGROUND: 0}
+
+    asyncio.run(run())
+
+
+def test_identical_balance_requests_share_one_rpc_call():
+    async def run():
+        async with StubRpcServer() as rpc:
+            rpc.method_delays["getBalance"] = 0.05
+            client = SolanaClient(rpc_url=rpc.url, ws_url="ws://127.0.0.1:9", batch_wait=0, signing_workers=0)
+            wallet = str(Keypair().pubkey())
+            try:
+                balances = await asyncio.gather(*(client.get_balance_async(wallet, priority=UI) for _ in range(10)))
+                assert balances == [rpc.default_balance / 10**9] * 10
+                assert rpc.calls == {"getBalance": 1}
+                assert client.coalesced == 9
+                # Nach Abschluss geht die nächste Anfrage wieder an den Endpunkt
+                await client.get_balance_async(wallet, priority=UI)
+                assert rpc.calls == {"getBalance": 2}
+            finally:
+                await client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app import rpc
+from app.ratelimit import UI
+from app.rpc import RpcPool, FAILURE_THRESHOLD
+from tests.stubs import StubRpcServer
+
+
+def test_hedge_fires_only_after_the_delay():
+    async def run():
+        async with StubRpcServer() as first, StubRpcServer() as second:
+            pool = RpcPool([first.url, second.url], hedge_delay=0.05)
+            try:
+                for endpoint in pool.endpoints:  # Verbindungen aufbauen, Latenz messen
+                    await pool._attempt(endpoint, "getHealth", [], UI)
+                pool.endpoints[0].latency, pool.endpoints[1].latency = 0.001, 0.02  # "first" ist bevorzugt
+                primary, backup = first, second
+
+                primary.method_delays["getLatestBlockhash"] = 0.01
+                await pool.arequest("getLatestBlockhash")
+                assert pool.hedges == 0 and "getLatestBlockhash" not in backup.calls
+
+                primary.method_delays["getLatestBlockhash"] = 1.0
+                started = time.perf_counter()
+                result = await pool.arequest("getLatestBlockhash")
+                assert time.perf_counter() - started < 0.5
+                assert result["value"]["blockhash"]
+                assert pool.hedges == 1 and backup.calls["getLatestBlockhash"] == 1
+                assert pool.endpoints[1].hedges_won == 1
+            finally:
+                await pool.aclose()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_fails_over_on_throttling_and_server_errors(status):
+    async def run():
+        async with StubRpcServer() as failing, StubRpcServer() as healthy:
+            if status == 429:
+                failing.max_rate = 0
+            else:
+                failing.error_status = status
+            pool = RpcPool([failing.url, healthy.url])
+            try:
+                result = await pool.arequest("getBalance", ["wallet"])
+                assert result["value"] == healthy.default_balance
+                assert pool.failovers == 1
+                assert pool.endpoints[0].errors == 1 and healthy.calls == {"getBalance": 1}
+                # 429 pausiert zusätzlich den Bucket des Endpunkts
+                assert (pool.endpoints[0].bucket.throttled == 1) == (status == 429)
+            finally:
+                await pool.aclose()
+
+    asyncio.run(run())
+
+
+def test_endpoint_cools_down_after_repeated_failures(monkeypatch):
+    monkeypatch.setattr(rpc, "COOLDOWN", 0.2)
+
+    async def run():
+        async with StubRpcServer() as failing, StubRpcServer() as healthy:
+            failing.error_status = 502
+            pool = RpcPool([failing.url, healthy.url])
+            endpoint = pool.endpoints[0]
+            try:
+                for _ in range(FAILURE_THRESHOLD):
+                    with pytest.raises(httpx.HTTPStatusError):
+                        await pool._attempt(endpoint, "getBalance", ["wallet"], UI)
+                assert not endpoint.healthy(time.monotonic())
+                assert pool.ranked()[-1] is endpoint
+                assert endpoint.cooldown == 0.4  # Nächste Pause verdoppelt
+
+                await pool.arequest("getBalance", ["wallet"])
+                assert failing.failed == FAILURE_THRESHOLD and healthy.calls == {"getBalance": 1}
+
+                await asyncio.sleep(0.25)
+                failing.error_status = None
+                assert endpoint.healthy(time.monotonic())
+                await pool._attempt(endpoint, "getBalance", ["wallet"], UI)
+                assert endpoint.consecutive_errors == 0 and endpoint.cooldown == 0.2
+            finally:
+                await pool.aclose()
+
+    asyncio.run(run())
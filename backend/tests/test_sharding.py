@@ -0,0 +1,72 @@
+import asyncio
+import time
+from app import sharding
+from app.sharding import SUBSCRIBE
+from app.solana_client import SolanaClient
+from app.worker import MonitoringWorker, QUEUED, SUBSCRIBING, READY, RETRYING
+
+
+class FakeProcess:
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.exitcode = None if alive else -9
+
+    def is_alive(self):
+        return self.alive
+
+
+def test_restarted_shard_puts_its_wallets_back_to_subscribing(monkeypatch, tmp_path):
+    monkeypatch.setattr(sharding, "WATCH_INTERVAL", 0.01)
+
+    async def run():
+        client = SolanaClient(rpc_url="http://127.0.0.1:9", ws_url="ws://127.0.0.1:9", batch_wait=0,
+                              signing_workers=0)
+        worker = MonitoringWorker(client, ledger_sessions=None, shards=2, dedup_path=str(tmp_path / "dedup.log"),
+                                  history_path=None, checkpoint_path=None)
+        worker.started_at = time.time()  # Ohne start(): Prozesse und Pipes werden unten ersetzt
+        coordinator = worker.shards
+        sent, spawned = [], []
+        monkeypatch.setattr(coordinator, "_spawn", lambda shard_id: spawned.append(shard_id) or
+                            coordinator.processes.__setitem__(shard_id, FakeProcess()))
+        monkeypatch.setattr(coordinator, "_send", lambda shard_id, command, wallet=None:
+                            sent.append((shard_id, command, wallet)) or True)
+        coordinator.loop = asyncio.get_running_loop()
+        for shard_id in range(2):
+            coordinator.ring.add(shard_id)
+            coordinator.loads[shard_id] = 0
+            coordinator.processes[shard_id] = FakeProcess()
+
+        wallets = [f"wallet-{i}" for i in range(20)]
+        for wallet in wallets:
+            worker._set_readiness(wallet, QUEUED)
+            coordinator.assign(wallet)
+            coordinator.subscribed.add(wallet)
+            worker._on_shard_status(wallet, True)
+        assert worker.readiness_counts[READY] == 20
+        on_dead = [wallet for wallet in wallets if coordinator.assignments[wallet] == 0]
+        assert 0 < len(on_dead) < 20
+
+        sent.clear()
+        coordinator.processes[0] = FakeProcess(alive=False)
+        watcher = asyncio.create_task(coordinator._watch())
+        try:
+            while not spawned:
+                await asyncio.sleep(0.005)
+        finally:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+
+        assert spawned == [0] and coordinator.restarts == 1
+        assert sorted(sent) == sorted((0, SUBSCRIBE, wallet) for wallet in on_dead)
+        assert {w for w in wallets if worker.readiness[w][0] == SUBSCRIBING} == set(on_dead)
+        assert worker.readiness_counts == {QUEUED: 0, SUBSCRIBING: len(on_dead), READY: 20 - len(on_dead),
+                                           RETRYING: 0}
+        assert coordinator.subscribed.isdisjoint(on_dead)
+
+        # Bestätigt der neue Prozess das Abo, ist die Wallet wieder bereit
+        for wallet in on_dead:
+            worker._on_shard_status(wallet, True)
+        assert worker.readiness_counts[READY] == 20
+        await client.close()
+
+    asyncio.run(run())
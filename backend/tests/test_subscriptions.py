@@ -0,0 +1,130 @@
+import asyncio
+from app import subscriptions
+from app.subscriptions import SubscriptionMultiplexer
+from tests.stubs import StubWebSocketServer
+
+WALLETS = 3000
+TIMEOUT = 10.0
+
+
+async def wait_until(condition, timeout: float = TIMEOUT):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+class Recorder:
+    """Sammelt je Wallet die Slots der empfangenen Notifications."""
+
+    def __init__(self):
+        self.received = {}
+
+    async def __call__(self, wallet, params, trace):
+        self.received.setdefault(wallet, []).append(params["result"]["context"]["slot"])
+
+    def count(self):
+        return sum(len(slots) for slots in self.received.values())
+
+
+async def subscribe_all(multiplexer, wallets, callback):
+    return await asyncio.gather(*(multiplexer.subscribe(wallet, callback) for wallet in wallets))
+
+
+def test_routes_notifications_by_subscription_id():
+    async def run():
+        wallets = [f"wallet-{i}" for i in range(WALLETS)]
+        recorder = Recorder()
+        async with StubWebSocketServer() as server:
+            multiplexer = SubscriptionMultiplexer(server.url, max_connections=4, max_subscriptions_per_connection=1000)
+            try:
+                ids = await subscribe_all(multiplexer, wallets, recorder)
+                assert len(set(ids)) == WALLETS
+                assert len(server.subscriptions) == WALLETS
+                assert len(server.connections) == 3
+
+                for slot, wallet in enumerate(wallets, start=1):
+                    assert await server.notify(wallet, {"lamports": slot}, slot) == 1
+                await wait_until(lambda: recorder.count() == WALLETS)
+                assert recorder.received == {wallet: [slot] for slot, wallet in enumerate(wallets, start=1)}
+            finally:
+                await multiplexer.close()
+
+    asyncio.run(run())
+
+
+def test_adds_and_removes_wallets_without_reconnect():
+    async def run():
+        wallets = [f"wallet-{i}" for i in range(WALLETS)]
+        removed, kept, added = wallets[:500], wallets[500:2000], wallets[2000:2500]
+        recorder = Recorder()
+        async with StubWebSocketServer() as server:
+            multiplexer = SubscriptionMultiplexer(server.url, max_connections=4, max_subscriptions_per_connection=1000)
+            try:
+                await subscribe_all(multiplexer, removed + kept, recorder)
+                connections = server.total_connections
+                assert connections == 2
+
+                assert all(await asyncio.gather(*(multiplexer.unsubscribe(wallet) for wallet in removed)))
+                await subscribe_all(multiplexer, added, recorder)
+
+                assert server.total_connections == connections
+                assert multiplexer.reconnects == 0
+                assert set(server.by_wallet) == set(kept + added)
+                for wallet in removed:
+                    assert await server.notify(wallet, {"lamports": 1}, 1) == 0
+                for wallet in kept + added:
+                    assert await server.notify(wallet, {"lamports": 2}, 2) == 1
+                await wait_until(lambda: recorder.count() == len(kept) + len(added))
+                assert set(recorder.received) == set(kept + added)
+            finally:
+                await multiplexer.close()
+
+    asyncio.run(run())
+
+
+def test_resubscribes_after_dropped_connection(monkeypatch):
+    monkeypatch.setattr(subscriptions, "RECONNECT_DELAY", 0.05)
+
+    async def run():
+        wallets = [f"wallet-{i}" for i in range(WALLETS)]
+        recorder = Recorder()
+        async with StubWebSocketServer() as server:
+            multiplexer = SubscriptionMultiplexer(server.url, max_connections=4, max_subscriptions_per_connection=1000)
+            try:
+                old_ids = set(await subscribe_all(multiplexer, wallets, recorder))
+                await server.drop_connections()
+
+                await wait_until(lambda: multiplexer.reconnects == 3 and all(
+                    len(c.subscription_ids) == c.load for c in multiplexer.connections))
+                assert len(server.subscriptions) == WALLETS
+                assert old_ids.isdisjoint(server.subscriptions)
+
+                for wallet in wallets:
+                    assert await server.notify(wallet, {"lamports": 1}, 7) == 1
+                await wait_until(lambda: recorder.count() == WALLETS)
+                assert recorder.received == {wallet: [7] for wallet in wallets}
+            finally:
+                await multiplexer.close()
+
+    asyncio.run(run())
+
+
+def test_unsubscribe_while_subscribe_pending_closes_server_subscription():
+    async def run():
+        recorder = Recorder()
+        async with StubWebSocketServer(response_delay=0.1) as server:
+            multiplexer = SubscriptionMultiplexer(server.url)
+            try:
+                subscribe = asyncio.create_task(multiplexer.subscribe("wallet-0", recorder))
+                await wait_until(lambda: multiplexer.connections and multiplexer.connections[0].pending)
+                assert await multiplexer.unsubscribe("wallet-0")
+
+                await subscribe
+                await wait_until(lambda: not server.subscriptions)
+                assert await server.notify("wallet-0", {"lamports": 1}, 1) == 0
+                assert not multiplexer.connections[0].routes
+            finally:
+                await multiplexer.close()
+
+    asyncio.run(run())
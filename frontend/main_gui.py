@@ -1,13 +1,64 @@
 import sys
+import json
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QLineEdit, QPushButton, QTableWidget,
-    QTableWidgetItem, QVBoxLayout, QWidget, QHBoxLayout, QLabel, QDialog, QDialogButtonBox, QHeaderView
+    QApplication, QMainWindow, QLineEdit, QPushButton, QTableView, QAbstractItemView,
+    QVBoxLayout, QWidget, QHBoxLayout, QLabel, QDialog, QDialogButtonBox, QHeaderView, QFormLayout,
+    QDoubleSpinBox
 )
-from PyQt5.QtGui import QIntValidator
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import QThread, QThreadPool, QTimer, pyqtSignal
 import requests
 
+from ui_components import (
+    ALLOCATION_COLUMN, ACTIONS_COLUMN, REQUEST_TIMEOUT,
+    AllocationDelegate, ApiTask, BacktestTableModel, RemoveButtonDelegate, WalletTableModel
+)
+
 API_URL = "http://127.0.0.1:8000"
+STREAM_RECONNECT_DELAY = 2000  # ms bis zum erneuten Verbinden mit dem Event-Stream
+UI_UPDATE_INTERVAL = 250  # ms, in denen Stream-Updates gesammelt werden
+WALLET_PAGE_SIZE = 500  # Wallets pro Seite beim ersten Laden
+BACKTEST_TIMEOUT = 120  # Sekunden für einen Backtest über viele Wallets
+
+
+def error_detail(response):
+    """Fehlertext einer Antwort; auch wenn der Body kein JSON ist, z. B. bei Proxy-Fehlerseiten."""
+    try:
+        detail = response.json().get("detail")
+    except (ValueError, AttributeError):
+        detail = None
+    return detail or response.text.strip() or f"HTTP {response.status_code}"
+
+
+class EventStreamThread(QThread):
+    """Liest den Server-Sent-Event-Stream des Backends im Hintergrund."""
+    batch_received = pyqtSignal(list)
+
+    def __init__(self):
+        super().__init__()
+        self.running = True
+        self.response = None
+
+    def run(self):
+        while self.running:
+            try:
+                self.response = requests.get(f"{API_URL}/stream", stream=True, timeout=(5, 60))
+                for line in self.response.iter_lines():
+                    if not self.running:
+                        return
+                    if line.startswith(b"data: "):
+                        self.batch_received.emit(json.loads(line[6:]))
+            except (requests.RequestException, ValueError, AttributeError):
+                pass
+            finally:
+                if self.response is not None:
+                    self.response.close()
+            if self.running:
+                self.msleep(STREAM_RECONNECT_DELAY)
+
+    def stop(self):
+        self.running = False
+        if self.response is not None:
+            self.response.close()
 
 class PrivateKeyDialog(QDialog):
     def __init__(self):
@@ -56,12 +107,92 @@ class PublicKeyDialog(QDialog):
         return self.input_field.text()
 
 
+class BacktestDialog(QDialog):
+    """Fragt Allokationsbereich und Startkapital für den Backtest ab."""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Backtest Allocations")
+        self.layout = QFormLayout()
+
+        self.from_input = self._spin_box(1, 1, 100)
+        self.to_input = self._spin_box(100, 1, 100)
+        self.step_input = self._spin_box(1, 0.1, 100)
+        self.balance_input = self._spin_box(10, 0.001, 1_000_000)
+        self.layout.addRow("From % per trade:", self.from_input)
+        self.layout.addRow("To % per trade:", self.to_input)
+        self.layout.addRow("Step %:", self.step_input)
+        self.layout.addRow("Start balance (SOL):", self.balance_input)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        self.layout.addRow(self.buttons)
+
+        self.setLayout(self.layout)
+
+    @staticmethod
+    def _spin_box(value, minimum, maximum):
+        spin_box = QDoubleSpinBox()
+        spin_box.setRange(minimum, maximum)
+        spin_box.setDecimals(3 if minimum < 0.1 else 1)
+        spin_box.setValue(value)
+        return spin_box
+
+    def get_parameters(self):
+        return {
+            "allocation_from": self.from_input.value(),
+            "allocation_to": self.to_input.value(),
+            "allocation_step": self.step_input.value(),
+            "start_balance": self.balance_input.value(),
+        }
+
+
+class BacktestResultsDialog(QDialog):
+    """Zeigt das Backtest-Ergebnis; die empfohlenen Allokationen lassen sich übernehmen."""
+
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Backtest Results")
+        self.setGeometry(150, 150, 900, 500)
+        self.layout = QVBoxLayout()
+
+        self.model = BacktestTableModel(result, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.layout.addWidget(self.table)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Close, self)
+        self.apply_button = self.buttons.addButton("Apply Best Allocations", QDialogButtonBox.AcceptRole)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        self.layout.addWidget(self.buttons)
+
+        self.setLayout(self.layout)
+
+
 class CopyTradingGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.public_key = None
+        self.wallets_version = None  # Stand der geladenen Liste für /wallets/changes
+        self.syncing = False
+        self.fetching_sol = False  # Höchstens eine Kontostandsabfrage gleichzeitig
+        self.tasks = set()  # Laufende ApiTasks, bis ihr Ergebnis zugestellt ist
+        self.thread_pool = QThreadPool.globalInstance()
+        self.pending_updates = {}  # (Typ, Schlüssel) -> letzte Stream-Nachricht
+        self.pending_events = []
         self.init_ui()
 
+        self.ui_timer = QTimer(self)
+        self.ui_timer.timeout.connect(self.apply_stream_updates)
+        self.ui_timer.start(UI_UPDATE_INTERVAL)
+        self.stream_thread = EventStreamThread()
+        self.stream_thread.batch_received.connect(self.queue_stream_batch)
+        self.stream_thread.start()
+
     def init_ui(self):
         self.setWindowTitle("Solana CopyTrading Bot")
         self.setGeometry(100, 100, 900, 600)
@@ -80,13 +211,17 @@ class CopyTradingGUI(QMainWindow):
         input_layout.addWidget(self.wallet_input)
         input_layout.addWidget(self.add_wallet_button)
 
-        self.wallet_table = QTableWidget()
-        self.wallet_table.setColumnCount(4)
-        self.wallet_table.setHorizontalHeaderLabels(
-            ["Wallet Address", "PNL", "% per trade", "Actions"]
-        )
+        self.wallet_model = WalletTableModel(self)
+        self.wallet_model.allocation_edited.connect(self.update_allocation)
+        self.wallet_table = QTableView()
+        self.wallet_table.setModel(self.wallet_model)
+        self.wallet_table.setEditTriggers(QAbstractItemView.SelectedClicked | QAbstractItemView.DoubleClicked)
+        self.wallet_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.wallet_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.wallet_table.cellClicked.connect(self.handle_cell_click)
+        self.wallet_table.setItemDelegateForColumn(ALLOCATION_COLUMN, AllocationDelegate(self.wallet_table))
+        self.remove_delegate = RemoveButtonDelegate(self.wallet_table)
+        self.remove_delegate.clicked.connect(self.remove_wallet)
+        self.wallet_table.setItemDelegateForColumn(ACTIONS_COLUMN, self.remove_delegate)
 
         self.refresh_button = QPushButton("Refresh Wallets")
         self.refresh_button.clicked.connect(self.refresh_wallets)
@@ -97,6 +232,9 @@ class CopyTradingGUI(QMainWindow):
         self.public_key_button = QPushButton("Set Public Key")
         self.public_key_button.clicked.connect(self.open_public_key_dialog)
 
+        self.backtest_button = QPushButton("Backtest Allocations")
+        self.backtest_button.clicked.connect(self.open_backtest_dialog)
+
         self.total_pnl_label = QLabel("Total PNL: 0.0")
         self.total_sol_label = QLabel("Total SOL: 0.0")
 
@@ -106,21 +244,44 @@ class CopyTradingGUI(QMainWindow):
         wallet_layout.addWidget(self.refresh_button)
         wallet_layout.addWidget(self.private_key_button)
         wallet_layout.addWidget(self.public_key_button)
+        wallet_layout.addWidget(self.backtest_button)
 
         layout.addLayout(input_layout)
         layout.addLayout(wallet_layout)
 
         self.refresh_wallets()
 
+    def request(self, method, path, on_success, on_error=None, **kwargs):
+        """Startet einen API-Aufruf im Thread-Pool; die Callbacks laufen im UI-Thread."""
+        task = ApiTask(method, f"{API_URL}{path}", **kwargs)
+        self.tasks.add(task)
+
+        def finished(response):
+            self.tasks.discard(task)
+            on_success(response)
+
+        def failed(message):
+            self.tasks.discard(task)
+            if on_error is not None:
+                on_error(message)
+            else:
+                self.statusBar().showMessage(f"Backend not reachable: {message}", 5000)
+
+        task.signals.finished.connect(finished)
+        task.signals.failed.connect(failed)
+        self.thread_pool.start(task)
+
     def open_private_key_dialog(self):
         dialog = PrivateKeyDialog()
         if dialog.exec_():
             private_key = dialog.get_private_key()
-            response = requests.post(f"{API_URL}/set_private_key/", json={"key": private_key})
-            if response.status_code == 200:
-                self.statusBar().showMessage("Private Key set successfully.", 5000)
-            else:
-                self.statusBar().showMessage("Failed to set Private Key.", 5000)
+            self.request("POST", "/set_private_key/", self.private_key_set, json={"key": private_key})
+
+    def private_key_set(self, response):
+        if response.status_code == 200:
+            self.statusBar().showMessage("Private Key set successfully.", 5000)
+        else:
+            self.statusBar().showMessage("Failed to set Private Key.", 5000)
 
     def open_public_key_dialog(self):
         dialog = PublicKeyDialog()
@@ -132,108 +293,204 @@ class CopyTradingGUI(QMainWindow):
             else:
                 self.statusBar().showMessage("Public Key not set.", 5000)
 
+    def open_backtest_dialog(self):
+        dialog = BacktestDialog()
+        if dialog.exec_():
+            parameters = dialog.get_parameters()
+            # Ausgewählte Zeilen, sonst alle geladenen Wallets
+            rows = sorted({index.row() for index in self.wallet_table.selectionModel().selectedIndexes()})
+            wallets = [self.wallet_model.wallets[row] for row in rows] or self.wallet_model.wallets
+            parameters["wallet_addresses"] = [wallet["wallet_address"] for wallet in wallets]
+            self.backtest_button.setEnabled(False)
+            self.statusBar().showMessage("Running backtest...")
+            self.request("POST", "/backtest/", self.backtest_finished, self.backtest_failed, json=parameters,
+                         timeout=BACKTEST_TIMEOUT)
+
+    def backtest_finished(self, response):
+        self.backtest_button.setEnabled(True)
+        if response.status_code != 200:
+            self.statusBar().showMessage(f"Backtest failed. Error: {error_detail(response)}", 5000)
+            return
+        try:
+            results = response.json()
+        except ValueError:
+            self.statusBar().showMessage(f"Backtest failed. Invalid response: {error_detail(response)}", 5000)
+            return
+        self.statusBar().clearMessage()
+        dialog = BacktestResultsDialog(results, self)
+        if dialog.exec_():
+            ids = {wallet["wallet_address"]: wallet["id"] for wallet in self.wallet_model.wallets}
+            for address, allocation in dialog.model.best_allocations().items():
+                if address in ids:
+                    self.update_allocation(ids[address], allocation)
+
+    def backtest_failed(self, message):
+        self.backtest_button.setEnabled(True)
+        self.statusBar().showMessage(f"Backtest failed: {message}", 5000)
+
     def add_wallet(self):
         wallet_address = self.wallet_input.text()
         if wallet_address:
-            response = requests.post(f"{API_URL}/wallets/", json={"wallet_address": wallet_address})
-            if response.status_code == 200:
-                self.wallet_input.setText("")
-                self.refresh_wallets()
-            else:
-                self.statusBar().showMessage("Failed to add wallet.", 5000)
+            self.request("POST", "/wallets/", self.wallet_added, json={"wallet_address": wallet_address})
 
-    def refresh_wallets(self):
-        response = requests.get(f"{API_URL}/wallets/")
+    def wallet_added(self, response):
         if response.status_code == 200:
-            wallets = response.json()
-            self.wallet_table.setRowCount(len(wallets))
-            total_pnl = 0.0
-            for i, wallet in enumerate(wallets):
-                wallet_address_item = QTableWidgetItem(wallet["wallet_address"])
-                wallet_address_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                self.wallet_table.setItem(i, 0, wallet_address_item)
-
-                pnl_item = QTableWidgetItem(str(wallet["pnl"]))
-                pnl_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                self.wallet_table.setItem(i, 1, pnl_item)
-                total_pnl += wallet["pnl"]
-
-                allocation_item = QTableWidgetItem(f"{int(wallet.get('allocation_percentage', 10))}")
-                allocation_item.setTextAlignment(Qt.AlignCenter)
-                allocation_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                self.wallet_table.setItem(i, 2, allocation_item)
-
-                remove_button = QPushButton("Remove")
-                remove_button.clicked.connect(lambda _, w_id=wallet["id"]: self.remove_wallet(w_id))
-                self.wallet_table.setCellWidget(i, 3, remove_button)
-
-            self.total_pnl_label.setText(f"Total PNL: {total_pnl:.2f}")
-            self.update_total_sol()
+            self.wallet_input.setText("")
+            self.wallet_model.upsert(response.json()["wallet"])
+            self.update_total_pnl()
         else:
-            self.statusBar().showMessage("Failed to refresh wallets.", 5000)
+            self.statusBar().showMessage("Failed to add wallet.", 5000)
+
+    def refresh_wallets(self):
+        """Lädt die Liste beim ersten Mal seitenweise, danach nur noch die Änderungen."""
+        if self.syncing:
+            return
+        self.syncing = True
+        if self.wallets_version is None:
+            self.load_wallet_page(None, [], None)
+        else:
+            self.load_wallet_changes(self.wallets_version)
+        self.update_total_sol()
+
+    def sync_failed(self, message):
+        self.syncing = False
+        self.statusBar().showMessage("Failed to refresh wallets.", 5000)
+
+    def load_wallet_page(self, cursor, wallets, version):
+        params = {"limit": WALLET_PAGE_SIZE}
+        if cursor is not None:
+            params["cursor"] = cursor
+        self.request("GET", "/wallets/",
+                     lambda response: self.wallet_page_loaded(response, wallets, version),
+                     self.sync_failed, params=params)
+
+    def wallet_page_loaded(self, response, wallets, version):
+        if response.status_code != 200:
+            self.sync_failed(response.status_code)
+            return
+        wallets.extend(response.json())
+        if version is None:
+            # Stand der ersten Seite; spätere Änderungen holt /wallets/changes nach
+            version = int(response.headers.get("X-Wallets-Version", 0))
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is not None:
+            self.load_wallet_page(int(next_cursor), wallets, version)
+            return
+        self.wallet_model.set_wallets(wallets)
+        self.wallets_version = version
+        self.update_total_pnl()
+        self.load_wallet_changes(version)
+
+    def load_wallet_changes(self, since):
+        self.request("GET", "/wallets/changes", self.wallet_changes_loaded, self.sync_failed,
+                     params={"since": since})
+
+    def wallet_changes_loaded(self, response):
+        if response.status_code != 200:
+            self.sync_failed(response.status_code)
+            return
+        result = response.json()
+        for change in result["changes"]:
+            if change["op"] == "delete":
+                self.wallet_model.remove(change["wallet_id"])
+            else:
+                self.wallet_model.upsert(change["wallet"])
+        self.wallets_version = result["version"]
+        self.update_total_pnl()
+        if result["has_more"]:
+            self.load_wallet_changes(result["version"])
+        else:
+            self.syncing = False
+
+    def update_total_pnl(self):
+        self.total_pnl_label.setText(f"Total PNL: {self.wallet_model.total_pnl:.2f}")
+
+    def queue_stream_batch(self, batch):
+        """Sammelt Stream-Nachrichten; angewendet wird gebündelt im UI-Timer."""
+        for message in batch:
+            if "key" in message:
+                self.pending_updates[(message["type"], message["key"])] = message
+            else:
+                self.pending_events.append(message)
+
+    def apply_stream_updates(self):
+        if not self.pending_updates and not self.pending_events:
+            return
+        updates, self.pending_updates = self.pending_updates, {}
+        events, self.pending_events = self.pending_events, []
+
+        for message in updates.values():
+            data = message["data"]
+            if message["type"] == "wallet":
+                self.wallet_model.upsert(data)
+            elif message["type"] == "balance" and data["wallet_address"] == self.public_key:
+                self.total_sol_label.setText(f"Total SOL: {data['balance']:.2f}")
+
+        for event in events:
+            data = event["data"]
+            if event["type"] == "wallet_removed":
+                self.wallet_model.remove(data["id"])
+            elif event["type"] == "copy":
+                self.statusBar().showMessage(
+                    f"Copy {data['status']}: {data['amount']:.4f} SOL to {data['recipient']}", 5000)
+
+        self.update_total_pnl()
+
+    def closeEvent(self, event):
+        self.ui_timer.stop()
+        self.stream_thread.stop()
+        self.stream_thread.wait(1000)
+        self.thread_pool.waitForDone(REQUEST_TIMEOUT * 1000)
+        super().closeEvent(event)
 
     def update_total_sol(self):
         if not self.public_key:
             self.total_sol_label.setText("Total SOL: Public Key not set.")
             return
+        if self.fetching_sol:
+            return
+        self.fetching_sol = True
+        self.request("GET", f"/wallets/{self.public_key}/balance/", self.total_sol_loaded, self.total_sol_failed)
 
-        response = requests.get(f"{API_URL}/wallets/{self.public_key}/balance/")
+    def total_sol_loaded(self, response):
+        self.fetching_sol = False
         if response.status_code == 200:
             balance = response.json().get("balance", 0.0)
             balance = balance if balance is not None else 0.0
             self.total_sol_label.setText(f"Total SOL: {balance:.2f}")
         else:
-            self.total_sol_label.setText("Total SOL: Error fetching balance.")
-            self.statusBar().showMessage("Failed to fetch Total SOL.", 5000)
-
-    def handle_cell_click(self, row, column):
-        if column == 2:
-            self.activate_allocation_edit(row)
-
-    def activate_allocation_edit(self, row):
-        current_value = self.wallet_table.item(row, 2).text()
-        allocation_input = QLineEdit(current_value)
-        allocation_input.setValidator(QIntValidator(0, 100))
-        allocation_input.setAlignment(Qt.AlignCenter)
-        self.wallet_table.setCellWidget(row, 2, allocation_input)
-        allocation_input.setFocus()
-        allocation_input.returnPressed.connect(lambda: self.update_allocation(row, allocation_input))
-
-    def update_allocation(self, row, input_field):
-        try:
-            allocation = int(input_field.text())
-            wallet_id = self.get_wallet_id_from_row(row)
-            if not wallet_id:
-                self.statusBar().showMessage(f"Failed to find wallet ID for row {row}.", 5000)
-                return
-
-            response = requests.put(f"{API_URL}/wallets/{wallet_id}/set_allocation/", json={"percentage": allocation})
-            if response.status_code == 200:
-                allocation_item = QTableWidgetItem(str(allocation))
-                allocation_item.setTextAlignment(Qt.AlignCenter)
-                allocation_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                self.wallet_table.setItem(row, 2, allocation_item)
-                self.statusBar().showMessage("Allocation updated successfully.", 5000)
-            else:
-                error_message = response.json().get("detail", "Unknown error")
-                self.statusBar().showMessage(f"Failed to update allocation. Error: {error_message}", 5000)
-        except ValueError:
-            self.statusBar().showMessage("Invalid allocation value. Use whole numbers only.", 5000)
+            self.total_sol_failed(response.status_code)
 
-    def get_wallet_id_from_row(self, row):
-        wallet_address = self.wallet_table.item(row, 0).text()
-        response = requests.get(f"{API_URL}/wallets/")
-        if response.status_code == 200:
-            wallets = response.json()
-            for wallet in wallets:
-                if wallet["wallet_address"] == wallet_address:
-                    return wallet["id"]
-        return None
+    def total_sol_failed(self, error):
+        self.fetching_sol = False
+        self.total_sol_label.setText("Total SOL: Error fetching balance.")
+        self.statusBar().showMessage("Failed to fetch Total SOL.", 5000)
+
+    def update_allocation(self, wallet_id, allocation):
+        self.request("PUT", f"/wallets/{wallet_id}/set_allocation/",
+                     lambda response: self.allocation_updated(response, wallet_id),
+                     json={"percentage": allocation})
+
+    def allocation_updated(self, response, wallet_id):
+        if response.status_code != 200:
+            self.statusBar().showMessage(f"Failed to update allocation. Error: {error_detail(response)}", 5000)
+            return
+        try:
+            allocation = response.json()["allocation_percentage"]
+        except (ValueError, KeyError, TypeError):
+            self.statusBar().showMessage(f"Failed to update allocation. Invalid response: {error_detail(response)}",
+                                         5000)
+            return
+        self.wallet_model.upsert({"id": wallet_id, "allocation_percentage": allocation})
+        self.statusBar().showMessage("Allocation updated successfully.", 5000)
 
     def remove_wallet(self, wallet_id):
-        response = requests.delete(f"{API_URL}/wallets/{wallet_id}")
+        self.request("DELETE", f"/wallets/{wallet_id}", lambda response: self.wallet_removed(response, wallet_id))
+
+    def wallet_removed(self, response, wallet_id):
         if response.status_code == 200:
-            self.refresh_wallets()
+            self.wallet_model.remove(wallet_id)
+            self.update_total_pnl()
             self.statusBar().showMessage("Wallet removed successfully.", 5000)
         else:
             self.statusBar().showMessage("Failed to remove wallet.", 5000)
@@ -0,0 +1,211 @@
+from PyQt5.QtWidgets import QApplication, QLineEdit, QStyle, QStyledItemDelegate, QStyleOptionButton
+from PyQt5.QtGui import QIntValidator
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QEvent, QModelIndex, QObject, QRunnable, pyqtSignal
+)
+import requests
+
+REQUEST_TIMEOUT = 10  # Sekunden pro API-Aufruf
+
+ADDRESS_COLUMN, PNL_COLUMN, ALLOCATION_COLUMN, ACTIONS_COLUMN = range(4)
+HEADERS = ["Wallet Address", "PNL", "% per trade", "Actions"]
+BACKTEST_HEADERS = ["Wallet Address", "Events", "Best %", "Copies", "Fees (SOL)", "Final SOL"]
+
+
+class WalletTableModel(QAbstractTableModel):
+    """Wallet-Liste für die Tabelle; Änderungen werden zeilenweise gemeldet statt neu aufgebaut."""
+    allocation_edited = pyqtSignal(int, int)  # Wallet-ID, neue Allokation
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.wallets = []
+        self.rows = {}  # Wallet-ID -> Zeile
+        self.total_pnl = 0.0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.wallets)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        wallet = self.wallets[index.row()]
+        column = index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == ADDRESS_COLUMN:
+                return wallet["wallet_address"]
+            if column == PNL_COLUMN:
+                return str(wallet["pnl"])
+            if column == ALLOCATION_COLUMN:
+                return f"{int(wallet.get('allocation_percentage', 10))}"
+            if column == ACTIONS_COLUMN:
+                return "Remove"
+        elif role == Qt.TextAlignmentRole and column == ALLOCATION_COLUMN:
+            return Qt.AlignCenter
+        elif role == Qt.UserRole:
+            return wallet["id"]
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if index.column() == ALLOCATION_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        # Die Allokation wird erst übernommen, wenn das Backend sie bestätigt hat
+        if role != Qt.EditRole or index.column() != ALLOCATION_COLUMN:
+            return False
+        try:
+            allocation = int(value)
+        except (TypeError, ValueError):
+            return False
+        self.allocation_edited.emit(self.wallets[index.row()]["id"], allocation)
+        return False
+
+    def set_wallets(self, wallets):
+        self.beginResetModel()
+        self.wallets = list(wallets)
+        self.rows = {wallet["id"]: row for row, wallet in enumerate(self.wallets)}
+        self.total_pnl = sum(wallet["pnl"] for wallet in self.wallets)
+        self.endResetModel()
+
+    def upsert(self, wallet):
+        """Aktualisiert eine bekannte Wallet in ihrer Zeile oder hängt eine neue an."""
+        row = self.rows.get(wallet["id"])
+        if row is None:
+            if "wallet_address" not in wallet:
+                return  # Teil-Update für eine nicht (mehr) angezeigte Wallet
+            row = len(self.wallets)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.wallets.append(dict(wallet))
+            self.rows[wallet["id"]] = row
+            self.total_pnl += wallet["pnl"]
+            self.endInsertRows()
+            return
+        current = self.wallets[row]
+        self.total_pnl += wallet.get("pnl", current["pnl"]) - current["pnl"]
+        current.update(wallet)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, ACTIONS_COLUMN))
+
+    def remove(self, wallet_id):
+        row = self.rows.get(wallet_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        wallet = self.wallets.pop(row)
+        del self.rows[wallet_id]
+        for later in self.wallets[row:]:
+            self.rows[later["id"]] -= 1
+        self.total_pnl -= wallet["pnl"]
+        self.endRemoveRows()
+
+    def wallet_id(self, row):
+        return self.wallets[row]["id"] if 0 <= row < len(self.wallets) else None
+
+
+class BacktestTableModel(QAbstractTableModel):
+    """Backtest-Ergebnis je Wallet, die Kennzahlen gelten für die empfohlene Allokation."""
+
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.allocations = result["allocations"]
+        self.wallets = result["wallets"]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.wallets)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(BACKTEST_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return BACKTEST_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        wallet = self.wallets[index.row()]
+        column = index.column()
+        if column == 0:
+            return wallet["wallet_address"]
+        if column == 1:
+            return str(wallet["events"])
+        best = wallet["best_allocation"]
+        if best is None:
+            return "-"
+        position = self.allocations.index(best)
+        if column == 2:
+            return f"{best:g}"
+        if column == 3:
+            return str(wallet["copies"][position])
+        if column == 4:
+            return f"{wallet['fees'][position]:.6f}"
+        return f"{wallet['final_balance'][position]:.4f}"
+
+    def best_allocations(self):
+        """Adresse -> empfohlene Allokation aller Wallets mit Empfehlung."""
+        return {wallet["wallet_address"]: wallet["best_allocation"] for wallet in self.wallets
+                if wallet["best_allocation"] is not None}
+
+
+class AllocationDelegate(QStyledItemDelegate):
+    """Editor für die Allokation: ganze Zahlen von 0 bis 100."""
+
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        editor.setValidator(QIntValidator(0, 100))
+        editor.setAlignment(Qt.AlignCenter)
+        return editor
+
+
+class RemoveButtonDelegate(QStyledItemDelegate):
+    """Zeichnet den Remove-Button, statt pro Zeile ein eigenes Widget anzulegen."""
+    clicked = pyqtSignal(int)  # Wallet-ID
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data(Qt.DisplayRole)
+        button.state = QStyle.State_Enabled | (option.state & QStyle.State_MouseOver)
+        QApplication.style().drawControl(QStyle.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self.clicked.emit(index.data(Qt.UserRole))
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ApiSignals(QObject):
+    finished = pyqtSignal(object)  # requests.Response
+    failed = pyqtSignal(str)
+
+
+class ApiTask(QRunnable):
+    """Führt einen API-Aufruf im Thread-Pool aus; das Ergebnis kommt per Signal in den UI-Thread."""
+
+    def __init__(self, method, url, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # Lebensdauer verwaltet der Aufrufer
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        self.signals = ApiSignals()
+
+    def run(self):
+        try:
+            response = requests.request(self.method, self.url, **self.kwargs)
+        except requests.RequestException as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(response)